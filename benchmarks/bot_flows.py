@@ -0,0 +1,146 @@
+"""
+Бенчмарк пользовательских и админских сценариев бота целиком.
+
+Бот собирается main.build_application поверх локальных заглушек Bot API и
+панели Marzban (benchmarks/fakes.py) и получает синтетические обновления.
+Для каждого сценария выводятся перцентили времени выполнения, пропускная
+способность и число запросов к Bot API и панели на один прогон:
+
+* start — /start нового пользователя;
+* subscription — «📊 Моя подписка» у пользователя с подпиской;
+* purchase — покупка месяца от меню до сообщения об активации подписки;
+* ticket — создание обращения в поддержку;
+* admin_paging — перелистывание списка пользователей панели;
+* mass_grant — массовое начисление часов от ввода до итогов для автора.
+
+    python benchmarks/bot_flows.py --users 2000 --panel-latency-ms 20 --iterations 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+import numpy as np
+
+# fakes задает окружение до импорта core.config
+from fakes import ADMIN_ID, BotHarness
+
+from core.config import config
+from presentation.callbacks import UsersListCallback
+
+SUBSCRIBER_IDS = range(10_000, 10_000_000)
+FLOW_TIMEOUT = 60
+
+_new_user_ids = itertools.count(20_000_000)
+
+
+async def flow_start(harness: BotHarness, index: int):
+    await harness.text(next(_new_user_ids), "/start")
+
+
+async def flow_subscription(harness: BotHarness, index: int):
+    await harness.callback(SUBSCRIBER_IDS[index % len(harness.panel.users)], "my_subscription")
+
+
+async def flow_purchase(harness: BotHarness, index: int):
+    user_id = next(_new_user_ids)
+    payload, price = f"monthly:1:{user_id}", config.STAR_PRICE_PER_MONTH
+    await harness.callback(user_id, "buy_subscription")
+    await harness.callback(user_id, "choose_monthly")
+    await harness.text(user_id, "1")
+    await harness.pre_checkout(user_id, payload, price)
+    activated = harness.bot_api.wait_for(user_id, "подписка активирована")
+    await harness.successful_payment(user_id, payload, price)
+    await asyncio.wait_for(activated, FLOW_TIMEOUT)
+
+
+async def flow_ticket(harness: BotHarness, index: int):
+    user_id = next(_new_user_ids)
+    await harness.callback(user_id, "create_support_ticket")
+    await harness.text(user_id, "Не подключается VPN")
+
+
+async def flow_admin_paging(harness: BotHarness, index: int):
+    pages = max(1, -(-len(harness.panel.users) // max(1, config.USERS_PER_PAGE)))
+    await harness.callback(ADMIN_ID, UsersListCallback(page=index % pages).pack())
+
+
+async def flow_mass_grant(harness: BotHarness, index: int):
+    await harness.callback(ADMIN_ID, "users_add_time_all")
+    finished = harness.bot_api.wait_for(ADMIN_ID, "завершено")
+    await harness.text(ADMIN_ID, "1")
+    await harness.callback(ADMIN_ID, "users_grant_confirm")
+    await asyncio.wait_for(finished, FLOW_TIMEOUT)
+
+
+# Сценарии администратора выполняются последовательно: администратор один
+FLOWS = {
+    "start": (flow_start, False),
+    "subscription": (flow_subscription, False),
+    "purchase": (flow_purchase, False),
+    "ticket": (flow_ticket, False),
+    "admin_paging": (flow_admin_paging, True),
+    "mass_grant": (flow_mass_grant, True),
+}
+
+
+async def measure(harness: BotHarness, flow, iterations: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    bot_calls = sum(harness.bot_api.calls.values())
+    panel_requests = harness.panel.request_count
+
+    async def run_once(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await flow(harness, index)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_once(index) for index in range(iterations)))
+    elapsed = time.perf_counter() - started
+    return (
+        np.array(latencies) * 1000,
+        iterations / elapsed,
+        (sum(harness.bot_api.calls.values()) - bot_calls) / iterations,
+        (harness.panel.request_count - panel_requests) / iterations,
+    )
+
+
+async def run(args):
+    async with BotHarness(
+        SUBSCRIBER_IDS[:args.users],
+        panel_latency=args.panel_latency_ms / 1000,
+        bot_api_latency=args.bot_latency_ms / 1000,
+    ) as harness:
+        print(
+            f"{'сценарий':<13} | {'прогонов':>8} | {'p50, мс':>8} | {'p95, мс':>8} | {'p99, мс':>8} | "
+            f"{'в секунду':>9} | {'Bot API':>7} | {'панель':>7}"
+        )
+        for name in args.flows:
+            flow, sequential = FLOWS[name]
+            iterations = args.grant_runs if name == "mass_grant" else args.iterations
+            latencies, throughput, bot_calls, panel_requests = await measure(
+                harness, flow, iterations, 1 if sequential else args.concurrency
+            )
+            p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+            print(
+                f"{name:<13} | {iterations:>8} | {p50:>8.1f} | {p95:>8.1f} | {p99:>8.1f} | "
+                f"{throughput:>9.1f} | {bot_calls:>7.1f} | {panel_requests:>7.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="Пользователей в панели")
+    parser.add_argument("--panel-latency-ms", type=float, default=20.0, help="Задержка ответа панели, мс")
+    parser.add_argument("--bot-latency-ms", type=float, default=0.0, help="Задержка ответа Bot API, мс")
+    parser.add_argument("--iterations", type=int, default=200, help="Прогонов каждого сценария")
+    parser.add_argument("--concurrency", type=int, default=20, help="Одновременных пользователей")
+    parser.add_argument("--grant-runs", type=int, default=3, help="Прогонов массового начисления")
+    parser.add_argument("--flows", nargs="+", choices=list(FLOWS), default=list(FLOWS))
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
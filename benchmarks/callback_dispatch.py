@@ -0,0 +1,155 @@
+"""
+Микробенчмарк диспетчеризации callback'ов админ-панели.
+
+Сравнивает таблицу маршрутов (presentation/callbacks.py) с прежней цепочкой
+``if data == ... elif data.startswith(...)`` из AdminHandlers.admin_callback_handler.
+Измеряется только поиск обработчика и разбор данных, без вызова обработчика.
+Кеша разбора нет, каждый вызов разбирает строку заново, как для реальных
+callback'ов с разными именами пользователей и страницами. Для сравнения
+приводится разбор той же строки с валидацией pydantic (CallbackData.unpack).
+Цепочка возвращала кортеж строк, таблица — модель CallbackData, поэтому на
+первых ветках цепочки (users_list, users_view) таблица медленнее: выигрыш
+растет к концу цепочки и для callback'ов без параметров.
+
+    python benchmarks/callback_dispatch.py --number 200000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from presentation.callbacks import CallbackRouter  # noqa: E402
+from presentation.handlers.admin_handlers import AdminHandlers  # noqa: E402
+
+
+def _page(data):
+    parts = data.split(":")
+    return int(parts[-1]) if len(parts) > 1 and parts[-1].isdigit() else 0
+
+
+def _username_page(data):
+    parts = data.split(":")
+    username = parts[1] if len(parts) > 1 else ""
+    page = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 0
+    return username, page
+
+
+def _edit(prefix, include_choice=True):
+    def parse(data):
+        parts = data[len(prefix):].split(":")
+        page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        choice = parts[2] if include_choice and len(parts) > 2 else None
+        return parts[0], page, choice
+    return parse
+
+
+def _exact(value):
+    return lambda data: data == value
+
+
+def _prefix(value):
+    return lambda data: data.startswith(value)
+
+
+# Ветки в том порядке, в котором они шли в цепочке if/elif
+LEGACY_CHAIN = [
+    (_exact("admin_stats"), None),
+    (_exact("admin_users"), None),
+    (_exact("admin_admins"), None),
+    (_exact("admin_nodes"), None),
+    (_exact("admin_support_tickets"), None),
+    (_exact("admin_back"), None),
+    (_prefix("users_list:"), _page),
+    (_prefix("users_view:"), _username_page),
+    (_prefix("users_edit:"), _username_page),
+    (_prefix("users_delete:"), _username_page),
+    (_prefix("confirm_delete_user_"), None),
+    (_exact("cancel_delete_user"), None),
+    (_exact("users_search"), None),
+    (_exact("users_search_cancel"), None),
+    (_exact("user_add"), None),
+    (_exact("users_add_time"), None),
+    (_exact("users_add_time_all"), None),
+    (_exact("users_add_time_user"), None),
+    (_exact("users_add_data"), None),
+    (_exact("users_add_data_all"), None),
+    (_exact("users_add_data_user"), None),
+    (_exact("users_broadcast"), None),
+    (_prefix("users_broadcast_seg:"), lambda data: data.split(":", 1)[1]),
+    (_exact("users_broadcast_custom"), None),
+    (_exact("users_broadcast_confirm"), None),
+    (_prefix("users_edit_status:"), _edit("users_edit_status:")),
+    (_prefix("users_edit_limit:"), _edit("users_edit_limit:")),
+    (_prefix("users_edit_limit_menu:"), _edit("users_edit_limit_menu:", False)),
+    (_prefix("users_edit_reset:"), _edit("users_edit_reset:")),
+    (_prefix("users_edit_expire:"), _edit("users_edit_expire:")),
+    (_prefix("users_edit_expire_menu:"), _edit("users_edit_expire_menu:", False)),
+    (_prefix("users_edit_note:"), _edit("users_edit_note:")),
+    (_prefix("users_edit_note_menu:"), _edit("users_edit_note_menu:", False)),
+    (_prefix("users_edit_cancel:"), _edit("users_edit_cancel:", False)),
+    (_prefix("admins_list:"), _page),
+    (_exact("admins_search"), None),
+    (_exact("admins_add"), None),
+    (_prefix("admin_manage:"), _username_page),
+    (_prefix("admins_edit:"), _username_page),
+    (_prefix("admins_delete:"), _username_page),
+    (_prefix("confirm_delete_admin_"), None),
+    (_exact("cancel_delete_admin"), None),
+    (_prefix("support_"), None),
+]
+
+
+def legacy_dispatch(data):
+    for index, (predicate, parser) in enumerate(LEGACY_CHAIN):
+        if predicate(data):
+            return index, parser(data) if parser else None
+    return None
+
+
+SAMPLES = {
+    "admin_stats (точное, начало цепочки)": "admin_stats",
+    "users_list:N": "users_list:3",
+    "users_view:user:N": "users_view:qwqvpn_123456789:2",
+    "users_broadcast (точное, середина)": "users_broadcast",
+    "users_edit_note:user:N:choice": "users_edit_note:qwqvpn_123456789:2:custom",
+    "users_edit_cancel:user:N": "users_edit_cancel:qwqvpn_123456789:2",
+    "admins_delete:user:N": "admins_delete:admin:1",
+    "support_ticket_toggle:id:status (конец)": "support_ticket_toggle:42:closed",
+    "неизвестный callback": "back_to_main",
+}
+
+
+def build_router() -> CallbackRouter:
+    handlers = AdminHandlers.__new__(AdminHandlers)
+    return AdminHandlers._build_callback_router(handlers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=100_000, help="Итераций на каждый callback")
+    args = parser.parse_args()
+
+    router = build_router()
+
+    def resolve_unpack(data):
+        route = router._exact.get(data)
+        if route is not None:
+            return route, None
+        route = router._prefixed.get(data.partition(":")[0])
+        return route and (route, route.callback_type.unpack(data))
+
+    def measure(func, data):
+        return min(timeit.repeat(lambda: func(data), number=args.number, repeat=3)) / args.number * 1e9
+
+    print(f"{'callback':<42} {'цепочка, нс':>12} {'таблица, нс':>12} {'unpack, нс':>12} {'ускорение':>10}")
+    for title, data in SAMPLES.items():
+        legacy_ns = measure(legacy_dispatch, data)
+        table_ns = measure(router.resolve, data)
+        unpack_ns = measure(resolve_unpack, data)
+        print(f"{title:<42} {legacy_ns:>12.0f} {table_ns:>12.0f} {unpack_ns:>12.0f} {legacy_ns / table_ns:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Локальные заглушки Telegram Bot API и панели Marzban для бенчмарков.
+
+Обе заглушки — aiohttp-приложения на 127.0.0.1 в том же процессе, что и бот.
+Бот подключается к ним обычными клиентами (aiogram Bot и MarzbanAPIClient),
+поэтому в замер попадают сериализация, HTTP и разбор ответов. Само приложение
+собирается main.build_application, как при реальном запуске.
+
+Переменные окружения задаются до импорта core.config: в .env шаблонные
+значения, а лимиты исходящих сообщений рассчитаны на настоящий Telegram.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN_ID = 1
+
+os.environ["ADMIN_TG_IDS"] = str(ADMIN_ID)
+os.environ["SUPPORT_TG_IDS"] = ""
+os.environ["BOT_TOKEN"] = "123456:benchmark"
+os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+# У заглушки нет лимитов Telegram; измеряется сам бот
+os.environ.setdefault("TELEGRAM_GLOBAL_RATE", "100000")
+os.environ.setdefault("TELEGRAM_PER_CHAT_INTERVAL", "0")
+
+from aiohttp import web  # noqa: E402
+from aiogram import Bot  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+from infrastructure.marzban.api_client import MarzbanAPIClient  # noqa: E402
+from main import Application, build_application  # noqa: E402
+
+# main настраивает логирование на INFO; в отчете бенчмарка нужны только ошибки
+logging.getLogger().setLevel(logging.WARNING)
+
+DAY = 86400
+GB = 1024 ** 3
+BOT_ID = 42
+
+
+async def _start_site(app: web.Application) -> Tuple[web.AppRunner, str]:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+class FakeBotAPI:
+    """
+    Bot API, принимающий любой метод.
+
+    Методы отправки и редактирования отвечают объектом Message, остальные —
+    true. По каждому сообщению можно дождаться ответа бота с нужным текстом
+    (``wait_for``): так измеряются сценарии, которые завершаются фоновой
+    отправкой, например выдача подписки после оплаты.
+    """
+
+    MESSAGE_METHODS = frozenset({
+        "sendMessage", "editMessageText", "editMessageReplyMarkup", "sendInvoice", "sendDocument", "sendPhoto",
+    })
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.url = ""
+        self._runner: Optional[web.AppRunner] = None
+        self._message_ids = itertools.count(1)
+        self._waiters: Dict[int, List[Tuple[str, asyncio.Future]]] = defaultdict(list)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner, self.url = await _start_site(app)
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def create_bot(self) -> Bot:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.url))
+        return Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+    def wait_for(self, chat_id: int, fragment: str) -> asyncio.Future:
+        """Future, которое завершится, когда бот отправит в чат текст с ``fragment``"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id].append((fragment, future))
+        return future
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        form = await request.post()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method not in self.MESSAGE_METHODS:
+            return web.json_response({"ok": True, "result": True})
+
+        chat_id = int(form.get("chat_id") or 0)
+        text = str(form.get("text") or form.get("caption") or form.get("title") or "")
+        self._resolve(chat_id, text)
+        message_id = int(form.get("message_id") or next(self._message_ids))
+        return web.json_response({"ok": True, "result": {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "bot"},
+            "text": text or "-",
+        }})
+
+    def _resolve(self, chat_id: int, text: str):
+        waiters = self._waiters.get(chat_id)
+        if not waiters:
+            return
+        pending = []
+        for fragment, future in waiters:
+            if future.done():
+                continue
+            if fragment in text:
+                future.set_result(text)
+            else:
+                pending.append((fragment, future))
+        self._waiters[chat_id] = pending
+
+
+class FakeMarzbanPanel:
+    """
+    Панель Marzban в памяти с задержкой ``latency`` на каждый запрос.
+
+    Для каждого id из ``user_ids`` заранее создается пользователь qwqvpn_<id>:
+    у двух третей есть срок, у остальных — лимит трафика.
+    """
+
+    def __init__(self, user_ids, latency: float = 0.0):
+        self.latency = latency
+        self.requests: Counter = Counter()
+        self.url = ""
+        self._runner: Optional[web.AppRunner] = None
+        now = int(time.time())
+        self.users: Dict[str, Dict[str, Any]] = {}
+        for index, telegram_id in enumerate(user_ids):
+            monthly = index % 3 != 2
+            self._add_user({
+                "username": f"qwqvpn_{telegram_id}",
+                "expire": now + (index % 60 - 5) * DAY if monthly else None,
+                "data_limit": None if monthly else (index % 50 + 1) * GB,
+                "used_traffic": (index % 7) * GB // 2,
+            })
+
+    async def start(self) -> str:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/api/admin/token", self._token)
+        app.router.add_get("/api/users", self._get_users)
+        app.router.add_get("/api/system", self._system)
+        app.router.add_post("/api/user", self._create_user)
+        app.router.add_get("/api/user/{username}", self._get_user)
+        app.router.add_put("/api/user/{username}", self._modify_user)
+        self._runner, self.url = await _start_site(app)
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def create_client(self) -> MarzbanAPIClient:
+        return MarzbanAPIClient(base_url=self.url, username="admin", password="admin", verify_ssl=False)
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.requests.values())
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.requests[f"{request.method} {route}"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def _add_user(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        username = fields["username"]
+        user = {
+            "username": username,
+            "status": "active",
+            "expire": None,
+            "data_limit": None,
+            "data_limit_reset_strategy": "no_reset",
+            "used_traffic": 0,
+            "lifetime_used_traffic": 0,
+            "note": "",
+            "proxies": {},
+            "links": [],
+            "subscription_url": f"https://sub.example/{username}",
+            "created_at": "2024-01-01T00:00:00",
+        }
+        user.update(fields)
+        self._refresh_status(user)
+        self.users[username] = user
+        return user
+
+    @staticmethod
+    def _refresh_status(user: Dict[str, Any]):
+        if user["expire"] and user["expire"] < time.time():
+            user["status"] = "expired"
+        elif user["data_limit"] and user["used_traffic"] >= user["data_limit"]:
+            user["status"] = "limited"
+        elif user["status"] in ("expired", "limited"):
+            user["status"] = "active"
+
+    async def _token(self, request: web.Request) -> web.Response:
+        return web.json_response({"access_token": "benchmark", "token_type": "bearer"})
+
+    async def _system(self, request: web.Request) -> web.Response:
+        active = sum(1 for user in self.users.values() if user["status"] == "active")
+        return web.json_response({"total_user": len(self.users), "users_active": active, "cpu_cores": 4})
+
+    async def _get_users(self, request: web.Request) -> web.Response:
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query.get("limit", 100))
+        users = list(self.users.values())
+        return web.json_response({"users": users[offset:offset + limit], "total": len(users)})
+
+    async def _get_user(self, request: web.Request) -> web.Response:
+        user = self.users.get(request.match_info["username"])
+        if user is None:
+            return web.json_response({"detail": "User not found"}, status=404)
+        return web.json_response(user)
+
+    async def _create_user(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        if data["username"] in self.users:
+            return web.json_response({"detail": "User already exists"}, status=409)
+        return web.json_response(self._add_user({
+            key: data.get(key) for key in ("username", "expire", "data_limit", "note") if key in data
+        }))
+
+    async def _modify_user(self, request: web.Request) -> web.Response:
+        user = self.users.get(request.match_info["username"])
+        if user is None:
+            return web.json_response({"detail": "User not found"}, status=404)
+        data = await request.json()
+        user.update({key: value for key, value in data.items() if key in user and key != "username"})
+        self._refresh_status(user)
+        return web.json_response(user)
+
+
+class BotHarness:
+    """
+    Бот, собранный main.build_application поверх заглушек, и генератор
+    входящих обновлений. Обновления передаются в Dispatcher.feed_update —
+    тот же путь, что и при polling, без сетевого long-poll.
+    """
+
+    def __init__(self, panel_users, panel_latency: float = 0.0, bot_api_latency: float = 0.0):
+        self.bot_api = FakeBotAPI(bot_api_latency)
+        self.panel = FakeMarzbanPanel(panel_users, panel_latency)
+        self.app: Optional[Application] = None
+        self._directory: Optional[tempfile.TemporaryDirectory] = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+
+    async def __aenter__(self) -> "BotHarness":
+        await self.bot_api.start()
+        await self.panel.start()
+        self._directory = tempfile.TemporaryDirectory()
+        self.app = build_application(
+            self.bot_api.create_bot(),
+            self.panel.create_client(),
+            os.path.join(self._directory.name, "benchmark.db"),
+        )
+        await self.app.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.app.stop()
+        await self.panel.stop()
+        await self.bot_api.stop()
+        self._directory.cleanup()
+
+    async def feed(self, update: Dict[str, Any]):
+        update["update_id"] = next(self._update_ids)
+        bot = self.app.bot
+        await self.app.dispatcher.feed_update(bot, Update.model_validate(update, context={"bot": bot}))
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+
+    def _message(self, user_id: int, **fields) -> Dict[str, Any]:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+        }
+        message.update(fields)
+        return message
+
+    async def text(self, user_id: int, text: str):
+        fields = {"text": text}
+        if text.startswith("/"):
+            fields["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        await self.feed({"message": self._message(user_id, **fields)})
+
+    async def callback(self, user_id: int, data: str):
+        message = self._message(user_id, text="menu")
+        message["from"] = {"id": BOT_ID, "is_bot": True, "first_name": "bot"}
+        await self.feed({"callback_query": {
+            "id": str(next(self._update_ids)),
+            "from": self._user(user_id),
+            "chat_instance": str(user_id),
+            "message": message,
+            "data": data,
+        }})
+
+    async def pre_checkout(self, user_id: int, payload: str, total_amount: int):
+        await self.feed({"pre_checkout_query": {
+            "id": str(next(self._update_ids)),
+            "from": self._user(user_id),
+            "currency": "XTR",
+            "total_amount": total_amount,
+            "invoice_payload": payload,
+        }})
+
+    async def successful_payment(self, user_id: int, payload: str, total_amount: int):
+        await self.feed({"message": self._message(user_id, successful_payment={
+            "currency": "XTR",
+            "total_amount": total_amount,
+            "invoice_payload": payload,
+            "telegram_payment_charge_id": f"charge_{next(self._update_ids)}",
+            "provider_payment_charge_id": "",
+        })})
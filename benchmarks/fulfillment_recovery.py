@@ -0,0 +1,272 @@
+"""
+Проверка выдачи оплаченного заказа при сбоях записи в панель и перезапуске.
+
+Заказы выдает FulfillmentService с настоящим PaymentRepository на временной
+базе SQLite, панель Marzban — в памяти и умеет «ломаться»: применить
+изменение и затем вернуть ошибку (обрыв соединения после записи) или
+зависнуть на записи, пока бот не остановят. Перезапуск воспроизводится
+остановкой сервиса (stop) и созданием нового поверх той же базы (recover).
+Для каждого сценария проверяется, что в панель попало ровно одно
+начисление; при расхождении скрипт завершается с ошибкой.
+
+    python benchmarks/fulfillment_recovery.py
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.models.payment import PaymentOrder  # noqa: E402
+from domain.services.fulfillment_service import FulfillmentService  # noqa: E402
+from domain.services.subscription_service import SubscriptionService  # noqa: E402
+from infrastructure.database.repositories import PaymentRepository  # noqa: E402
+
+# Сбои панели в сценариях намеренные; в отчете нужны только итоги
+logging.basicConfig(level=logging.CRITICAL)
+
+DAY = 86400
+GB = 1024 ** 3
+TELEGRAM_ID = 777
+USERNAME = f"qwqvpn_{TELEGRAM_ID}"
+WAIT_TIMEOUT = 10
+# Статусы, в которых заказ больше не обрабатывается
+FINAL_STATUSES = ("fulfilled", "failed", "needs_review")
+
+
+class PanelError(Exception):
+    """Сбой запроса к панели"""
+
+
+class FlakyMarzbanPanel:
+    """
+    Панель Marzban в памяти со сбоями записи.
+
+    fail_after_write — сколько ближайших записей применить и завершить
+    ошибкой; fail_before_write — сколько записей завершить ошибкой, не
+    применяя; hang_after_write / hang_before_write — следующая запись
+    зависает после применения или до него (до отмены задачи).
+    """
+
+    def __init__(self):
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.calls: Counter = Counter()
+        self.fail_after_write = 0
+        self.fail_before_write = 0
+        self.hang_after_write = False
+        self.hang_before_write = False
+        self.write_started = asyncio.Event()
+
+    def _response(self, username: str) -> Dict[str, Any]:
+        user = dict(self.users[username])
+        user["subscription_url"] = f"https://panel.example.com/sub/{username}"
+        return user
+
+    async def _write(self, apply):
+        self.write_started.set()
+        if self.hang_before_write:
+            self.hang_before_write = False
+            await asyncio.Event().wait()
+        if self.fail_before_write:
+            self.fail_before_write -= 1
+            raise PanelError("панель недоступна")
+        apply()
+        if self.hang_after_write:
+            self.hang_after_write = False
+            await asyncio.Event().wait()
+        if self.fail_after_write:
+            self.fail_after_write -= 1
+            raise PanelError("read timeout после записи")
+
+    async def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        self.calls["get_user"] += 1
+        return self._response(username) if username in self.users else None
+
+    async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls["create_user"] += 1
+        if user_data["username"] in self.users:
+            raise PanelError("User already exists")
+        await self._write(lambda: self.users.update({user_data["username"]: {"used_traffic": 0, **user_data}}))
+        return self._response(user_data["username"])
+
+    async def modify_user(self, username: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls["modify_user"] += 1
+        await self._write(lambda: self.users[username].update(user_data))
+        return self._response(username)
+
+
+class FakeUserService:
+    async def update_user_subscription_type(self, telegram_id: int, subscription_type: str):
+        return None
+
+
+class FakeSnapshotRepository:
+    async def upsert_many(self, users):
+        return None
+
+
+class Bot:
+    """Экземпляр бота: сервис выдачи поверх общей базы и панели"""
+
+    def __init__(self, panel: FlakyMarzbanPanel, db_path: str, retry_delay: float = 0):
+        self.repository = PaymentRepository(db_path)
+        subscription_service = SubscriptionService(panel, FakeUserService(), FakeSnapshotRepository())
+        self.fulfillment = FulfillmentService(
+            self.repository, subscription_service, workers=2, retry_delay=retry_delay
+        )
+        self.fulfillment.start()
+
+    async def wait_status(self, order_id: int, *statuses: str, attempts: int = 0) -> PaymentOrder:
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            order = await self.repository.get_by_id(order_id)
+            if order.status in statuses and order.attempts >= attempts:
+                return order
+            if time.monotonic() > deadline:
+                raise AssertionError(f"Заказ #{order_id} в статусе {order.status}, ожидался {statuses}")
+            await asyncio.sleep(0.01)
+
+
+def new_order(plan: str, quantity: int) -> PaymentOrder:
+    payload = f"{plan}:{quantity}:{TELEGRAM_ID}"
+    return PaymentOrder(
+        telegram_id=TELEGRAM_ID, plan=plan, quantity=quantity, amount=1,
+        payload=payload, charge_id=f"charge-{time.monotonic_ns()}",
+    )
+
+
+async def restart(bot: Bot, db_path: str, panel: FlakyMarzbanPanel) -> Bot:
+    """Остановка посреди записи в панель и запуск нового экземпляра"""
+    await asyncio.wait_for(panel.write_started.wait(), WAIT_TIMEOUT)
+    await bot.fulfillment.stop()
+    bot = Bot(panel, db_path)
+    await bot.fulfillment.recover()
+    return bot
+
+
+async def scenario_retry_after_write(panel: FlakyMarzbanPanel, db_path: str):
+    """Продление: modify_user применен, но вернул ошибку; повтор не продлевает второй раз"""
+    expire = int(time.time()) + 10 * DAY
+    panel.users[USERNAME] = {"username": USERNAME, "expire": expire, "data_limit": 0, "used_traffic": 0}
+    panel.fail_after_write = 1
+    bot = Bot(panel, db_path)
+    order, _ = await bot.fulfillment.submit(new_order("monthly", 1))
+    order = await bot.wait_status(order.id, *FINAL_STATUSES)
+    await bot.fulfillment.stop()
+    assert order.status == "fulfilled" and order.attempts == 2, order
+    return panel.users[USERNAME]["expire"] - expire, 30 * DAY
+
+
+async def scenario_create_after_write(panel: FlakyMarzbanPanel, db_path: str):
+    """Новый пользователь по трафику: create_user применен, но вернул ошибку"""
+    panel.fail_after_write = 1
+    bot = Bot(panel, db_path)
+    order, _ = await bot.fulfillment.submit(new_order("traffic", 5))
+    order = await bot.wait_status(order.id, *FINAL_STATUSES)
+    await bot.fulfillment.stop()
+    assert order.status == "fulfilled", order
+    return panel.users[USERNAME]["data_limit"], 5 * GB
+
+
+async def scenario_restart_after_write(panel: FlakyMarzbanPanel, db_path: str):
+    """Трафик: запись применена, бот остановлен, пока заказ в processing"""
+    panel.users[USERNAME] = {"username": USERNAME, "expire": None, "data_limit": 3 * GB, "used_traffic": 0}
+    panel.hang_after_write = True
+    bot = Bot(panel, db_path)
+    order, _ = await bot.fulfillment.submit(new_order("traffic", 10))
+    bot = await restart(bot, db_path, panel)
+    order = await bot.wait_status(order.id, *FINAL_STATUSES)
+    await bot.fulfillment.stop()
+    assert order.status == "fulfilled", order
+    return panel.users[USERNAME]["data_limit"] - 3 * GB, 10 * GB
+
+
+async def scenario_restart_before_write(panel: FlakyMarzbanPanel, db_path: str):
+    """Продление: журнал записан, бот остановлен до записи; запись выполняется один раз"""
+    expire = int(time.time()) + 10 * DAY
+    panel.users[USERNAME] = {"username": USERNAME, "expire": expire, "data_limit": 0, "used_traffic": 0}
+    panel.hang_before_write = True
+    bot = Bot(panel, db_path)
+    order, _ = await bot.fulfillment.submit(new_order("monthly", 2))
+    bot = await restart(bot, db_path, panel)
+    order = await bot.wait_status(order.id, *FINAL_STATUSES)
+    await bot.fulfillment.stop()
+    assert order.status == "fulfilled", order
+    return panel.users[USERNAME]["expire"] - expire, 60 * DAY
+
+
+async def scenario_changed_during_write(panel: FlakyMarzbanPanel, db_path: str):
+    """Лимит изменен в панели, пока бот был остановлен: заказ уходит на проверку, без записи"""
+    panel.users[USERNAME] = {"username": USERNAME, "expire": None, "data_limit": 3 * GB, "used_traffic": 0}
+    panel.hang_before_write = True
+    bot = Bot(panel, db_path)
+    order, _ = await bot.fulfillment.submit(new_order("traffic", 10))
+    await asyncio.wait_for(panel.write_started.wait(), WAIT_TIMEOUT)
+    await bot.fulfillment.stop()
+    panel.users[USERNAME]["data_limit"] = 4 * GB
+    bot = Bot(panel, db_path)
+    await bot.fulfillment.recover()
+    order = await bot.wait_status(order.id, *FINAL_STATUSES)
+    await bot.fulfillment.stop()
+    assert order.status == "needs_review" and order.attempts == 2, order
+    return panel.users[USERNAME]["data_limit"] - 4 * GB, 0
+
+
+async def scenario_second_order_during_retry(panel: FlakyMarzbanPanel, db_path: str):
+    """
+    Две одинаковые покупки: запись первой не применена, и пока она ждет
+    повтора, приходит вторая. Вторая не должна засчитаться за первую.
+    """
+    expire = int(time.time()) + 10 * DAY
+    panel.users[USERNAME] = {"username": USERNAME, "expire": expire, "data_limit": 0, "used_traffic": 0}
+    panel.fail_before_write = 1
+    bot = Bot(panel, db_path, retry_delay=1)
+    first, _ = await bot.fulfillment.submit(new_order("monthly", 1))
+    await bot.wait_status(first.id, "pending", attempts=1)
+    second, _ = await bot.fulfillment.submit(new_order("monthly", 1))
+    second = await bot.wait_status(second.id, *FINAL_STATUSES)
+    first = await bot.wait_status(first.id, *FINAL_STATUSES)
+    await bot.fulfillment.stop()
+    assert first.status == "fulfilled" and second.status == "fulfilled", (first, second)
+    return panel.users[USERNAME]["expire"] - expire, 60 * DAY
+
+
+SCENARIOS = {
+    "retry_after_write": scenario_retry_after_write,
+    "create_after_write": scenario_create_after_write,
+    "restart_after_write": scenario_restart_after_write,
+    "restart_before_write": scenario_restart_before_write,
+    "changed_during_write": scenario_changed_during_write,
+    "second_order_during_retry": scenario_second_order_during_retry,
+}
+
+
+async def run(args) -> bool:
+    ok = True
+    print(f"{'сценарий':<25} | {'начислено':>12} | {'ожидалось':>12} | {'записей':>7} | итог")
+    for name in args.scenarios:
+        panel = FlakyMarzbanPanel()
+        with tempfile.TemporaryDirectory() as directory:
+            granted, expected = await SCENARIOS[name](panel, os.path.join(directory, "payments.db"))
+        writes = panel.calls["modify_user"] + panel.calls["create_user"]
+        passed = granted == expected
+        ok = ok and passed
+        print(f"{name:<25} | {granted:>12} | {expected:>12} | {writes:>7} | {'ok' if passed else 'ОШИБКА'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    if not asyncio.run(run(parser.parse_args())):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Бенчмарк выделений памяти при сборке inline-клавиатур.
+
+Сравнивает сборку клавиатуры на каждый вызов (исходная функция, доступная
+через ``__wrapped__``) с кешированной версией. Для каждой клавиатуры
+приводятся число блоков и байт, выделенных за один вызов (tracemalloc,
+результаты удерживаются до конца замера, как если бы сообщения ещё
+отправлялись), и время вызова. Отдельно сравнивается проверка роли
+поиском в списке и в множестве.
+
+    python benchmarks/keyboard_alloc.py --number 2000
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from presentation.keyboards import admin_keyboards, support_keyboards, user_keyboards  # noqa: E402
+
+KEYBOARDS = {
+    "главное меню (user)": (user_keyboards._get_main_keyboard_for_role, ("user",)),
+    "главное меню (support)": (user_keyboards._get_main_keyboard_for_role, ("support",)),
+    "главное меню (admin)": (user_keyboards._get_main_keyboard_for_role, ("admin",)),
+    "продление подписки": (user_keyboards.get_extend_subscription_keyboard, ()),
+    "меню поддержки": (support_keyboards.get_support_keyboard, ()),
+    "админ-панель": (admin_keyboards.get_admin_main_keyboard, ()),
+    "пользователи (админ)": (admin_keyboards.get_admin_users_keyboard, ()),
+    "аудитория рассылки": (admin_keyboards.get_broadcast_audience_keyboard, ()),
+}
+
+
+def allocations(func, args, number):
+    """Блоки и байты, выделенные за один вызов, при удержании результатов"""
+    results = [None] * number  # список выделяется заранее и не попадает в замер
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for index in range(number):
+        results[index] = func(*args)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    blocks = sum(max(stat.count_diff, 0) for stat in stats)
+    size = sum(max(stat.size_diff, 0) for stat in stats)
+    del results
+    return blocks / number, size / number
+
+
+def measure(func, args, number):
+    return min(timeit.repeat(lambda: func(*args), number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=2_000, help="Вызовов на каждую клавиатуру")
+    parser.add_argument("--staff", type=int, default=20, help="Число id админов/поддержки для проверки роли")
+    args = parser.parse_args()
+
+    print(
+        f"{'клавиатура':<26} {'блоков/вызов':>13} {'из кеша':>8} "
+        f"{'байт/вызов':>11} {'из кеша':>8} {'мкс/вызов':>10} {'из кеша':>8}"
+    )
+    for title, (cached, call_args) in KEYBOARDS.items():
+        uncached = cached.__wrapped__
+        cached(*call_args)  # прогрев кеша
+        blocks, size = allocations(uncached, call_args, args.number)
+        cached_blocks, cached_size = allocations(cached, call_args, args.number)
+        build_us = measure(uncached, call_args, args.number)
+        cached_us = measure(cached, call_args, args.number)
+        print(
+            f"{title:<26} {blocks:>13.1f} {cached_blocks:>8.1f} "
+            f"{size:>11.0f} {cached_size:>8.0f} {build_us:>10.2f} {cached_us:>8.3f}"
+        )
+
+    staff_list = list(range(1_000_000, 1_000_000 + args.staff))
+    staff_set = frozenset(staff_list)
+    user_id = 42  # обычный пользователь — худший случай для поиска в списке
+    list_ns = min(timeit.repeat(lambda: user_id in staff_list, number=200_000, repeat=3)) / 200_000 * 1e9
+    set_ns = min(timeit.repeat(lambda: user_id in staff_set, number=200_000, repeat=3)) / 200_000 * 1e9
+    print(f"\nпроверка роли среди {args.staff} id: список {list_ns:.0f} нс, множество {set_ns:.0f} нс")
+
+
+if __name__ == "__main__":
+    main()
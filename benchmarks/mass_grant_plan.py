@@ -0,0 +1,77 @@
+"""
+Бенчмарк предпросмотра массового начисления.
+
+Для синтетического списка пользователей Marzban (словари, как в ответе
+get_users) предпросмотр MassGrantPlanner.plan сравнивается с тем же расчетом
+построчно на Python. Отдельно показано, сколько записей в панель требуется:
+раньше запрос уходил каждому пользователю со сроком или лимитом, теперь —
+только тем, кому начисление что-то меняет.
+
+    python benchmarks/mass_grant_plan.py --sizes 10000 100000 --kind traffic --amount -20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.services.mass_grant_planner import DAY, GB, MassGrantPlanner  # noqa: E402
+
+
+def make_users(number: int, now: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    expire = np.where(rng.random(number) < 0.8, now + rng.integers(-30, 90, number) * DAY, 0)
+    data_limit = np.where(rng.random(number) < 0.6, rng.integers(1, 100, number) * GB, 0)
+    used = (rng.random(number) * 60 * GB).astype(np.int64)
+    return [
+        {"username": f"qwqvpn_{index}", "status": "active", "expire": e, "data_limit": d, "used_traffic": u}
+        for index, (e, d, u) in enumerate(zip(expire.tolist(), data_limit.tolist(), used.tolist()))
+    ]
+
+
+def naive_plan(kind: str, amount: float, users, now: int):
+    """Тот же расчет по одному пользователю"""
+    usernames = []
+    for user in users:
+        if user.get("username") and MassGrantPlanner.changes_for(kind, amount, user, now):
+            usernames.append(user["username"])
+    return usernames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--kind", choices=(MassGrantPlanner.HOURS, MassGrantPlanner.TRAFFIC), default="traffic")
+    parser.add_argument("--amount", type=float, default=-20, help="Часы или ГБ, можно отрицательно")
+    args = parser.parse_args()
+
+    now = int(time.time())
+    target = MassGrantPlanner.target_field(args.kind)
+    print(
+        f"{'пользователей':>13} | {'построчно, мс':>13} | {'NumPy, мс':>9} | "
+        f"{'записей было':>12} | {'записей стало':>13}"
+    )
+    for size in args.sizes:
+        users = make_users(size, now)
+
+        started = time.perf_counter()
+        naive = naive_plan(args.kind, args.amount, users, now)
+        naive_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        plan = MassGrantPlanner.plan(args.kind, args.amount, users, now)
+        plan_time = time.perf_counter() - started
+
+        assert naive == plan.usernames
+        legacy_writes = sum(1 for user in users if user.get(target))
+        print(
+            f"{size:>13} | {naive_time * 1000:>13.1f} | {plan_time * 1000:>9.1f} | "
+            f"{legacy_writes:>12} | {plan.changed:>13}"
+        )
+
+
+if __name__ == "__main__":
+    main()
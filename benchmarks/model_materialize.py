@@ -0,0 +1,220 @@
+"""
+Бенчмарк материализации доменных моделей.
+
+Создает N объектов (по умолчанию 100 000) каждой модели двумя способами:
+прежними dataclass-моделями (их копии ниже) и текущими моделями со
+``__slots__``. SubscriptionInfo строится из ответа Marzban с обращением
+только к ``is_active``, как при проверке статуса; TelegramUser и
+SupportTicket — из строк SQLite, как в репозиториях. Для каждого варианта
+выводятся время и объем памяти, занятой созданными объектами (tracemalloc).
+
+    python benchmarks/model_materialize.py --number 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.models import SubscriptionInfo, SupportTicket, TelegramUser  # noqa: E402
+
+
+# === Прежние модели ===
+@dataclass
+class LegacySubscriptionInfo:
+    username: str
+    subscription_type: str
+    status: str
+    expire_date: Optional[datetime]
+    used_traffic_gb: float
+    data_limit_gb: Optional[float]
+    subscription_url: Optional[str]
+    is_active: bool
+    configs: Optional[List[str]] = None
+    months_count: Optional[int] = None
+
+    @classmethod
+    def from_marzban_data(cls, user_data: Dict[str, Any], subscription_url: Optional[str] = None):
+        data_limit = user_data.get('data_limit')
+        expire_timestamp = user_data.get('expire')
+        expire_date = None
+        if expire_timestamp:
+            try:
+                expire_date = datetime.fromtimestamp(expire_timestamp)
+            except Exception:
+                expire_date = None
+        if not data_limit or data_limit == 0:
+            subscription_type = "Ежемесячная подписка"
+        else:
+            subscription_type = "Тариф по трафику"
+        status = "active" if user_data.get('status') == 'active' else "inactive"
+        used_traffic = user_data.get('used_traffic', 0)
+        used_traffic_gb = round(used_traffic / (1024 ** 3), 2) if used_traffic else 0.0
+        data_limit_gb = None
+        if data_limit and data_limit > 0:
+            data_limit_gb = round(data_limit / (1024 ** 3), 2)
+        configs = []
+        proxies = user_data.get('proxies', {}) or {}
+        if isinstance(proxies, dict):
+            for proto, cfg in proxies.items():
+                if isinstance(cfg, dict):
+                    conf_str = cfg.get('server') or cfg.get('address') or ''
+                    if conf_str:
+                        configs.append(f"{proto}: {conf_str}")
+        months_count = None
+        if expire_date:
+            delta_days = (expire_date - datetime.utcnow()).days
+            if delta_days > 0:
+                months_count = max(1, round(delta_days / 30))
+        return cls(
+            username=user_data.get('username', ''),
+            subscription_type=subscription_type,
+            status=status,
+            expire_date=expire_date,
+            used_traffic_gb=used_traffic_gb,
+            data_limit_gb=data_limit_gb,
+            subscription_url=subscription_url,
+            is_active=status == 'active',
+            configs=configs,
+            months_count=months_count,
+        )
+
+
+@dataclass
+class LegacyTelegramUser:
+    telegram_id: int
+    marzban_username: str
+    subscription_type: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+@dataclass
+class LegacySupportTicket:
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    user_name: Optional[str] = None
+    message: Optional[str] = None
+    response: Optional[str] = None
+    status: str = "open"
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+def legacy_user_from_row(result):
+    created_at = result[3]
+    if created_at:
+        created_at = datetime.fromisoformat(created_at)
+    return LegacyTelegramUser(
+        telegram_id=result[0],
+        marzban_username=result[1],
+        subscription_type=result[2],
+        created_at=created_at
+    )
+
+
+def legacy_ticket_from_row(result):
+    return LegacySupportTicket(
+        id=result[0],
+        user_id=result[1],
+        user_name=result[2],
+        message=result[3],
+        response=result[4],
+        status=result[5],
+        created_at=datetime.fromisoformat(result[6]) if result[6] else None,
+        updated_at=datetime.fromisoformat(result[7]) if result[7] else None
+    )
+
+
+# === Входные данные ===
+def make_payloads(number: int) -> List[Dict[str, Any]]:
+    now = int(time.time())
+    return [
+        {
+            "username": f"qwqvpn_{index}",
+            "status": "active" if index % 3 else "expired",
+            "expire": now + (index % 90) * 86400 if index % 2 else None,
+            "used_traffic": index * 1_048_576,
+            "data_limit": 0 if index % 2 else 50 * 1024 ** 3,
+            "proxies": {
+                "vless": {"id": "00000000-0000-0000-0000-000000000000", "flow": ""},
+                "trojan": {"password": "secret", "server": "node.example.com"},
+            },
+        }
+        for index in range(number)
+    ]
+
+
+def make_user_rows(number: int):
+    return [(index, f"qwqvpn_{index}", "monthly", "2024-05-01 12:00:00") for index in range(number)]
+
+
+def make_ticket_rows(number: int):
+    return [
+        (index, index, f"user{index}", "Не работает VPN", None, "open", "2024-05-01 12:00:00", "2024-05-01 12:30:00")
+        for index in range(number)
+    ]
+
+
+def materialize(build, inputs):
+    """Время создания и память, занятая созданными объектами"""
+    gc.collect()
+    started = time.perf_counter()
+    objects = [build(item) for item in inputs]
+    elapsed = time.perf_counter() - started
+    del objects
+
+    # Память меряется отдельным проходом: tracemalloc заметно замедляет код
+    gc.collect()
+    tracemalloc.start()
+    objects = [build(item) for item in inputs]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=100_000, help="Число создаваемых объектов")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.number)
+    user_rows = make_user_rows(args.number)
+    ticket_rows = make_ticket_rows(args.number)
+
+    cases = [
+        (
+            "SubscriptionInfo + is_active",
+            payloads,
+            lambda data: LegacySubscriptionInfo.from_marzban_data(data, "https://sub").is_active,
+            lambda data: SubscriptionInfo.from_marzban_data(data, "https://sub").is_active,
+        ),
+        (
+            "SubscriptionInfo (объекты)",
+            payloads,
+            lambda data: LegacySubscriptionInfo.from_marzban_data(data, "https://sub"),
+            lambda data: SubscriptionInfo.from_marzban_data(data, "https://sub"),
+        ),
+        ("TelegramUser из строки", user_rows, legacy_user_from_row, TelegramUser.from_row),
+        ("SupportTicket из строки", ticket_rows, legacy_ticket_from_row, SupportTicket.from_row),
+    ]
+
+    print(f"{args.number} объектов на замер")
+    print(f"{'модель':<30} {'было, с':>8} {'стало, с':>9} {'было, МБ':>9} {'стало, МБ':>10}")
+    for title, inputs, legacy, current in cases:
+        legacy_time, legacy_size = materialize(legacy, inputs)
+        current_time, current_size = materialize(current, inputs)
+        print(
+            f"{title:<30} {legacy_time:>8.3f} {current_time:>9.3f} "
+            f"{legacy_size / 2 ** 20:>9.1f} {current_size / 2 ** 20:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Бенчмарк частичного изменения пользователей Marzban.
+
+MarzbanAPIClient работает с поддельной панелью в памяти (httpx.MockTransport),
+поэтому запросы сериализуются настоящим клиентом. Панель считает запросы,
+байты тела и перенастройки прокси: так панель реагирует на поле ``proxies``
+в запросе. Каждая перенастройка стоит ``--reconfig-ms`` миллисекунд.
+Продление срока N пользователям выполняется через modify_user и patch_user.
+
+    python benchmarks/patch_user_cost.py --number 500 --reconfig-ms 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from marzban import MarzbanAPI  # noqa: E402
+from marzban.models import Token  # noqa: E402
+
+from infrastructure.marzban.api_client import MarzbanAPIClient  # noqa: E402
+
+
+class FakePanel:
+    """Обработчик запросов Marzban: только PUT /api/user/{username}"""
+
+    def __init__(self, reconfig_cost: float):
+        self.reconfig_cost = reconfig_cost
+        self.requests = 0
+        self.body_bytes = 0
+        self.reconfigurations = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.body_bytes += len(request.content)
+        body = json.loads(request.content or b"{}")
+        if "proxies" in body:
+            # Панель пересобирает настройки прокси и конфигурацию xray
+            self.reconfigurations += 1
+            await asyncio.sleep(self.reconfig_cost)
+        username = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json={"username": username, "status": "active", **body})
+
+
+def make_client(panel: FakePanel) -> MarzbanAPIClient:
+    client = MarzbanAPIClient("http://panel.local", "admin", "secret")
+    client.api = MarzbanAPI(base_url=client.base_url)
+    client.api.client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(panel))
+    client.token = Token(access_token="token")
+    return client
+
+
+async def measure(method_name: str, number: int, reconfig_cost: float):
+    panel = FakePanel(reconfig_cost)
+    client = make_client(panel)
+    method = getattr(client, method_name)
+    expire = int(time.time()) + 86400
+
+    started = time.perf_counter()
+    for index in range(number):
+        await method(f"qwqvpn_{index}", {"expire": expire})
+    elapsed = time.perf_counter() - started
+    await client.api.client.aclose()
+    return panel, elapsed
+
+
+async def run(args):
+    reconfig_cost = args.reconfig_ms / 1000
+    print(f"{'метод':<12} | {'запросов':>8} | {'байт/запрос':>11} | {'перенастроек':>12} | {'время, с':>8}")
+    for method_name in ("modify_user", "patch_user"):
+        panel, elapsed = await measure(method_name, args.number, reconfig_cost)
+        print(
+            f"{method_name:<12} | {panel.requests:>8} | {panel.body_bytes / panel.requests:>11.1f} | "
+            f"{panel.reconfigurations:>12} | {elapsed:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=500, help="Число изменяемых пользователей")
+    parser.add_argument("--reconfig-ms", type=float, default=2.0, help="Стоимость перенастройки прокси, мс")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
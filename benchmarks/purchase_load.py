@@ -0,0 +1,149 @@
+"""
+Нагрузочный тест покупки: сколько одновременных покупателей выдерживает бот.
+
+Виртуальные пользователи приходят пуассоновским потоком с заданной
+интенсивностью (``--rates``, пользователей в секунду) и проходят сценарий
+UserHandlers целиком: /start → «🛒 Купить подписку» → «📅 По времени» →
+ввод числа месяцев → pre-checkout → оплата и сообщение об активации →
+«📊 Моя подписка». Бот собирается main.build_application поверх заглушек
+Bot API и панели Marzban (benchmarks/fakes.py); для каждой интенсивности
+создается новый экземпляр бота с пустой базой.
+
+Для каждой интенсивности выводятся p50/p99 обработки одного обновления
+(задержка ответа, которую видит пользователь в Telegram), p50/p99 всего
+сценария, задержка цикла событий и число запросов к панели.
+
+    python benchmarks/purchase_load.py --users 200 --rates 5 20 50 100 --panel-latency-ms 20
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+# fakes задает окружение до импорта core.config
+from fakes import BotHarness
+
+from core.config import config
+
+SESSION_TIMEOUT = 120
+
+_user_ids = itertools.count(30_000_000)
+
+
+class LoopLagMonitor:
+    """Запаздывание цикла событий: насколько позже срабатывает sleep(interval)"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(loop.time() - started - self.interval)
+
+
+async def virtual_user(harness: BotHarness, step_latencies: List[float]) -> float:
+    user_id = next(_user_ids)
+    payload, price = f"monthly:1:{user_id}", config.STAR_PRICE_PER_MONTH
+
+    async def step(update):
+        started = time.perf_counter()
+        await update
+        step_latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await step(harness.text(user_id, "/start"))
+    await step(harness.callback(user_id, "buy_subscription"))
+    await step(harness.callback(user_id, "choose_monthly"))
+    await step(harness.text(user_id, "1"))
+    await step(harness.pre_checkout(user_id, payload, price))
+    activated = harness.bot_api.wait_for(user_id, "подписка активирована")
+    await step(harness.successful_payment(user_id, payload, price))
+    await asyncio.wait_for(activated, SESSION_TIMEOUT)
+    await step(harness.callback(user_id, "my_subscription"))
+    return time.perf_counter() - started
+
+
+async def run_scenario(args, rate: float):
+    step_latencies: List[float] = []
+    sessions: List[float] = []
+    failures: Counter = Counter()
+    monitor = LoopLagMonitor()
+
+    async with BotHarness(
+        range(0),
+        panel_latency=args.panel_latency_ms / 1000,
+        bot_api_latency=args.bot_latency_ms / 1000,
+    ) as harness:
+        async def session():
+            try:
+                sessions.append(await virtual_user(harness, step_latencies))
+            except Exception as e:
+                failures[repr(e)] += 1
+
+        monitor.start()
+        started = time.perf_counter()
+        tasks = []
+        for _ in range(args.users):
+            tasks.append(asyncio.create_task(session()))
+            await asyncio.sleep(random.expovariate(rate))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+        panel_requests = Counter(harness.panel.requests)
+
+    steps = np.array(step_latencies or [0.0]) * 1000
+    total = np.array(sessions or [0.0]) * 1000
+    lags = np.array(monitor.lags or [0.0]) * 1000
+    print(
+        f"{rate:>7g} | {len(sessions):>6} | {sum(failures.values()):>6} | {np.percentile(steps, 50):>7.1f} | "
+        f"{np.percentile(steps, 99):>7.1f} | {np.percentile(total, 50):>8.1f} | {np.percentile(total, 99):>8.1f} | "
+        f"{np.percentile(lags, 99):>7.1f} | {lags.max():>7.1f} | {sum(panel_requests.values()):>6} | "
+        f"{len(sessions) / elapsed:>8.1f}"
+    )
+    if args.verbose:
+        for route, count in panel_requests.most_common():
+            print(f"          {route}: {count}")
+    for error, count in failures.most_common():
+        print(f"          ошибка ({count}): {error}")
+
+
+async def run(args):
+    random.seed(args.seed)
+    print(
+        f"{'польз/с':>7} | {'успех':>6} | {'ошибок':>6} | {'шаг p50':>7} | {'шаг p99':>7} | "
+        f"{'весь p50':>8} | {'весь p99':>8} | {'лаг p99':>7} | {'лаг max':>7} | {'панель':>6} | {'готово/с':>8}"
+    )
+    for rate in args.rates:
+        await run_scenario(args, rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200, help="Виртуальных пользователей на интенсивность")
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 20, 50, 100], help="Пользователей в секунду")
+    parser.add_argument("--panel-latency-ms", type=float, default=20.0, help="Задержка ответа панели, мс")
+    parser.add_argument("--bot-latency-ms", type=float, default=0.0, help="Задержка ответа Bot API, мс")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="Запросы к панели по методам")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Бенчмарк обращений к Marzban при покупке подписки.
+
+Покупка выполняется через SubscriptionService против поддельной панели,
+которая отвечает с заданной задержкой и считает вызовы. Прежний сценарий
+(после modify_user/create_user — повторный get_user и отдельный запрос
+ссылки на подписку) воспроизведен подклассом ниже. Для каждой задержки
+выводятся число обращений к панели на одну покупку и время покупки.
+
+    python benchmarks/purchase_roundtrips.py --number 20 --latency 0.01 0.05 0.1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.models import SubscriptionInfo, SubscriptionResult  # noqa: E402
+from domain.services.subscription_service import SubscriptionService  # noqa: E402
+
+
+class FakeMarzbanPanel:
+    """Панель Marzban в памяти: каждый вызов ждет ``latency`` секунд"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.calls: Counter = Counter()
+
+    async def _roundtrip(self, method: str):
+        self.calls[method] += 1
+        await asyncio.sleep(self.latency)
+
+    def _response(self, username: str) -> Dict[str, Any]:
+        user = dict(self.users[username])
+        user["subscription_url"] = f"https://panel.example.com/sub/{username}"
+        return user
+
+    async def get_user(self, username: str) -> Optional[Dict[str, Any]]:
+        await self._roundtrip("get_user")
+        return self._response(username) if username in self.users else None
+
+    async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        await self._roundtrip("create_user")
+        self.users[user_data["username"]] = {"used_traffic": 0, **user_data}
+        return self._response(user_data["username"])
+
+    async def modify_user(self, username: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        await self._roundtrip("modify_user")
+        self.users[username].update(user_data)
+        return self._response(username)
+
+    async def get_user_subscription(self, username: str) -> str:
+        user = await self.get_user(username)
+        return user["subscription_url"]
+
+
+class FakeUserService:
+    async def update_user_subscription_type(self, telegram_id: int, subscription_type: str):
+        return None
+
+
+class FakeSnapshotRepository:
+    async def upsert_many(self, users):
+        return None
+
+
+class LegacySubscriptionService(SubscriptionService):
+    """Прежнее получение результата: ответ панели отбрасывается и запрашивается заново"""
+
+    async def _purchase_result(self, telegram_id, username, subscription_type, user_data):
+        try:
+            await self.user_service.update_user_subscription_type(telegram_id, subscription_type)
+            user_data = await self.marzban_client.get_user(username)
+            await self._save_snapshot(user_data)
+            subscription_url = await self._get_subscription_url_with_retry(username)
+            subscription_info = SubscriptionInfo.from_marzban_data(user_data, subscription_url)
+        except Exception:
+            return SubscriptionResult(success=True, context="purchase")
+        return SubscriptionResult(success=True, subscription_info=subscription_info)
+
+
+async def measure(service_class, latency: float, number: int):
+    panel = FakeMarzbanPanel(latency)
+    service = service_class(panel, FakeUserService(), FakeSnapshotRepository())
+
+    started = time.perf_counter()
+    for telegram_id in range(number):
+        # Первая покупка создает пользователя, вторая продлевает подписку
+        for _ in range(2):
+            result = await service.purchase_monthly_subscription(telegram_id, 1)
+            assert result.subscription_info is not None
+    elapsed = time.perf_counter() - started
+
+    purchases = number * 2
+    return sum(panel.calls.values()) / purchases, elapsed / purchases
+
+
+async def run(args):
+    print(f"{'задержка, мс':>12} | {'вариант':<8} | {'вызовов':>7} | {'покупка, мс':>11}")
+    for latency in args.latency:
+        for name, service_class in (("прежний", LegacySubscriptionService), ("текущий", SubscriptionService)):
+            calls, seconds = await measure(service_class, latency, args.number)
+            print(f"{latency * 1000:>12.0f} | {name:<8} | {calls:>7.1f} | {seconds * 1000:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20, help="Пользователей (по две покупки на каждого)")
+    parser.add_argument(
+        "--latency", type=float, nargs="+", default=[0.01, 0.05, 0.1], help="Задержки панели, секунды"
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
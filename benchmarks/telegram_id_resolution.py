@@ -0,0 +1,108 @@
+"""
+Бенчмарк определения Telegram ID для уведомлений о начислении.
+
+Во временной базе SQLite создается ``--number`` пользователей бота, из них
+доля ``--hit-ratio`` известна боту, остальные — только панели (поддельная,
+с задержкой ``--latency-ms``). Сравниваются поштучный поиск (запрос к базе на
+каждого пользователя, при промахе — get_user в панели) и TelegramIdResolver.
+
+    python benchmarks/telegram_id_resolution.py --number 5000 --hit-ratio 0.9 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infrastructure.database.repositories import UserRepository  # noqa: E402
+from domain.services.telegram_id_resolver import TelegramIdResolver  # noqa: E402
+from domain.services.user_service import UserService  # noqa: E402
+
+
+class FakeMarzbanPanel:
+    """get_user с задержкой; telegram_id есть у каждого пользователя"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def get_user(self, username: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {"username": username, "telegram_id": int(username.rsplit("_", 1)[1])}
+
+
+class CountingUserRepository(UserRepository):
+    def __init__(self, db_path: str):
+        super().__init__(db_path)
+        self.queries = 0
+
+    async def get_by_marzban_username(self, username: str):
+        self.queries += 1
+        return await super().get_by_marzban_username(username)
+
+    async def get_telegram_ids_by_usernames(self, usernames):
+        self.queries += -(-len(usernames) // self.IN_CHUNK_SIZE)
+        return await super().get_telegram_ids_by_usernames(usernames)
+
+
+def fill_database(db_path: str, number: int, hit_ratio: float):
+    known = int(number * hit_ratio)
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO bot_users (telegram_id, marzban_username, subscription_type) VALUES (?, ?, 'monthly')",
+            [(index, f"qwqvpn_{index}") for index in range(1, known + 1)]
+        )
+        conn.commit()
+
+
+async def legacy_resolve(repository: UserRepository, panel: FakeMarzbanPanel, usernames):
+    found = {}
+    for username in usernames:
+        user = await repository.get_by_marzban_username(username)
+        if user and user.telegram_id:
+            found[username] = user.telegram_id
+            continue
+        marzban_user = await panel.get_user(username)
+        if marzban_user and marzban_user.get("telegram_id"):
+            found[username] = marzban_user["telegram_id"]
+    return found
+
+
+async def run(args):
+    usernames = [f"qwqvpn_{index}" for index in range(1, args.number + 1)]
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.db")
+        UserRepository(db_path)
+        fill_database(db_path, args.number, args.hit_ratio)
+
+        print(f"{'способ':<10} | {'запросов к базе':>15} | {'запросов к панели':>17} | {'время, с':>8}")
+        for name in ("поштучно", "пачкой"):
+            repository = CountingUserRepository(db_path)
+            panel = FakeMarzbanPanel(args.latency_ms / 1000)
+            started = time.perf_counter()
+            if name == "поштучно":
+                found = await legacy_resolve(repository, panel, usernames)
+            else:
+                resolver = TelegramIdResolver(UserService(repository), panel, concurrency=args.concurrency)
+                found = await resolver.resolve(usernames)
+            elapsed = time.perf_counter() - started
+            assert len(found) == args.number
+            print(f"{name:<10} | {repository.queries:>15} | {panel.calls:>17} | {elapsed:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=5000, help="Пользователей для уведомления")
+    parser.add_argument("--hit-ratio", type=float, default=0.9, help="Доля пользователей, известных боту")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Задержка ответа панели, мс")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных запросов к панели")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Бенчмарк аналитики пользовательской базы.
+
+Для синтетических снимков подписок (по умолчанию 10k, 100k и 1M строк в
+формате SubscriptionSnapshotRepository.get_usage_rows) считаются те же
+агрегаты, что на экране системной статистики: статусы, истечения по дням,
+процентили расхода трафика, доля близких к лимиту и сегменты. Сравниваются
+построчный расчет на Python и AnalyticsService.compute на NumPy; для NumPy
+отдельно показано время перевода строк в массивы.
+
+    python benchmarks/user_analytics.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain.services.analytics_service import (  # noqa: E402
+    ACTIVE,
+    DAY,
+    EXPIRED,
+    LIMITED,
+    STATUS_CODES,
+    AnalyticsService,
+    SnapshotArrays,
+)
+
+
+def make_rows(number: int, now: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    status = rng.choice(len(STATUS_CODES) + 1, size=number, p=[0.6, 0.2, 0.1, 0.05, 0.03, 0.02])
+    expire = np.where(rng.random(number) < 0.8, now + rng.integers(-30, 90, number) * DAY, 0)
+    data_limit = np.where(rng.random(number) < 0.5, rng.integers(1, 200, number) * 1024 ** 3, 0)
+    used = (rng.random(number) * np.maximum(data_limit, 50 * 1024 ** 3)).astype(np.int64)
+    return list(zip(status.tolist(), expire.tolist(), data_limit.tolist(), used.tolist()))
+
+
+def naive_analytics(rows, now: int):
+    """Тот же расчет построчно, как без NumPy"""
+    service = AnalyticsService
+    status_counts = [0] * (len(STATUS_CODES) + 1)
+    expiring_per_day = [0] * service.EXPIRY_HORIZON_DAYS
+    ratios = []
+    limited_users = near_limit = 0
+    segments = dict.fromkeys(
+        ("monthly_active", "traffic_active", "renewal_due", "upsell_near_limit", "winback"), 0
+    )
+    for status, expire, data_limit, used in rows:
+        status_counts[status] += 1
+        active = status == ACTIVE
+        seconds_left = expire - now
+        if active and expire > 0 and 0 < seconds_left < service.EXPIRY_HORIZON_DAYS * DAY:
+            expiring_per_day[seconds_left // DAY] += 1
+        near = False
+        if data_limit > 0:
+            limited_users += 1
+            ratio = used / data_limit
+            ratios.append(ratio * 100)
+            near = ratio >= service.NEAR_LIMIT_RATIO
+            near_limit += near
+        if active:
+            segments["traffic_active" if data_limit > 0 else "monthly_active"] += 1
+            if now < expire <= now + service.RENEWAL_WINDOW_DAYS * DAY:
+                segments["renewal_due"] += 1
+            if near:
+                segments["upsell_near_limit"] += 1
+        if status in (EXPIRED, LIMITED):
+            segments["winback"] += 1
+    ratios.sort()
+    percentiles = {}
+    for p in service.PERCENTILES:
+        # Линейная интерполяция, как np.percentile по умолчанию
+        position = (len(ratios) - 1) * p / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ratios) - 1)
+        percentiles[p] = round(ratios[lower] + (ratios[upper] - ratios[lower]) * (position - lower), 1)
+    return status_counts, expiring_per_day, percentiles, limited_users, near_limit, segments
+
+
+def best_of(repeat: int, func, *args):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов, берется лучший")
+    args = parser.parse_args()
+
+    now = int(time.time())
+    print(f"{'строк':>9} | {'Python, мс':>10} | {'в массивы, мс':>13} | {'NumPy, мс':>9} | {'ускорение':>9}")
+    for size in args.sizes:
+        rows = make_rows(size, now)
+        naive_time, naive = best_of(args.repeat, naive_analytics, rows, now)
+        convert_time, arrays = best_of(args.repeat, SnapshotArrays.from_rows, rows)
+        numpy_time, analytics = best_of(args.repeat, AnalyticsService.compute, arrays, now)
+
+        assert naive[1] == analytics.expiring_per_day
+        assert naive[2] == analytics.usage_percentiles
+        assert naive[4] == analytics.near_limit and naive[5] == analytics.segments
+
+        print(
+            f"{size:>9} | {naive_time * 1000:>10.1f} | {convert_time * 1000:>13.1f} | "
+            f"{numpy_time * 1000:>9.1f} | {naive_time / numpy_time:>8.1f}x"
+        )
+        del rows, arrays
+
+
+if __name__ == "__main__":
+    main()
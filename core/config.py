@@ -14,22 +14,51 @@ class Config:
     MARZBAN_PASSWORD = os.getenv("MARZBAN_PASSWORD")
     ADMIN_TG_IDS = [int(x.strip()) for x in os.getenv("ADMIN_TG_IDS", "").split(",") if x.strip()]
     SUPPORT_TG_IDS = [int(x.strip()) for x in os.getenv("SUPPORT_TG_IDS", "").split(",") if x.strip()]
+    # Множества для проверки ролей за O(1); списки выше сохраняют порядок из .env
+    ADMIN_TG_ID_SET = frozenset(ADMIN_TG_IDS)
+    SUPPORT_TG_ID_SET = frozenset(SUPPORT_TG_IDS)
     DB_PATH = os.getenv("DB_PATH", "vpn_bot.db")
     MARZBAN_API_PREFIX = os.getenv("MARZBAN_API_PREFIX", "")
     VERIFY_SSL = os.getenv("VERIFY_SSL", "False").lower() == "true"
     USERS_PER_PAGE = int(os.getenv("USERS_PER_PAGE", "20"))
     ADMINS_PER_PAGE = int(os.getenv("ADMINS_PER_PAGE", "50"))
+    ADMIN_PAGE_CACHE_TTL = float(os.getenv("ADMIN_PAGE_CACHE_TTL", "30"))
+    ADMIN_GATHER_TIMEOUT = float(os.getenv("ADMIN_GATHER_TIMEOUT", "5"))
+    TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "traces.jsonl")
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+    TELEGRAM_PER_CHAT_INTERVAL = float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL", "1.0"))
+    BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "100"))
+    SNAPSHOT_SYNC_INTERVAL = int(os.getenv("SNAPSHOT_SYNC_INTERVAL", "900"))
+    TICKET_ALERT_DIGEST_THRESHOLD = int(os.getenv("TICKET_ALERT_DIGEST_THRESHOLD", "5"))
+    TICKET_ALERT_DIGEST_WINDOW = int(os.getenv("TICKET_ALERT_DIGEST_WINDOW", "60"))
+    FULFILLMENT_WORKERS = int(os.getenv("FULFILLMENT_WORKERS", "2"))
+    FULFILLMENT_MAX_ATTEMPTS = int(os.getenv("FULFILLMENT_MAX_ATTEMPTS", "5"))
+    FULFILLMENT_RETRY_DELAY = float(os.getenv("FULFILLMENT_RETRY_DELAY", "5"))
+    MASS_OPERATION_BATCH_SIZE = int(os.getenv("MASS_OPERATION_BATCH_SIZE", "50"))
+    MASS_OPERATION_CONCURRENCY = int(os.getenv("MASS_OPERATION_CONCURRENCY", "4"))
+    MASS_OPERATION_UNDO_RETENTION_DAYS = float(os.getenv("MASS_OPERATION_UNDO_RETENTION_DAYS", "7"))
 
     @classmethod
     def is_admin(cls, user_id: int) -> bool:
-        return user_id in cls.ADMIN_TG_IDS
+        return user_id in cls.ADMIN_TG_ID_SET
 
     @classmethod
     def is_support(cls, user_id: int) -> bool:
-        return user_id in cls.SUPPORT_TG_IDS and user_id not in cls.ADMIN_TG_IDS
+        return user_id in cls.SUPPORT_TG_ID_SET and user_id not in cls.ADMIN_TG_ID_SET
 
     @classmethod
     def has_support_access(cls, user_id: int) -> bool:
-        return user_id in cls.SUPPORT_TG_IDS or user_id in cls.ADMIN_TG_IDS
+        return user_id in cls.SUPPORT_TG_ID_SET or user_id in cls.ADMIN_TG_ID_SET
+
+    @classmethod
+    def role(cls, user_id: int) -> str:
+        """Роль пользователя для выбора меню: admin, support или user"""
+        if user_id in cls.ADMIN_TG_ID_SET:
+            return "admin"
+        if user_id in cls.SUPPORT_TG_ID_SET:
+            return "support"
+        return "user"
 
 config = Config()
@@ -0,0 +1,55 @@
+# core/gather.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class PartialResults:
+    """Результаты одновременных запросов; источники без ответа перечислены в ``missing``"""
+
+    __slots__ = ("values", "missing")
+
+    def __init__(self, values: Dict[str, Any], missing: List[str]):
+        self.values = values
+        self.missing = missing
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.values.get(name, default)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.values
+
+
+async def gather_partial(sources: Dict[str, Awaitable[Any]], timeout: float) -> PartialResults:
+    """
+    Выполняет независимые запросы одновременно с общим таймаутом.
+
+    Источник, не ответивший за ``timeout`` секунд или завершившийся ошибкой,
+    попадает в ``missing``; остальные результаты доступны по имени. Экран
+    строится из того, что успело прийти, вместо ожидания самого медленного.
+    """
+    tasks = {name: asyncio.ensure_future(source) for name, source in sources.items()}
+    if tasks:
+        try:
+            await asyncio.wait(tasks.values(), timeout=timeout)
+        except asyncio.CancelledError:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+    values: Dict[str, Any] = {}
+    missing: List[str] = []
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            missing.append(name)
+            logger.warning(f"Источник «{name}» не ответил за {timeout:g} с")
+        elif task.cancelled() or task.exception() is not None:
+            missing.append(name)
+            if not task.cancelled():
+                logger.warning(f"Источник «{name}» вернул ошибку: {task.exception()}")
+        else:
+            values[name] = task.result()
+    return PartialResults(values, missing)
@@ -0,0 +1,95 @@
+# core/profiling.py
+import asyncio
+import cProfile
+import marshal
+import os
+import pstats
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from core.config import config
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfilerBusyError(Exception):
+    """Профилирование уже идет: одновременно профилировщик может быть только один"""
+
+
+@dataclass
+class ProfileReport:
+    """Итоги окна профилирования"""
+    duration: float
+    total_calls: int
+    # (функция, вызовов, собственное время, накопленное время) по убыванию накопленного
+    top: List[Tuple[str, int, float, float]]
+    # Статистика в формате pstats (то же, что пишет Profile.dump_stats)
+    stats: bytes
+
+
+class CpuProfiler:
+    """
+    Профилирование работающего бота на ограниченное окно.
+
+    cProfile включается только на время окна и только для потока цикла
+    событий — в нем выполняются все обработчики и фоновые задачи. Вне окна
+    хук профилирования не установлен, и профилировщик ничего не стоит. Код,
+    вынесенный в asyncio.to_thread, в статистику не попадает.
+    """
+
+    def __init__(self, max_seconds: float = 60, top: int = 20):
+        self.max_seconds = max_seconds
+        self.top = top
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float) -> ProfileReport:
+        """Профилирует процесс ``seconds`` секунд (не больше max_seconds)"""
+        if self.running:
+            raise ProfilerBusyError()
+        seconds = min(max(seconds, 0.0), self.max_seconds)
+        async with self._lock:
+            profile = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            duration = time.perf_counter() - started
+        return await asyncio.to_thread(self._build_report, profile, duration)
+
+    def _build_report(self, profile: cProfile.Profile, duration: float) -> ProfileReport:
+        stats = pstats.Stats(profile)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        top = [
+            (_format_function(function), calls, own_time, cumulative_time)
+            for function, (_, calls, own_time, cumulative_time, _) in rows[:self.top]
+        ]
+        return ProfileReport(
+            duration=duration,
+            total_calls=stats.total_calls,
+            top=top,
+            stats=marshal.dumps(stats.stats),
+        )
+
+
+def _format_function(function: Tuple[str, int, str]) -> str:
+    """Короткое имя функции: путь от корня проекта или от site-packages"""
+    filename, line, name = function
+    if filename == "~":
+        return name
+    if filename.startswith(PROJECT_ROOT + os.sep):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{line}({name})"
+
+
+profiler = CpuProfiler(max_seconds=config.PROFILE_MAX_SECONDS)
@@ -4,12 +4,12 @@ from core.config import config
 
 def is_admin(user_id: int) -> bool:
     """Проверка: является ли пользователь администратором"""
-    return user_id in config.ADMIN_TG_IDS
+    return user_id in config.ADMIN_TG_ID_SET
 
 
 def is_support(user_id: int) -> bool:
     """Проверка: является ли пользователь сотрудником поддержки"""
-    return user_id in config.SUPPORT_TG_IDS
+    return user_id in config.SUPPORT_TG_ID_SET
 
 
 def is_user(user_id: int) -> bool:
@@ -0,0 +1,94 @@
+# core/templates.py
+import functools
+import html
+from datetime import datetime
+from string import Formatter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+
+# Преобразования в поле шаблона: {name!h}
+_CONVERSIONS: Dict[str, Callable[[Any], str]] = {
+    "s": str,
+    "r": repr,
+    "h": lambda value: html.escape(str(value)),   # экранирование для parse_mode="HTML"
+    "u": lambda value: quote(str(value)),         # значение параметра в ссылке
+}
+
+
+def format_datetime(value: Optional[datetime], default: str = "—") -> str:
+    """Дата в формате сообщений бота"""
+    if value is None:
+        return default
+    return value.strftime(DATETIME_FORMAT)
+
+
+class MessageTemplate:
+    """
+    Шаблон текста сообщения.
+
+    Синтаксис как у ``str.format``: ``{name}``, ``{name:.1f}``, плюс
+    преобразования ``!h`` (html.escape) и ``!u`` (URL-кодирование).
+    Строка разбирается один раз, при создании шаблона: статические фрагменты
+    и поля хранятся готовыми, рендер только склеивает части.
+
+    Результат зависит только от переданных значений, поэтому рендеры
+    кешируются (LRU) по кортежу значений и их типов (1 и 1.0 форматируются
+    по-разному); для нехешируемых значений кеш пропускается.
+    """
+
+    def __init__(self, source: str, cache_size: int = 256):
+        self.source = source
+        self._parts: List[Tuple[str, Optional[str], str, Optional[Callable[[Any], str]]]] = []
+        names: List[str] = []
+
+        for literal, name, spec, conversion in Formatter().parse(source):
+            if name is not None:
+                if not name.isidentifier():
+                    raise ValueError(f"Поле шаблона должно быть именем: {{{name}}}")
+                if conversion is not None and conversion not in _CONVERSIONS:
+                    raise ValueError(f"Неизвестное преобразование !{conversion} в поле {{{name}}}")
+                if "{" in spec:
+                    raise ValueError(f"Вложенные поля в формате не поддерживаются: {{{name}:{spec}}}")
+                if name not in names:
+                    names.append(name)
+            self._parts.append((literal, name, spec, _CONVERSIONS.get(conversion) if conversion else None))
+
+        self.fields: Tuple[str, ...] = tuple(names)
+        if cache_size > 0:
+            self._render_cached = functools.lru_cache(maxsize=cache_size)(self._render_cached)
+
+    def render(self, **values: Any) -> str:
+        try:
+            key = tuple(values[name] for name in self.fields)
+        except KeyError as e:
+            raise KeyError(f"Не передано значение для поля шаблона {e.args[0]!r}") from None
+        try:
+            return self._render_cached(key, tuple(map(type, key)))
+        except TypeError:  # нехешируемое значение
+            return self._render(key)
+
+    def _render_cached(self, key: Tuple[Any, ...], types: Tuple[type, ...]) -> str:
+        return self._render(key)
+
+    def _render(self, key: Tuple[Any, ...]) -> str:
+        values = dict(zip(self.fields, key))
+        chunks = []
+        for literal, name, spec, convert in self._parts:
+            if literal:
+                chunks.append(literal)
+            if name is None:
+                continue
+            value = values[name]
+            if convert is not None:
+                value = convert(value)
+            chunks.append(format(value, spec) if spec else str(value))
+        return "".join(chunks)
+
+    def cache_info(self):
+        info = getattr(self._render_cached, "cache_info", None)
+        return info() if info else None
+
+    def __repr__(self) -> str:
+        return f"MessageTemplate({self.source[:40]!r}…)"
@@ -0,0 +1,165 @@
+# core/tracing.py
+import functools
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Trace:
+    """Набор спанов одного обновления (одного корневого спана)"""
+
+    __slots__ = ("trace_id", "spans", "closed")
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.spans: List["Span"] = []
+        self.closed = False
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "duration", "attrs", "error")
+
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+    def set_attr(self, key: str, value: Any):
+        self.attrs[key] = value
+
+    def to_record(self) -> Dict[str, Any]:
+        record = {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Легковесная трассировка на contextvars.
+
+    Корневой спан открывается в middleware диспетчера через ``trace()``; там же
+    принимается решение о семплировании. Вложенные ``span()`` и функции с
+    декоратором ``traced`` работают только внутри семплированного обновления,
+    в остальных случаях они сводятся к одному чтению ContextVar.
+    Завершённая трасса записывается в JSONL-файл одной пачкой строк.
+    """
+
+    def __init__(self, log_path: str = "", sample_rate: float = 0.0):
+        self._lock = threading.Lock()
+        self.configure(log_path, sample_rate)
+
+    def configure(self, log_path: str, sample_rate: float):
+        self.log_path = log_path
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.log_path) and self.sample_rate > 0
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def trace(self, name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+        """Открывает корневой спан, если обновление попало в выборку"""
+        if not self.enabled or _current_span.get() is not None or random.random() >= self.sample_rate:
+            yield None
+            return
+
+        trace = _Trace()
+        try:
+            with self._open(trace, name, None, attrs) as span:
+                yield span
+        finally:
+            trace.closed = True
+            self._write(trace)
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+        """Открывает дочерний спан внутри текущей трассы"""
+        parent = _current_span.get()
+        if parent is None or parent.trace.closed:
+            yield None
+            return
+
+        with self._open(parent.trace, name, parent.span_id, attrs) as span:
+            yield span
+
+    @contextmanager
+    def _open(self, trace: _Trace, name: str, parent_id: Optional[str], attrs: Dict[str, Any]) -> Iterator[Span]:
+        span = Span(trace, name, parent_id, attrs)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            if not trace.closed:
+                trace.spans.append(span)
+
+    def _write(self, trace: _Trace):
+        lines = "".join(
+            json.dumps(span.to_record(), ensure_ascii=False, default=str) + "\n"
+            for span in trace.spans
+        )
+        try:
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning(f"Не удалось записать трассу {trace.trace_id}: {e}")
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Оборачивает корутину в спан с именем ``name`` (по умолчанию — qualname функции)"""
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with tracer.span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+tracer = Tracer(config.TRACE_LOG_PATH, config.TRACE_SAMPLE_RATE)
@@ -1,5 +1,9 @@
 from .user import TelegramUser
 from .subscription import SubscriptionInfo, SubscriptionResult
 from .support import SupportTicket, SupportMessage
+from .broadcast import Broadcast, BroadcastAudience
+from .payment import PaymentOrder
+from .analytics import UserAnalytics
+from .mass_operation import MassGrantPlan, MassOperation
 
-__all__ = ['TelegramUser', 'SubscriptionInfo', 'SubscriptionResult', 'SupportTicket', 'SupportMessage']
\ No newline at end of file
+__all__ = ['TelegramUser', 'SubscriptionInfo', 'SubscriptionResult', 'SupportTicket', 'SupportMessage', 'Broadcast', 'BroadcastAudience', 'PaymentOrder', 'UserAnalytics', 'MassGrantPlan', 'MassOperation']
\ No newline at end of file
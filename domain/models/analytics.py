@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass(slots=True)
+class UserAnalytics:
+    """Распределения по снимкам подписок пользователей"""
+    total: int
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    # expiring_per_day[i] — число активных подписок, истекающих через i суток
+    expiring_per_day: List[int] = field(default_factory=list)
+    # Процентили доли израсходованного трафика, % от лимита (только пользователи с лимитом)
+    usage_percentiles: Dict[int, float] = field(default_factory=dict)
+    limited_users: int = 0
+    near_limit: int = 0
+    segments: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def near_limit_share(self) -> float:
+        return self.near_limit / self.limited_users if self.limited_users else 0.0
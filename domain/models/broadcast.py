@@ -0,0 +1,65 @@
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+
+@dataclass
+class BroadcastAudience:
+    """Фильтры получателей рассылки; пустая аудитория — все пользователи бота"""
+    subscription_type: Optional[str] = None  # monthly, traffic
+    status: Optional[str] = None  # статус пользователя в Marzban: active, expired, limited, disabled, on_hold
+    expires_within_days: Optional[int] = None
+    usage_above_percent: Optional[float] = None
+    never_purchased: bool = False
+
+    @property
+    def is_empty(self) -> bool:
+        return self == BroadcastAudience()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: value for key, value in asdict(self).items() if value not in (None, False)}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> 'BroadcastAudience':
+        data = data or {}
+        return cls(
+            subscription_type=data.get("subscription_type"),
+            status=data.get("status"),
+            expires_within_days=data.get("expires_within_days"),
+            usage_above_percent=data.get("usage_above_percent"),
+            never_purchased=bool(data.get("never_purchased", False)),
+        )
+
+    def describe(self) -> str:
+        if self.is_empty:
+            return "все пользователи"
+        parts: List[str] = []
+        if self.never_purchased:
+            parts.append("без покупок")
+        if self.subscription_type == "monthly":
+            parts.append("месячная подписка")
+        elif self.subscription_type == "traffic":
+            parts.append("тариф по трафику")
+        if self.status:
+            parts.append(f"статус {self.status}")
+        if self.expires_within_days is not None:
+            parts.append(f"истекает в течение {self.expires_within_days} дн.")
+        if self.usage_above_percent is not None:
+            parts.append(f"трафик израсходован более чем на {self.usage_above_percent:g}%")
+        return ", ".join(parts)
+
+
+@dataclass
+class Broadcast:
+    id: Optional[int] = None
+    text: str = ""
+    created_by: Optional[int] = None
+    status: str = "pending"  # pending, running, finished
+    cursor: int = 0  # последний обработанный telegram_id
+    sent_count: int = 0
+    failed_count: int = 0
+    blocked_count: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    audience: BroadcastAudience = field(default_factory=BroadcastAudience)
@@ -0,0 +1,56 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+
+@dataclass(slots=True)
+class MassGrantPlan:
+    """Предпросмотр массового начисления времени или трафика"""
+    kind: str  # hours, traffic
+    amount: float  # часы или ГБ, можно отрицательно
+    total: int  # пользователей в панели на момент расчета
+    # Пользователи, которым начисление действительно что-то меняет
+    usernames: List[str] = field(default_factory=list)
+    ineligible: int = 0  # без срока или без лимита — не затрагиваются
+    unchanged: int = 0  # начисление ничего не меняет (уже истекли или уперлись в израсходованное)
+    clamped: int = 0  # уменьшение упирается в текущий момент или израсходованный трафик
+    # Распределение пользователей со сроком или лимитом по корзинам до и после начисления
+    buckets: List[str] = field(default_factory=list)
+    before: List[int] = field(default_factory=list)
+    after: List[int] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def changed(self) -> int:
+        return len(self.usernames)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+@dataclass
+class MassOperation:
+    """Задание массового начисления с замороженным списком пользователей"""
+    id: Optional[int] = None
+    kind: str = ""  # hours, traffic
+    amount: float = 0
+    created_by: Optional[int] = None
+    status: str = "pending"  # pending, running, finished
+    total: int = 0  # пользователей в задании
+    updated_count: int = 0
+    skipped_count: int = 0  # начисление уже не требовалось или пользователь изменен извне
+    failed_count: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    undo_of: Optional[int] = None  # для отмены — задание, которое отменяется
+
+    @property
+    def is_undo(self) -> bool:
+        return self.undo_of is not None
+
+    @property
+    def processed(self) -> int:
+        return self.updated_count + self.skipped_count + self.failed_count
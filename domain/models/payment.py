@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Sequence, Any, Tuple
+
+PAYMENT_PLANS = ("monthly", "traffic")
+
+
+@dataclass(slots=True)
+class PaymentOrder:
+    """Оплаченный заказ в очереди выдачи подписок (таблица payments)"""
+    id: Optional[int] = None
+    telegram_id: int = 0
+    plan: str = "monthly"  # monthly, traffic
+    quantity: int = 0  # месяцы или ГБ
+    amount: int = 0
+    currency: str = "XTR"
+    payload: str = ""
+    charge_id: Optional[str] = None  # telegram_payment_charge_id
+    status: str = "pending"  # pending, processing, fulfilled, failed, needs_review
+    attempts: int = 0
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    fulfilled_at: Optional[datetime] = None
+    # Журнал записи в панель: expire или data_limit до и после выдачи.
+    # before_value None при заполненном target_value — пользователя в панели не было
+    before_value: Optional[int] = None
+    target_value: Optional[int] = None
+
+    @staticmethod
+    def parse_payload(payload: str) -> Tuple[str, int, int]:
+        """Разбирает payload инвойса ``plan:quantity:telegram_id``; ValueError при ошибке"""
+        plan, quantity, telegram_id = payload.split(":")
+        if plan not in PAYMENT_PLANS:
+            raise ValueError(f"Неизвестный тариф в payload: {plan}")
+        return plan, int(quantity), int(telegram_id)
+
+    @property
+    def fulfillment_seconds(self) -> Optional[float]:
+        """Время от записи оплаты до выдачи подписки"""
+        if self.created_at and self.fulfilled_at:
+            return (self.fulfilled_at - self.created_at).total_seconds()
+        return None
+
+    @property
+    def expected_values(self) -> Optional[Tuple[Optional[int], int]]:
+        """(значение до, значение после) из журнала; None — запись в панель еще не начиналась"""
+        if self.target_value is None:
+            return None
+        return self.before_value, self.target_value
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> 'PaymentOrder':
+        """Строка из payments в порядке полей модели"""
+        return cls(
+            *row[:11],
+            datetime.fromisoformat(row[11]) if row[11] else None,
+            datetime.fromisoformat(row[12]) if row[12] else None,
+            datetime.fromisoformat(row[13]) if row[13] else None,
+            *row[14:16],
+        )
@@ -1,87 +1,183 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
+
+GB = 1024 ** 3
+
+
+class _LazyField:
+    """
+    Поле SubscriptionInfo, вычисляемое из данных Marzban при первом обращении.
+
+    Значение хранится в слоте ``_<имя>``; пока слот не заполнен, поле не
+    вычислено. Присваивание записывает значение в слот напрямую.
+    """
+
+    __slots__ = ("compute", "member")
+
+    def __init__(self, compute: Callable[["SubscriptionInfo"], Any]):
+        self.compute = compute
+        self.member = None
+
+    def __set_name__(self, owner, name):
+        self.member = owner.__dict__["_" + name]
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return self.member.__get__(instance, owner)
+        except AttributeError:
+            value = self.compute(instance)
+            self.member.__set__(instance, value)
+            return value
+
+    def __set__(self, instance, value):
+        self.member.__set__(instance, value)
 
 
-@dataclass
 class SubscriptionInfo:
-    username: str
-    subscription_type: str
-    status: str
-    expire_date: Optional[datetime]
-    used_traffic_gb: float
-    data_limit_gb: Optional[float]
-    subscription_url: Optional[str]
-    is_active: bool
-    configs: Optional[List[str]] = None
-    months_count: Optional[int] = None
+    """
+    Информация о подписке пользователя.
+
+    Из ответа Marzban сразу берутся только имя, статус и ссылка; срок,
+    трафик, конфиги и число месяцев разбираются при первом обращении к полю.
+    """
+
+    __slots__ = (
+        "username",
+        "status",
+        "subscription_url",
+        "is_active",
+        "_data",
+        "_subscription_type",
+        "_expire_date",
+        "_used_traffic_gb",
+        "_data_limit_gb",
+        "_configs",
+        "_months_count",
+    )
+
+    FIELDS = (
+        "username",
+        "subscription_type",
+        "status",
+        "expire_date",
+        "used_traffic_gb",
+        "data_limit_gb",
+        "subscription_url",
+        "is_active",
+        "configs",
+        "months_count",
+    )
+
+    def __init__(
+        self,
+        username: str,
+        subscription_type: str,
+        status: str,
+        expire_date: Optional[datetime],
+        used_traffic_gb: float,
+        data_limit_gb: Optional[float],
+        subscription_url: Optional[str],
+        is_active: bool,
+        configs: Optional[List[str]] = None,
+        months_count: Optional[int] = None,
+    ):
+        self._data: Dict[str, Any] = {}
+        self.username = username
+        self.subscription_type = subscription_type
+        self.status = status
+        self.expire_date = expire_date
+        self.used_traffic_gb = used_traffic_gb
+        self.data_limit_gb = data_limit_gb
+        self.subscription_url = subscription_url
+        self.is_active = is_active
+        self.configs = configs
+        self.months_count = months_count
 
     @classmethod
     def from_marzban_data(cls, user_data: Dict[str, Any], subscription_url: Optional[str] = None) -> 'SubscriptionInfo':
         """Создает объект информации о подписке из данных Marzban API"""
-        data_limit = user_data.get('data_limit')
-        expire_timestamp = user_data.get('expire')
-        expire_date = None
+        info = cls.__new__(cls)
+        info._data = user_data
+        info.username = user_data.get('username', '')
+        info.status = "active" if user_data.get('status') == 'active' else "inactive"
+        info.is_active = info.status == 'active'
+        info.subscription_url = subscription_url
+        return info
+
+    # === Поля, вычисляемые по требованию ===
+    @_LazyField
+    def subscription_type(self) -> str:
+        data_limit = self._data.get('data_limit')
+        if not data_limit or data_limit == 0:
+            return "Ежемесячная подписка"
+        return "Тариф по трафику"
 
+    @_LazyField
+    def expire_date(self) -> Optional[datetime]:
+        expire_timestamp = self._data.get('expire')
         if expire_timestamp:
             try:
-                expire_date = datetime.fromtimestamp(expire_timestamp)
+                return datetime.fromtimestamp(expire_timestamp)
             except Exception:
-                expire_date = None
-
-        # Определяем тип подписки
-        if not data_limit or data_limit == 0:
-            subscription_type = "Ежемесячная подписка"
-        else:
-            subscription_type = "Тариф по трафику"
-
-        # Статус
-        status = "active" if user_data.get('status') == 'active' else "inactive"
+                return None
+        return None
 
-        # Использованный трафик
-        used_traffic = user_data.get('used_traffic', 0)
-        used_traffic_gb = round(used_traffic / (1024 ** 3), 2) if used_traffic else 0.0
+    @_LazyField
+    def used_traffic_gb(self) -> float:
+        used_traffic = self._data.get('used_traffic', 0)
+        return round(used_traffic / GB, 2) if used_traffic else 0.0
 
-        # Лимит трафика
-        data_limit_gb = None
+    @_LazyField
+    def data_limit_gb(self) -> Optional[float]:
+        data_limit = self._data.get('data_limit')
         if data_limit and data_limit > 0:
-            data_limit_gb = round(data_limit / (1024 ** 3), 2)
+            return round(data_limit / GB, 2)
+        return None
 
-        # Конфиги (если есть)
+    @_LazyField
+    def configs(self) -> List[str]:
         configs = []
-        proxies = user_data.get('proxies', {}) or {}
+        proxies = self._data.get('proxies', {}) or {}
         if isinstance(proxies, dict):
             for proto, cfg in proxies.items():
                 if isinstance(cfg, dict):
                     conf_str = cfg.get('server') or cfg.get('address') or ''
                     if conf_str:
                         configs.append(f"{proto}: {conf_str}")
+        return configs
 
+    @_LazyField
+    def months_count(self) -> Optional[int]:
         # Количество месяцев (для monthly)
-        months_count = None
+        expire_date = self.expire_date
         if expire_date:
             delta_days = (expire_date - datetime.utcnow()).days
             if delta_days > 0:
-                months_count = max(1, round(delta_days / 30))
-
-        return cls(
-            username=user_data.get('username', ''),
-            subscription_type=subscription_type,
-            status=status,
-            expire_date=expire_date,
-            used_traffic_gb=used_traffic_gb,
-            data_limit_gb=data_limit_gb,
-            subscription_url=subscription_url,
-            is_active=status == 'active',
-            configs=configs,
-            months_count=months_count,
-        )
-
-
-@dataclass
+                return max(1, round(delta_days / 30))
+        return None
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{self.__class__.__name__}({fields})"
+
+
+@dataclass(slots=True)
 class SubscriptionResult:
     success: bool
     subscription_info: Optional[SubscriptionInfo] = None
     error_message: Optional[str] = None
     context: str = "view"
     attempted_plan: Optional[str] = None
+    # Значение в панели изменено во время выдачи: повтор может начислить
+    # покупку дважды, заказ проверяет администратор
+    needs_review: bool = False
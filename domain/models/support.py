@@ -1,9 +1,9 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence, Any
 
 
-@dataclass
+@dataclass(slots=True)
 class SupportTicket:
     id: Optional[int] = None
     user_id: Optional[int] = None
@@ -14,8 +14,18 @@ class SupportTicket:
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> 'SupportTicket':
+        """Строка (id, user_id, user_name, message, response, status, created_at, updated_at) из support_tickets"""
+        created_at, updated_at = row[6], row[7]
+        return cls(
+            row[0], row[1], row[2], row[3], row[4], row[5],
+            datetime.fromisoformat(created_at) if created_at else None,
+            datetime.fromisoformat(updated_at) if updated_at else None,
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class SupportMessage:
     user_id: int
     user_name: str
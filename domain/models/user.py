@@ -1,11 +1,17 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence, Any
 
 
-@dataclass
+@dataclass(slots=True)
 class TelegramUser:
     telegram_id: int
     marzban_username: str
     subscription_type: Optional[str] = None
-    created_at: Optional[datetime] = None
\ No newline at end of file
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> 'TelegramUser':
+        """Строка (telegram_id, marzban_username, subscription_type, created_at) из bot_users"""
+        created_at = row[3]
+        return cls(row[0], row[1], row[2], datetime.fromisoformat(created_at) if created_at else None)
\ No newline at end of file
@@ -0,0 +1,160 @@
+#domain/services/broadcast_service.py
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from infrastructure.database.repositories import (
+    BroadcastRepository,
+    SubscriptionSnapshotRepository,
+    UserRepository,
+)
+from infrastructure.telegram import MessageSender, SendPriority, permanent_failure_reason
+from domain.models.broadcast import Broadcast, BroadcastAudience
+from core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastService:
+    """
+    Рассылки как задания в SQLite.
+
+    Получатели перебираются по возрастанию telegram_id пачками; после каждой
+    пачки курсор и счетчики сохраняются, поэтому после перезапуска рассылка
+    продолжается с последней контрольной точки. Чаты, в которые доставка
+    невозможна, попадают в blocked_chats и пропускаются следующими рассылками.
+    """
+
+    def __init__(
+        self,
+        broadcast_repository: BroadcastRepository,
+        user_repository: UserRepository,
+        snapshot_repository: SubscriptionSnapshotRepository,
+        message_sender: MessageSender,
+        batch_size: int = 100,
+    ):
+        self.broadcast_repository = broadcast_repository
+        self.user_repository = user_repository
+        self.snapshot_repository = snapshot_repository
+        self.message_sender = message_sender
+        self.batch_size = max(1, batch_size)
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @traced()
+    async def count_recipients(self, audience: Optional[BroadcastAudience] = None) -> int:
+        """Предварительный подсчет получателей рассылки"""
+        return await self.snapshot_repository.count_audience(audience)
+
+    @traced()
+    async def start_broadcast(
+        self,
+        text: str,
+        created_by: int,
+        audience: Optional[BroadcastAudience] = None,
+    ) -> Broadcast:
+        """Создает задание на рассылку и запускает его в фоне"""
+        broadcast = await self.broadcast_repository.create(text, created_by, audience)
+        self._launch(broadcast)
+        return broadcast
+
+    async def resume_unfinished(self) -> int:
+        """Продолжает рассылки, прерванные перезапуском бота"""
+        broadcasts = await self.broadcast_repository.get_unfinished()
+        for broadcast in broadcasts:
+            logger.info(f"Продолжение рассылки #{broadcast.id} с telegram_id > {broadcast.cursor}")
+            self._launch(broadcast)
+        return len(broadcasts)
+
+    async def get_broadcast(self, broadcast_id: int) -> Optional[Broadcast]:
+        return await self.broadcast_repository.get_by_id(broadcast_id)
+
+    @property
+    def active_count(self) -> int:
+        return len(self._tasks)
+
+    async def stop(self):
+        """Останавливает фоновые рассылки; их состояние остается в базе"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _launch(self, broadcast: Broadcast):
+        if broadcast.id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(broadcast))
+        self._tasks[broadcast.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast.id, None))
+
+    async def _run(self, broadcast: Broadcast):
+        try:
+            broadcast.status = "running"
+            await self.broadcast_repository.save_progress(broadcast)
+
+            while True:
+                recipients = await self.snapshot_repository.get_audience_ids_after(
+                    broadcast.cursor, self.batch_size, broadcast.audience
+                )
+                if not recipients:
+                    break
+                await self._send_batch(broadcast, recipients)
+
+            broadcast.status = "finished"
+            broadcast.finished_at = datetime.now()
+            await self.broadcast_repository.save_progress(broadcast)
+            logger.info(
+                f"Рассылка #{broadcast.id} завершена: отправлено {broadcast.sent_count}, "
+                f"ошибок {broadcast.failed_count}, недоступно {broadcast.blocked_count}"
+            )
+            await self._notify_author(broadcast)
+        except asyncio.CancelledError:
+            logger.info(f"Рассылка #{broadcast.id} приостановлена на telegram_id {broadcast.cursor}")
+            raise
+        except Exception as e:
+            logger.exception(f"Рассылка #{broadcast.id} прервана ошибкой: {e}")
+
+    async def _send_batch(self, broadcast: Broadcast, recipients: List[int]):
+        # Пачка отправляется одновременно, темп задает общий планировщик
+        results = await asyncio.gather(
+            *(self._deliver(broadcast.text, telegram_id) for telegram_id in recipients)
+        )
+
+        blocked: List[Tuple[int, str]] = []
+        for telegram_id, (delivered, reason) in zip(recipients, results):
+            if delivered:
+                broadcast.sent_count += 1
+            elif reason:
+                blocked.append((telegram_id, reason))
+            else:
+                broadcast.failed_count += 1
+
+        await self.user_repository.mark_chats_blocked(blocked)
+        broadcast.blocked_count += len(blocked)
+        broadcast.cursor = recipients[-1]
+        await self.broadcast_repository.save_progress(broadcast)
+
+    async def _deliver(self, text: str, telegram_id: int) -> Tuple[bool, Optional[str]]:
+        try:
+            await self.message_sender.send_message(telegram_id, text, priority=SendPriority.BROADCAST)
+            return True, None
+        except Exception as e:
+            reason = permanent_failure_reason(e)
+            if not reason:
+                logger.error(f"Не удалось отправить сообщение {telegram_id}: {e}")
+            return False, reason
+
+    async def _notify_author(self, broadcast: Broadcast):
+        if not broadcast.created_by:
+            return
+        try:
+            await self.message_sender.send_message(
+                broadcast.created_by,
+                f"📣 Рассылка #{broadcast.id} завершена.\n"
+                f"Успешно: {broadcast.sent_count}, ошибок: {broadcast.failed_count}, "
+                f"недоступных чатов: {broadcast.blocked_count}.",
+                priority=SendPriority.NOTIFICATION,
+            )
+        except Exception as e:
+            logger.error(f"Не удалось уведомить автора рассылки #{broadcast.id}: {e}")
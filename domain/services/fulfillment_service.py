@@ -0,0 +1,259 @@
+#domain/services/fulfillment_service.py
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from infrastructure.database.repositories import PaymentRepository
+from domain.models.payment import PaymentOrder
+from domain.models.subscription import SubscriptionResult
+from domain.services.subscription_service import SubscriptionService
+from domain.services.keyed_locks import KeyedLockRegistry
+from core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+ResultHandler = Callable[[PaymentOrder, SubscriptionResult], Awaitable[None]]
+
+
+class _LatencyWindow:
+    """Последние N замеров задержки, секунды"""
+
+    def __init__(self, size: int = 500):
+        self._values: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._values.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        if not self._values:
+            return {"count": 0, "p50": None, "p95": None, "max": None}
+        values = sorted(self._values)
+        return {
+            "count": len(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1],
+        }
+
+
+class FulfillmentService:
+    """
+    Выдача оплаченных подписок из очереди payments.
+
+    Оплата сначала записывается в SQLite, затем заказ берет один из
+    ``workers`` фоновых обработчиков. Если выдать подписку не удалось,
+    заказ повторяется с нарастающей паузой, не более ``max_attempts`` раз.
+    Заказы, не завершенные к остановке бота, подхватываются при запуске.
+
+    Повторная запись оплаты с тем же charge_id не создает заказ, а перед
+    выдачей заказ атомарно захватывается в базе, поэтому каждая оплата
+    выдается один раз, даже если заказ оказался в очереди дважды.
+
+    Перед записью в панель в заказе сохраняется журнал: прежнее и новое
+    значение срока или лимита. Повтор после сбоя и продолжение заказа после
+    перезапуска сверяют панель с журналом, поэтому подписка, уже записанная
+    в панель, второй раз не начисляется. Заказы одного покупателя выдаются
+    по очереди, и перед новым заказом завершаются его заказы с журналом,
+    ожидающие повтора: иначе новое начисление могло бы совпасть с журналом
+    прерванного заказа и тот считался бы выданным. Если значение в панели не совпадает
+    ни с прежним, ни с новым (его изменили начисление, администратор или
+    другой заказ), записано ли начисление, неизвестно: заказ переходит в
+    needs_review и остается оплаченным до проверки администратором.
+    """
+
+    def __init__(
+        self,
+        payment_repository: PaymentRepository,
+        subscription_service: SubscriptionService,
+        workers: int = 2,
+        max_attempts: int = 5,
+        retry_delay: float = 5.0,
+    ):
+        self.payment_repository = payment_repository
+        self.subscription_service = subscription_service
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = max(0.0, retry_delay)
+
+        self._queue: "asyncio.Queue[PaymentOrder]" = asyncio.Queue()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._retry_tasks: Set[asyncio.Task] = set()
+        self._result_handler: Optional[ResultHandler] = None
+        # Заказы одного покупателя (по telegram_id) выдаются по очереди
+        self._user_locks = KeyedLockRegistry()
+
+        self.fulfilled_total = 0
+        self.failed_total = 0
+        self.review_total = 0
+        self._pre_checkout_latency = _LatencyWindow()
+        self._fulfillment_latency = _LatencyWindow()
+
+    def set_result_handler(self, handler: ResultHandler):
+        """Обработчик результата выдачи (уведомление покупателя)"""
+        self._result_handler = handler
+
+    def start(self):
+        if self._worker_tasks:
+            return
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Выдача подписок запущена: обработчиков {self.workers}, попыток на заказ до {self.max_attempts}")
+
+    async def recover(self) -> int:
+        """Ставит в очередь заказы, прерванные перезапуском бота"""
+        orders = await self.payment_repository.get_unfinished()
+        for order in orders:
+            logger.info(f"Продолжение выдачи заказа #{order.id} ({order.plan}, {order.telegram_id})")
+            self._queue.put_nowait(order)
+        return len(orders)
+
+    @traced()
+    async def submit(self, order: PaymentOrder) -> Tuple[PaymentOrder, bool]:
+        """
+        Записывает оплату и ставит заказ в очередь выдачи.
+
+        Возвращает (заказ, создан); для уже записанной оплаты — существующий
+        заказ и False, в очередь он повторно не ставится.
+        """
+        order, created = await self.payment_repository.create(order)
+        if created:
+            self._queue.put_nowait(order)
+        else:
+            logger.warning(f"Повторное уведомление об оплате {order.charge_id}: заказ #{order.id} уже записан")
+        return order, created
+
+    async def get_user_payments(self, telegram_id: int, limit: int = 20) -> List[PaymentOrder]:
+        return await self.payment_repository.get_user_history(telegram_id, limit)
+
+    async def get_daily_totals(self, days: int = 7) -> List[Tuple[str, int, int, int]]:
+        since = datetime.combine(datetime.now().date() - timedelta(days=days - 1), datetime.min.time())
+        return await self.payment_repository.get_daily_totals(since)
+
+    def record_pre_checkout(self, seconds: float):
+        self._pre_checkout_latency.add(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "retrying": len(self._retry_tasks),
+            "fulfilled_total": self.fulfilled_total,
+            "failed_total": self.failed_total,
+            "review_total": self.review_total,
+            "pre_checkout_latency": self._pre_checkout_latency.summary(),
+            "fulfillment_latency": self._fulfillment_latency.summary(),
+        }
+
+    async def stop(self):
+        """Останавливает обработчики; незавершенные заказы остаются в базе"""
+        tasks = self._worker_tasks + list(self._retry_tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    # === Внутренняя логика ===
+    async def _worker(self):
+        while True:
+            order = await self._queue.get()
+            try:
+                await self._process(order)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Сбой обработки заказа #{order.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, order: PaymentOrder):
+        async with self._user_locks.hold(order.telegram_id):
+            for earlier in await self.payment_repository.get_journaled_pending(order.telegram_id, order.id):
+                logger.info(f"Заказ #{earlier.id} с журналом завершается перед заказом #{order.id}")
+                if not await self._fulfill(earlier):
+                    # Пока прерванный заказ не завершен, новое начисление считать не от чего;
+                    # попытка нового заказа не расходуется
+                    delay = self.retry_delay * 2 ** (earlier.attempts - 1)
+                    logger.warning(f"Заказ #{order.id} отложен на {delay:g} с: не завершен заказ #{earlier.id}")
+                    self._schedule_retry(order, delay)
+                    return
+            await self._fulfill(order)
+
+    async def _fulfill(self, order: PaymentOrder) -> bool:
+        """Одна попытка выдачи заказа; False — заказ ждет повтора"""
+        if not await self.payment_repository.claim(order):
+            logger.info(f"Заказ #{order.id} уже обработан или обрабатывается, пропуск")
+            return True
+
+        result = await self._purchase(order)
+
+        if result.success:
+            order.status = "fulfilled"
+            order.last_error = None
+            order.fulfilled_at = datetime.now()
+            await self.payment_repository.save_state(order)
+            self.fulfilled_total += 1
+            if order.fulfillment_seconds is not None:
+                self._fulfillment_latency.add(order.fulfillment_seconds)
+            logger.info(
+                f"Заказ #{order.id} выдан с попытки {order.attempts} "
+                f"за {order.fulfillment_seconds or 0:.1f} с"
+            )
+            await self._notify(order, result)
+            return True
+
+        order.last_error = result.error_message
+        if result.needs_review:
+            order.status = "needs_review"
+            await self.payment_repository.save_state(order)
+            self.review_total += 1
+            logger.error(f"Заказ #{order.id} передан на проверку администратору: {order.last_error}")
+            await self._notify(order, result)
+            return True
+
+        if order.attempts >= self.max_attempts:
+            order.status = "failed"
+            await self.payment_repository.save_state(order)
+            self.failed_total += 1
+            logger.error(f"Заказ #{order.id} не выдан после {order.attempts} попыток: {order.last_error}")
+            await self._notify(order, result)
+            return True
+
+        order.status = "pending"
+        await self.payment_repository.save_state(order)
+        delay = self.retry_delay * 2 ** (order.attempts - 1)
+        logger.warning(
+            f"Заказ #{order.id}: попытка {order.attempts} не удалась ({order.last_error}), "
+            f"повтор через {delay:g} с"
+        )
+        self._schedule_retry(order, delay)
+        return False
+
+    async def _purchase(self, order: PaymentOrder) -> SubscriptionResult:
+        async def journal(before: Optional[int], target: int):
+            order.before_value, order.target_value = before, target
+            await self.payment_repository.mark_applying(order)
+
+        purchase = (
+            self.subscription_service.purchase_monthly_subscription
+            if order.plan == "monthly"
+            else self.subscription_service.purchase_gb_subscription
+        )
+        return await purchase(order.telegram_id, order.quantity, journal=journal, expected=order.expected_values)
+
+    def _schedule_retry(self, order: PaymentOrder, delay: float):
+        async def retry_later():
+            await asyncio.sleep(delay)
+            self._queue.put_nowait(order)
+
+        task = asyncio.create_task(retry_later())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def _notify(self, order: PaymentOrder, result: SubscriptionResult):
+        if not self._result_handler:
+            return
+        try:
+            await self._result_handler(order, result)
+        except Exception as e:
+            logger.error(f"Не удалось уведомить покупателя о заказе #{order.id}: {e}")
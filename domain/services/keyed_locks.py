@@ -0,0 +1,67 @@
+#domain/services/keyed_locks.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable
+
+
+class _KeyLock:
+    __slots__ = ("lock", "holders")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        # Задачи, которые держат блокировку или ждут ее
+        self.holders = 0
+
+
+class KeyedLockRegistry:
+    """
+    Блокировки по ключу, например по имени пользователя Marzban.
+
+    Операции с одним ключом выполняются по очереди, с разными ключами —
+    параллельно. Запись о ключе живет, пока блокировку кто-то держит или
+    ждет, и удаляется при освобождении последним владельцем, поэтому
+    реестр не растет с числом пользователей.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, _KeyLock] = {}
+        self.acquired_total = 0
+        self.contended_total = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyLock()
+        entry.holders += 1
+        try:
+            if entry.lock.locked():
+                self.contended_total += 1
+                started = time.monotonic()
+                await entry.lock.acquire()
+                waited = time.monotonic() - started
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            else:
+                await entry.lock.acquire()
+            self.acquired_total += 1
+            try:
+                yield
+            finally:
+                entry.lock.release()
+        finally:
+            entry.holders -= 1
+            if not entry.holders:
+                del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_keys": len(self._locks),
+            "acquired_total": self.acquired_total,
+            "contended_total": self.contended_total,
+            "wait_avg": self.wait_total / self.contended_total if self.contended_total else 0.0,
+            "wait_max": self.wait_max,
+        }
@@ -0,0 +1,118 @@
+#domain/services/mass_grant_planner.py
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from domain.models.mass_operation import MassGrantPlan
+
+HOUR = 3600
+DAY = 86400
+GB = 1024 ** 3
+
+
+class MassGrantPlanner:
+    """
+    Расчет массового начисления времени или трафика до записи в панель.
+
+    Одно и то же правило применяется к столбцам всех пользователей сразу
+    (предпросмотр) и к одному пользователю со свежими данными (запись):
+    новое значение — текущее плюс начисление, но уменьшение не опускается
+    ниже текущего момента (срок) или израсходованного трафика (лимит).
+    Уже истекшим или исчерпавшим лимит уменьшение ничего не меняет, и такие
+    пользователи в запись не попадают.
+    """
+
+    HOURS = "hours"
+    TRAFFIC = "traffic"
+
+    # Корзины предпросмотра: (подпись, нижняя граница не включительно) по возрастанию
+    HOURS_BUCKETS = (("истекла", None), ("< 1 дн.", 0), ("1–7 дн.", DAY), ("7–30 дн.", 7 * DAY), ("> 30 дн.", 30 * DAY))
+    TRAFFIC_BUCKETS = (("исчерпан", None), ("< 1 ГБ", 0), ("1–10 ГБ", GB), ("10–50 ГБ", 10 * GB), ("> 50 ГБ", 50 * GB))
+
+    @classmethod
+    def delta(cls, kind: str, amount: float) -> int:
+        return int(amount * HOUR) if kind == cls.HOURS else int(amount * GB)
+
+    @classmethod
+    def _new_value(cls, kind: str, amount: float, current: int, used: int, now: int) -> int:
+        """Новое значение для одного пользователя; то же правило, что в new_values, без NumPy"""
+        pivot = now if kind == cls.HOURS else max(used, 1)
+        floor = min(current, pivot)
+        return max(current + cls.delta(kind, amount), floor)
+
+    @classmethod
+    def new_values(cls, kind: str, amount: float, current: np.ndarray, used: np.ndarray, now: int) -> np.ndarray:
+        """Новые значения expire или data_limit; current > 0 — только пользователи со сроком или лимитом"""
+        # Правило должно совпадать с _new_value: по нему пишутся изменения в панель
+        pivot = np.full_like(current, now) if kind == cls.HOURS else np.maximum(used, 1)
+        floor = np.minimum(current, pivot)
+        return np.maximum(current + cls.delta(kind, amount), floor)
+
+    @classmethod
+    def target_field(cls, kind: str) -> str:
+        return "expire" if kind == cls.HOURS else "data_limit"
+
+    @classmethod
+    def changes_for(cls, kind: str, amount: float, user: Dict[str, Any], now: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Изменение одного пользователя по свежим данным; None — менять нечего"""
+        now = int(time.time()) if now is None else now
+        current = _as_int(user.get(cls.target_field(kind)))
+        if current <= 0:
+            return None
+        used = _as_int(user.get("used_traffic"))
+        value = cls._new_value(kind, amount, current, used, now)
+        if value == current:
+            return None
+        return {cls.target_field(kind): value}
+
+    @classmethod
+    def plan(
+        cls,
+        kind: str,
+        amount: float,
+        users: Sequence[Dict[str, Any]],
+        now: Optional[int] = None,
+    ) -> MassGrantPlan:
+        now = int(time.time()) if now is None else now
+        count = len(users)
+        name = cls.target_field(kind)
+        current = np.fromiter((_as_int(user.get(name)) for user in users), dtype=np.int64, count=count)
+        used = np.fromiter((_as_int(user.get("used_traffic")) for user in users), dtype=np.int64, count=count)
+
+        named = np.fromiter((bool(user.get("username")) for user in users), dtype=bool, count=count)
+
+        eligible = named & (current > 0)
+        new = current.copy()
+        new[eligible] = cls.new_values(kind, amount, current[eligible], used[eligible], now)
+        changed = eligible & (new != current)
+        clamped = changed & (new != current + cls.delta(kind, amount))
+
+        # Корзины: остаток срока от текущего момента или остаток трафика до лимита
+        if kind == cls.HOURS:
+            buckets, before_left, after_left = cls.HOURS_BUCKETS, current - now, new - now
+        else:
+            buckets, before_left, after_left = cls.TRAFFIC_BUCKETS, current - used, new - used
+        edges = np.array([bound for _, bound in buckets[1:]], dtype=np.int64)
+        before = np.bincount(np.searchsorted(edges, before_left[eligible], side="left"), minlength=len(buckets))
+        after = np.bincount(np.searchsorted(edges, after_left[eligible], side="left"), minlength=len(buckets))
+
+        return MassGrantPlan(
+            kind=kind,
+            amount=amount,
+            total=count,
+            usernames=[users[index]["username"] for index in np.flatnonzero(changed)],
+            ineligible=int(count - np.count_nonzero(eligible)),
+            unchanged=int(np.count_nonzero(eligible & ~changed)),
+            clamped=int(np.count_nonzero(clamped)),
+            buckets=[label for label, _ in buckets],
+            before=before.tolist(),
+            after=after.tolist(),
+        )
+
+
+def _as_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
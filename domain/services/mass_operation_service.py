@@ -0,0 +1,211 @@
+#domain/services/mass_operation_service.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from infrastructure.database.repositories import MassOperationRepository
+from domain.models.mass_operation import MassGrantPlan, MassOperation
+from domain.services.subscription_service import SubscriptionService
+from core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+ResultHandler = Callable[[MassOperation], Awaitable[None]]
+
+
+class UndoUnavailableError(Exception):
+    """Задание нельзя отменить; текст ошибки показывается администратору"""
+
+
+class MassOperationService:
+    """
+    Массовые начисления как задания в SQLite.
+
+    При запуске список пользователей из предпросмотра замораживается в базе,
+    дальше задание не зависит от порядка выдачи списка панелью. Пользователи
+    обрабатываются пачками по возрастанию имени, внутри пачки — не больше
+    ``concurrency`` одновременно. После каждой пачки статусы и счетчики
+    сохраняются, и после перезапуска задание продолжается с контрольной точки.
+    Перед записью в панель прежнее и новое значение фиксируются в базе, поэтому
+    прерванная запись при продолжении сверяется с панелью и не применяется
+    второй раз.
+
+    Прежние значения измененных пользователей хранятся в журнале отмены
+    ``undo_retention_days`` дней после завершения задания. Отмена выполняется
+    тем же конвейером и возвращает прежнее значение только пользователям,
+    которых не меняли после начисления.
+    """
+
+    def __init__(
+        self,
+        repository: MassOperationRepository,
+        subscription_service: SubscriptionService,
+        batch_size: int = 50,
+        concurrency: int = 4,
+        undo_retention_days: float = 7,
+    ):
+        self.repository = repository
+        self.subscription_service = subscription_service
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(self.concurrency, batch_size)
+        self.undo_retention = timedelta(days=max(0.0, undo_retention_days))
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._result_handler: Optional[ResultHandler] = None
+
+    def set_result_handler(self, handler: ResultHandler):
+        """Обработчик завершения задания (уведомление автора)"""
+        self._result_handler = handler
+
+    @traced()
+    async def start(self, plan: MassGrantPlan, created_by: int) -> MassOperation:
+        """Создает задание по предпросмотру и запускает его в фоне"""
+        operation = await self.repository.create(plan.kind, plan.amount, created_by, plan.usernames)
+        self._launch(operation)
+        return operation
+
+    @traced()
+    async def start_undo(self, operation_id: int, created_by: int) -> MassOperation:
+        """Запускает отмену завершенного задания по его журналу"""
+        source = await self.repository.get_by_id(operation_id)
+        if source is None:
+            raise UndoUnavailableError("Начисление не найдено")
+        if source.is_undo:
+            raise UndoUnavailableError("Отмену начисления отменить нельзя")
+        if source.status != "finished":
+            raise UndoUnavailableError("Начисление еще выполняется, отмена доступна после завершения")
+        if await self.repository.get_undo_for(operation_id):
+            raise UndoUnavailableError("Это начисление уже отменялось")
+
+        undo = await self.repository.create_undo(source, created_by)
+        if undo is None:
+            raise UndoUnavailableError("Журнал отмены пуст или удален по сроку хранения")
+        logger.info(f"Отмена начисления #{source.id}: задание #{undo.id}, пользователей {undo.total}")
+        self._launch(undo)
+        return undo
+
+    async def prune_undo_logs(self) -> int:
+        """Удаляет журналы отмены старше срока хранения"""
+        try:
+            deleted = await self.repository.prune_undo_logs(datetime.now() - self.undo_retention)
+        except Exception as e:
+            logger.error(f"Не удалось очистить журналы отмены: {e}")
+            return 0
+        if deleted:
+            logger.info(f"Удалено записей журнала отмены: {deleted}")
+        return deleted
+
+    async def resume_unfinished(self) -> int:
+        """Продолжает задания, прерванные перезапуском бота"""
+        await self.prune_undo_logs()
+        operations = await self.repository.get_unfinished()
+        for operation in operations:
+            logger.info(
+                f"Продолжение массового начисления #{operation.id}: "
+                f"обработано {operation.processed} из {operation.total}"
+            )
+            self._launch(operation)
+        return len(operations)
+
+    async def get_operation(self, operation_id: int) -> Optional[MassOperation]:
+        return await self.repository.get_by_id(operation_id)
+
+    async def get_changed_users(self, operation_id: int) -> List[Tuple[str, Optional[int]]]:
+        """(username, новое значение) пользователей, которым начисление записано"""
+        return await self.repository.get_done_items(operation_id)
+
+    @property
+    def active_count(self) -> int:
+        return len(self._tasks)
+
+    async def stop(self):
+        """Останавливает фоновые задания; их состояние остается в базе"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _launch(self, operation: MassOperation):
+        if operation.id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(operation))
+        self._tasks[operation.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(operation.id, None))
+
+    async def _run(self, operation: MassOperation):
+        try:
+            operation.status = "running"
+            await self.repository.save_progress(operation, [])
+
+            cursor = ""
+            while True:
+                items = await self.repository.get_open_items(operation.id, cursor, self.batch_size)
+                if not items:
+                    break
+                await self._process_batch(operation, items)
+                cursor = items[-1][0]
+
+            operation.status = "finished"
+            operation.finished_at = datetime.now()
+            await self.repository.save_progress(operation, [])
+            logger.info(
+                f"Массовое начисление #{operation.id} завершено: изменено {operation.updated_count}, "
+                f"пропущено {operation.skipped_count}, ошибок {operation.failed_count}"
+            )
+            await self._notify(operation)
+            await self.prune_undo_logs()
+        except asyncio.CancelledError:
+            logger.info(f"Массовое начисление #{operation.id} приостановлено: обработано {operation.processed}")
+            raise
+        except Exception as e:
+            logger.exception(f"Массовое начисление #{operation.id} прервано ошибкой: {e}")
+
+    async def _process_batch(self, operation: MassOperation, items: List[Tuple[str, Optional[int], Optional[int]]]):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(username: str, before: Optional[int], target: Optional[int]) -> str:
+            async with semaphore:
+                return await self._apply_item(operation, username, before, target)
+
+        statuses = await asyncio.gather(*(process(*item) for item in items))
+        for status in statuses:
+            if status == "done":
+                operation.updated_count += 1
+            elif status == "skipped":
+                operation.skipped_count += 1
+            else:
+                operation.failed_count += 1
+        await self.repository.save_progress(
+            operation, [(item[0], status) for item, status in zip(items, statuses)]
+        )
+
+    async def _apply_item(
+        self,
+        operation: MassOperation,
+        username: str,
+        before: Optional[int],
+        target: Optional[int],
+    ) -> str:
+        async def journal(previous: Dict[str, int], target_value: int):
+            before_value = previous["expire" if operation.kind == "hours" else "data_limit"]
+            await self.repository.mark_applying(operation.id, username, previous, before_value, target_value)
+
+        # Значения заранее известны у прерванной записи и у всех пользователей отмены
+        expected = (before, target) if target is not None else None
+        try:
+            applied = await self.subscription_service.apply_grant(
+                username, operation.kind, operation.amount, journal, expected
+            )
+        except Exception as e:
+            logger.error(f"Не удалось обновить пользователя {username} (начисление #{operation.id}): {e}")
+            return "failed"
+        return "done" if applied else "skipped"
+
+    async def _notify(self, operation: MassOperation):
+        if not self._result_handler:
+            return
+        try:
+            await self._result_handler(operation)
+        except Exception as e:
+            logger.error(f"Не удалось уведомить автора начисления #{operation.id}: {e}")
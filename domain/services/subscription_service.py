@@ -1,19 +1,86 @@
 #domain/services/subscription_service.py
+import asyncio
 import logging
-from typing import Optional
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, Callable, List, Tuple
 from datetime import datetime, timedelta
-from infrastructure.marzban.api_client import MarzbanAPIClient
+from infrastructure.marzban.api_client import MarzbanAPIClient, UnsupportedEndpointError
+from infrastructure.database.repositories import SubscriptionSnapshotRepository
 from domain.services.user_service import UserService
+from domain.services.keyed_locks import KeyedLockRegistry
+from domain.services.mass_grant_planner import MassGrantPlanner
 from domain.models.subscription import SubscriptionInfo, SubscriptionResult
+from domain.models.mass_operation import MassGrantPlan
+from core.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# journal(значение до записи или None, если пользователя нет; новое значение)
+PurchaseJournal = Callable[[Optional[int], int], Awaitable[None]]
+
 
 class SubscriptionService:
-    def __init__(self, marzban_client: MarzbanAPIClient, user_service: UserService):
+    SNAPSHOT_PAGE_SIZE = 500
+    # Поля ответа Marzban, из которых строятся SubscriptionInfo и снимок подписки
+    USER_FIELDS = ("username", "status", "expire", "data_limit", "used_traffic")
+    # Статусы, которые удаляет DELETE /api/users/expired; запасной путь удаляет те же
+    EXPIRED_STATUSES = frozenset({"expired", "limited"})
+
+    def __init__(
+        self,
+        marzban_client: MarzbanAPIClient,
+        user_service: UserService,
+        snapshot_repository: SubscriptionSnapshotRepository,
+        user_locks: Optional[KeyedLockRegistry] = None,
+    ):
         self.marzban_client = marzban_client
         self.user_service = user_service
+        self.snapshot_repository = snapshot_repository
+        # Изменения одного пользователя Marzban (покупки, начисления) идут по очереди
+        self.user_locks = user_locks or KeyedLockRegistry()
+
+    async def _save_snapshot(self, user_data: Optional[Dict[str, Any]]):
+        """Обновляет локальный снимок подписки; ошибка не должна ломать основной сценарий"""
+        if not user_data:
+            return
+        try:
+            await self.snapshot_repository.upsert_many([user_data])
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить снимок подписки {user_data.get('username')}: {e}")
+
+    @traced()
+    async def sync_snapshots(self) -> int:
+        """Полная синхронизация снимков подписок с панелью Marzban"""
+        started_at = datetime.now()
+        offset = 0
+        synced = 0
+
+        while True:
+            response = await self.marzban_client.get_users(offset=offset, limit=self.SNAPSHOT_PAGE_SIZE)
+            users = response.get("users", [])
+            if not users:
+                break
+            await self.snapshot_repository.upsert_many(users, updated_at=started_at)
+            synced += len(users)
+            if len(users) < self.SNAPSHOT_PAGE_SIZE:
+                break
+            offset += self.SNAPSHOT_PAGE_SIZE
+
+        removed = await self.snapshot_repository.delete_stale(started_at)
+        logger.info(f"Синхронизация снимков подписок: обновлено {synced}, удалено {removed}")
+        return synced
+
+    async def run_snapshot_sync(self, interval: float):
+        """Периодически синхронизирует снимки подписок (запускается фоновой задачей)"""
+        while True:
+            try:
+                await self.sync_snapshots()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка синхронизации снимков подписок: {e}")
+            await asyncio.sleep(interval)
 
+    @traced()
     async def get_subscription_info(self, telegram_id: int) -> SubscriptionResult:
         """Получает информацию о текущей подписке пользователя"""
         try:
@@ -27,8 +94,8 @@ class SubscriptionService:
                     context="view"
                 )
 
-            subscription_url = await self._get_subscription_url_with_retry(username)
-            subscription_info = SubscriptionInfo.from_marzban_data(user_data, subscription_url)
+            await self._save_snapshot(user_data)
+            subscription_info = await self._build_subscription_info(username, user_data)
 
             return SubscriptionResult(
                 success=True,
@@ -45,55 +112,61 @@ class SubscriptionService:
             )
 
     # ✅ Покупка/продление месячной подписки
-    async def purchase_monthly_subscription(self, telegram_id: int, months: int) -> SubscriptionResult:
+    @traced()
+    async def purchase_monthly_subscription(
+        self,
+        telegram_id: int,
+        months: int,
+        journal: Optional[PurchaseJournal] = None,
+        expected: Optional[Tuple[Optional[int], int]] = None,
+    ) -> SubscriptionResult:
+        """journal и expected — как в _write_purchase: повтор оплаченного заказа не продлевает дважды"""
         try:
             username = f"qwqvpn_{telegram_id}"
-            existing_user = await self.marzban_client.get_user(username)
-
-            now = datetime.utcnow()
-            additional_days = 30 * months
-
-            # Если пользователь уже существует — продлеваем срок
-            if existing_user:
-                current_expire_ts = existing_user.get("expire")
-                if current_expire_ts:
-                    current_expire = datetime.fromtimestamp(current_expire_ts)
-                    # если подписка ещё активна — добавляем сверху
-                    if current_expire > now:
-                        new_expire = current_expire + timedelta(days=additional_days)
+            async with self.user_locks.hold(username):
+                existing_user = await self.marzban_client.get_user(username)
+
+                now = datetime.utcnow()
+                additional_days = 30 * months
+
+                # Если пользователь уже существует — продлеваем срок
+                if existing_user:
+                    current_expire_ts = existing_user.get("expire")
+                    if current_expire_ts:
+                        current_expire = datetime.fromtimestamp(current_expire_ts)
+                        # если подписка ещё активна — добавляем сверху
+                        if current_expire > now:
+                            new_expire = current_expire + timedelta(days=additional_days)
+                        else:
+                            # если истекла — начинаем отсчёт от текущего момента
+                            new_expire = now + timedelta(days=additional_days)
                     else:
-                        # если истекла — начинаем отсчёт от текущего момента
                         new_expire = now + timedelta(days=additional_days)
                 else:
+                    # создаём новую
                     new_expire = now + timedelta(days=additional_days)
 
-                await self.marzban_client.modify_user(username, {
-                    "expire": int(new_expire.timestamp()),
-                    "status": "active",
-                })
-                logger.info(f"Продлена подписка пользователю {telegram_id} до {new_expire}")
-
-            else:
-                # создаём новую
-                new_expire = now + timedelta(days=additional_days)
-                await self.marzban_client.create_user({
-                    "username": username,
-                    "expire": int(new_expire.timestamp()),
-                    "data_limit": 0,
-                    "data_limit_reset_strategy": "no_reset",
-                    "note": f"Monthly plan {months}m, Telegram ID: {telegram_id}",
-                    "status": "active"
-                })
-                logger.info(f"Создана новая месячная подписка пользователю {telegram_id} на {months} мес.")
+                user_data = await self._write_purchase(
+                    username, "expire", existing_user, int(new_expire.timestamp()),
+                    {
+                        "username": username,
+                        "data_limit": 0,
+                        "data_limit_reset_strategy": "no_reset",
+                        "note": f"Monthly plan {months}m, Telegram ID: {telegram_id}",
+                        "status": "active"
+                    },
+                    journal, expected,
+                )
+                if user_data is None:
+                    return SubscriptionResult(
+                        success=False, error_message="Срок подписки в панели изменен во время выдачи", needs_review=True
+                    )
+                if existing_user:
+                    logger.info(f"Продлена подписка пользователю {telegram_id} до {user_data.get('expire')}")
+                else:
+                    logger.info(f"Создана новая месячная подписка пользователю {telegram_id} на {months} мес.")
 
-            await self.user_service.update_user_subscription_type(telegram_id, "monthly")
-
-            # Получаем обновлённые данные
-            user_data = await self.marzban_client.get_user(username)
-            subscription_url = await self._get_subscription_url_with_retry(username)
-            subscription_info = SubscriptionInfo.from_marzban_data(user_data, subscription_url)
-
-            return SubscriptionResult(success=True, subscription_info=subscription_info)
+            return await self._purchase_result(telegram_id, username, "monthly", user_data)
 
         except Exception as e:
             logger.error(f"Ошибка при создании месячной подписки: {e}")
@@ -101,55 +174,337 @@ class SubscriptionService:
 
 
     # ✅ Покупка/добавление ГБ
-    async def purchase_gb_subscription(self, telegram_id: int, gb: int) -> SubscriptionResult:
+    @traced()
+    async def purchase_gb_subscription(
+        self,
+        telegram_id: int,
+        gb: int,
+        journal: Optional[PurchaseJournal] = None,
+        expected: Optional[Tuple[Optional[int], int]] = None,
+    ) -> SubscriptionResult:
         """
         Создаёт новую подписку по трафику или добавляет указанное количество ГБ
         к существующей. Если пользователь был неактивен — активирует.
+        journal и expected — как в _write_purchase.
         """
         try:
             username = f"qwqvpn_{telegram_id}"
-            existing_user = await self.marzban_client.get_user(username)
-            add_bytes = gb * 1024 * 1024 * 1024  # 1 ГБ → байты
+            async with self.user_locks.hold(username):
+                existing_user = await self.marzban_client.get_user(username)
+                add_bytes = gb * 1024 * 1024 * 1024  # 1 ГБ → байты
 
-            if existing_user:
-                current_limit = existing_user.get("data_limit") or 0
-                current_usage = existing_user.get("used_traffic") or 0
+                current_limit = (existing_user or {}).get("data_limit") or 0
+                # новому пользователю — ровно заданный лимит
                 new_limit = current_limit + add_bytes
 
-                await self.marzban_client.modify_user(username, {
-                    "data_limit": new_limit,
-                    "status": "active",
-                })
-                logger.info(
-                    f"Пользователю {telegram_id} добавлено {gb} ГБ "
-                    f"(старый лимит: {current_limit / 1e9:.1f} ГБ, новый лимит: {new_limit / 1e9:.1f} ГБ)"
+                user_data = await self._write_purchase(
+                    username, "data_limit", existing_user, new_limit,
+                    {
+                        "username": username,
+                        "data_limit_reset_strategy": "no_reset",
+                        "note": f"Traffic plan {gb}GB, Telegram ID: {telegram_id}",
+                        "status": "active",
+                    },
+                    journal, expected,
                 )
-
-            else:
-                # создаём нового пользователя с заданным лимитом
-                await self.marzban_client.create_user({
-                    "username": username,
-                    "data_limit": add_bytes,
-                    "data_limit_reset_strategy": "no_reset",
-                    "note": f"Traffic plan {gb}GB, Telegram ID: {telegram_id}",
-                    "status": "active",
-                })
-                logger.info(f"Создан новый трафиковый тариф {gb} ГБ для пользователя {telegram_id}")
+                if user_data is None:
+                    return SubscriptionResult(
+                        success=False, error_message="Лимит трафика в панели изменен во время выдачи", needs_review=True
+                    )
+                if existing_user:
+                    logger.info(
+                        f"Пользователю {telegram_id} добавлено {gb} ГБ "
+                        f"(старый лимит: {current_limit / 1e9:.1f} ГБ, новый лимит: {(user_data.get('data_limit') or 0) / 1e9:.1f} ГБ)"
+                    )
+                else:
+                    logger.info(f"Создан новый трафиковый тариф {gb} ГБ для пользователя {telegram_id}")
 
-            await self.user_service.update_user_subscription_type(telegram_id, "traffic")
-
-            # Обновляем данные подписки
-            user_data = await self.marzban_client.get_user(username)
-            subscription_url = await self._get_subscription_url_with_retry(username)
-            subscription_info = SubscriptionInfo.from_marzban_data(user_data, subscription_url)
-
-            return SubscriptionResult(success=True, subscription_info=subscription_info)
+            return await self._purchase_result(telegram_id, username, "traffic", user_data)
 
         except Exception as e:
             logger.error(f"Ошибка при добавлении трафика: {e}", exc_info=True)
             return SubscriptionResult(success=False, error_message=str(e))
 
 
+    async def _write_purchase(
+        self,
+        username: str,
+        field: str,
+        user: Optional[Dict[str, Any]],
+        target: int,
+        new_user: Dict[str, Any],
+        journal: Optional[PurchaseJournal],
+        expected: Optional[Tuple[Optional[int], int]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Записывает покупку в панель: field = target у пользователя user или
+        новый пользователь new_user, если user нет. Вызывается под блокировкой
+        имени пользователя.
+
+        Перед записью вызывается journal(прежнее значение, target). Повтор
+        заказа с уже сохраненным журналом передает expected=(прежнее, новое):
+        если в панели уже новое значение, запись не повторяется; запись
+        выполняется, только если в панели все еще прежнее значение. Как и в
+        apply_grant, так повтор после сбоя или перезапуска не начисляет
+        покупку второй раз.
+
+        Возвращает данные пользователя после записи или None, если значение в
+        панели изменилось иначе и покупка не записана.
+        """
+        current = int(user.get(field) or 0) if user else None
+        if expected:
+            before, target = expected
+            if user and current == target:
+                logger.info(f"Покупка для {username} уже записана в панель: {field} = {target}")
+                return user
+            if current != before:
+                logger.warning(
+                    f"Пользователь {username} изменен во время выдачи покупки: "
+                    f"{field} {before} → {current}, ожидалось {target}"
+                )
+                return None
+        elif journal:
+            await journal(current, target)
+
+        if user:
+            return await self.marzban_client.modify_user(username, {field: target, "status": "active"})
+        return await self.marzban_client.create_user({**new_user, field: target})
+
+    async def _purchase_result(
+        self,
+        telegram_id: int,
+        username: str,
+        subscription_type: str,
+        user_data: Optional[Dict[str, Any]],
+    ) -> SubscriptionResult:
+        """
+        Результат покупки, когда изменения в Marzban уже применены.
+
+        Ошибки на этом шаге не отменяют покупку: повтор заказа продлил бы
+        подписку второй раз. Данные подписки пользователь увидит в «Моя подписка».
+        """
+        try:
+            await self.user_service.update_user_subscription_type(telegram_id, subscription_type)
+
+            # Ответ modify_user/create_user уже содержит обновлённые данные
+            user_data = await self._complete_user_data(username, user_data)
+            await self._save_snapshot(user_data)
+            subscription_info = await self._build_subscription_info(username, user_data)
+        except Exception as e:
+            logger.warning(f"Подписка {username} выдана, но данные после покупки не получены: {e}")
+            return SubscriptionResult(success=True, context="purchase")
+
+        return SubscriptionResult(success=True, subscription_info=subscription_info)
+
+    # === Начисления администратора ===
+    @traced()
+    async def add_hours(self, username: str, hours: float) -> Tuple[bool, Optional[int]]:
+        """Добавляет время пользователю: от текущего срока или от текущего момента, если срок истек"""
+        delta_seconds = max(int(hours * 3600), 0)
+
+        def extend(user: Dict[str, Any]) -> Dict[str, Any]:
+            now_ts = int(datetime.utcnow().timestamp())
+            expire = user.get("expire")
+            base = max(int(expire), now_ts) if isinstance(expire, (int, float)) and expire else now_ts
+            return {"expire": base + delta_seconds}
+
+        try:
+            changes = await self._modify_locked(username, extend)
+        except Exception as e:
+            logger.error(f"Не удалось продлить пользователя {username}: {e}")
+            return False, None
+        return (True, changes["expire"]) if changes else (False, None)
+
+    @traced()
+    async def add_traffic(self, username: str, amount_gb: float) -> Tuple[bool, Optional[int]]:
+        """Увеличивает лимит трафика пользователя на amount_gb ГБ"""
+        delta_bytes = max(int(amount_gb * (1024 ** 3)), 0)
+
+        def raise_limit(user: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                current_limit = int(user.get("data_limit") or 0)
+            except (TypeError, ValueError):
+                current_limit = 0
+            return {"data_limit": max(current_limit + delta_bytes, 0)}
+
+        try:
+            changes = await self._modify_locked(username, raise_limit)
+        except Exception as e:
+            logger.error(f"Не удалось обновить лимит пользователя {username}: {e}")
+            return False, None
+        return (True, changes["data_limit"]) if changes else (False, None)
+
+    @traced()
+    async def plan_bulk_hours(self, hours: int, page_size: int = 100) -> MassGrantPlan:
+        """Предпросмотр сдвига срока всех пользователей с ограниченным сроком на hours часов (можно отрицательно)"""
+        return await self._plan_bulk(MassGrantPlanner.HOURS, hours, page_size)
+
+    @traced()
+    async def plan_bulk_traffic(self, amount_gb: float, page_size: int = 100) -> MassGrantPlan:
+        """Предпросмотр изменения лимита всех пользователей с лимитом на amount_gb ГБ (можно отрицательно)"""
+        return await self._plan_bulk(MassGrantPlanner.TRAFFIC, amount_gb, page_size)
+
+    async def _plan_bulk(self, kind: str, amount: float, page_size: int) -> MassGrantPlan:
+        users: List[Dict[str, Any]] = []
+        async for page in self._iter_user_pages(page_size):
+            users.extend(page)
+        return await asyncio.to_thread(MassGrantPlanner.plan, kind, amount, users)
+
+    @traced()
+    async def apply_grant(
+        self,
+        username: str,
+        kind: str,
+        amount: float,
+        journal: Callable[[Dict[str, int], int], Awaitable[None]],
+        expected: Optional[Tuple[int, int]] = None,
+    ) -> bool:
+        """
+        Начисление одному пользователю массовой операции под блокировкой его имени.
+
+        Новое значение считается по свежим данным; перед записью в панель
+        вызывается journal(прежние expire и data_limit, новое значение). Если
+        значения уже известны — запись прервана перезапуском или это отмена
+        начисления, — передается expected=(текущее, новое): если в панели уже
+        новое значение, запись не повторяется; если значение изменилось иначе,
+        пользователь пропускается.
+
+        Возвращает True, если начисление действует, и False, если пользователь
+        пропущен.
+        """
+        target_field = MassGrantPlanner.target_field(kind)
+        async with self.user_locks.hold(username):
+            user = await self.marzban_client.get_user(username)
+            if not user:
+                return False
+            current = int(user.get(target_field) or 0)
+            if expected:
+                before, target = expected
+                if current == target:
+                    return True
+                if current != before:
+                    logger.warning(
+                        f"Пользователь {username} изменен после начисления, пропуск: "
+                        f"{target_field} {before} → {current}, ожидалось {target}"
+                    )
+                    return False
+            else:
+                changes = MassGrantPlanner.changes_for(kind, amount, user)
+                if not changes:
+                    return False
+                target = changes[target_field]
+                await journal({field: int(user.get(field) or 0) for field in ("expire", "data_limit")}, target)
+            await self.marzban_client.patch_user(username, {target_field: target})
+        return True
+
+    async def _iter_user_pages(self, page_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Страницы списка пользователей Marzban"""
+        offset = 0
+        while True:
+            response = await self.marzban_client.get_users(offset=offset, limit=page_size)
+            users = response.get("users", [])
+            if not users:
+                break
+            yield users
+
+            offset += len(users)
+            total = response.get("total", offset)
+            if offset >= total:
+                break
+
+    # === Массовые операции на стороне панели ===
+    # Возвращают (затронуто пользователей, ошибок, выполнено поштучно). Поштучный
+    # обход — только для версий панели без соответствующего метода API.
+    @traced()
+    async def reset_all_traffic(self, page_size: int = 100) -> Tuple[int, int, bool]:
+        """Сбрасывает использованный трафик всем пользователям"""
+        try:
+            total = (await self.marzban_client.get_users(offset=0, limit=1)).get("total", 0)
+            await self.marzban_client.reset_all_users_traffic()
+            logger.info(f"Трафик сброшен всем пользователям ({total})")
+            return total, 0, False
+        except UnsupportedEndpointError:
+            logger.info("Панель не поддерживает массовый сброс трафика, сброс по одному пользователю")
+
+        reset = 0
+        errors = 0
+        async for users in self._iter_user_pages(page_size):
+            for user in users:
+                username = user.get("username")
+                if not username or not user.get("used_traffic"):
+                    continue
+                try:
+                    await self.marzban_client.reset_user_traffic(username)
+                    reset += 1
+                except Exception as e:
+                    errors += 1
+                    logger.error(f"Не удалось сбросить трафик пользователя {username}: {e}")
+        return reset, errors, True
+
+    @traced()
+    async def delete_expired_users(self, page_size: int = 100) -> Tuple[int, int, bool]:
+        """Удаляет пользователей с истекшей подпиской или исчерпанным трафиком (expired и limited)"""
+        try:
+            deleted = await self.marzban_client.delete_expired_users()
+            logger.info(f"Удалено истекших пользователей: {len(deleted)}")
+            return len(deleted), 0, False
+        except UnsupportedEndpointError:
+            logger.info("Панель не поддерживает массовое удаление истекших, удаление по одному пользователю")
+
+        # Список собирается заранее: удаление во время обхода сдвигает страницы
+        expired: List[str] = []
+        async for users in self._iter_user_pages(page_size):
+            expired.extend(user["username"] for user in users if user.get("status") in self.EXPIRED_STATUSES)
+
+        deleted_count = 0
+        errors = 0
+        for username in expired:
+            try:
+                async with self.user_locks.hold(username):
+                    # Подписку могли продлить, пока собирался список
+                    user = await self.marzban_client.get_user(username)
+                    if not user or user.get("status") not in self.EXPIRED_STATUSES:
+                        continue
+                    await self.marzban_client.delete_user(username)
+                deleted_count += 1
+            except Exception as e:
+                errors += 1
+                logger.error(f"Не удалось удалить пользователя {username}: {e}")
+        return deleted_count, errors, True
+
+    async def _modify_locked(
+        self,
+        username: str,
+        build_changes: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Чтение и изменение пользователя под блокировкой его имени.
+
+        Возвращает примененные изменения или None, если пользователя нет
+        или менять нечего.
+        """
+        async with self.user_locks.hold(username):
+            user = await self.marzban_client.get_user(username)
+            if not user:
+                return None
+            changes = build_changes(user)
+            if not changes:
+                return None
+            await self.marzban_client.patch_user(username, changes)
+        return changes
+
+    async def _complete_user_data(self, username: str, user_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Данные пользователя из уже полученного ответа; повторный запрос — только если в нем не хватает полей"""
+        if user_data and all(field in user_data for field in self.USER_FIELDS):
+            return user_data
+        return await self.marzban_client.get_user(username)
+
+    async def _build_subscription_info(self, username: str, user_data: Dict[str, Any]) -> SubscriptionInfo:
+        """SubscriptionInfo из ответа панели; ссылка запрашивается отдельно, только если ее нет в ответе"""
+        subscription_url = user_data.get("subscription_url") or await self._get_subscription_url_with_retry(username)
+        return SubscriptionInfo.from_marzban_data(user_data, subscription_url)
+
+    @traced()
     async def _get_subscription_url_with_retry(self, username: str, max_attempts: int = 3) -> Optional[str]:
         """Получает ссылку на подписку с повторными попытками"""
         for attempt in range(max_attempts):
@@ -1,13 +1,25 @@
 #domain/services/support_service.py
 import logging
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from domain.models.support import SupportTicket
 from infrastructure.database.repositories import SupportRepository
 from core.config import config
+from core.templates import MessageTemplate, format_datetime
+from core.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+TICKET_DETAILS = MessageTemplate(
+    "📨 Обращение #{ticket_id}\n\n"
+    "👤 Пользователь: {user_name}\n"
+    "📅 Создано: {created}\n"
+    "🔄 Обновлено: {updated}\n"
+    "Статус: {status_emoji} {status}\n\n"
+    "💬 Сообщение:\n{message}\n\n"
+    "{footer}\n"
+)
+
 
 class SupportService:
     MAX_OPEN_TICKETS = 3  # Максимум открытых тикетов на одного пользователя
@@ -16,6 +28,7 @@ class SupportService:
         self.support_repository = support_repository
 
     # === Создание тикета ===
+    @traced()
     async def create_support_ticket(self, user_id: int, user_name: str, message: str) -> Optional[SupportTicket]:
         """Создает новый тикет поддержки, если не превышен лимит открытых тикетов"""
         open_tickets_count = await self.support_repository.get_open_ticket_count(user_id)
@@ -37,24 +50,34 @@ class SupportService:
 
 
     # === Получение тикетов пользователя ===
+    @traced()
     async def get_user_tickets(self, user_id: int) -> List[SupportTicket]:
         """Возвращает все тикеты пользователя"""
         return await self.support_repository.get_tickets_by_user(user_id)
 
     # === Получение одного тикета ===
+    @traced()
     async def get_ticket_details(self, ticket_id: int, user_id: int) -> Optional[SupportTicket]:
         """Возвращает конкретный тикет, если он принадлежит пользователю"""
         return await self.support_repository.get_ticket_by_id(ticket_id, user_id)
 
+    @traced()
     async def get_ticket_for_admin(self, ticket_id: int) -> Optional[SupportTicket]:
         """Возвращает тикет по ID для администратора/саппорта"""
         return await self.support_repository.get_ticket_by_id_admin(ticket_id)
 
+    @traced()
     async def get_all_tickets(self, limit: Optional[int] = None) -> List[SupportTicket]:
         """Возвращает список всех тикетов для административного просмотра"""
         return await self.support_repository.get_all_tickets(limit=limit)
 
+    @traced()
+    async def get_ticket_counts(self) -> Dict[str, int]:
+        """Число тикетов по статусам (open, closed)"""
+        return await self.support_repository.count_tickets_by_status()
+
     # === Форматирование списка тикетов ===
+    @traced()
     async def format_ticket_list_for_user(self, tickets: List[SupportTicket]) -> str:
         """Формирует сообщение со списком тикетов пользователя"""
         if not tickets:
@@ -69,29 +92,23 @@ class SupportService:
         return "\n".join(msg_lines)
 
     # === Форматирование деталей тикета ===
+    @traced()
     async def format_ticket_details(self, ticket: SupportTicket) -> str:
         """Формирует детальное сообщение о тикете"""
-        status_emoji = "🟢" if ticket.status == "open" else "🔴"
-        created = ticket.created_at.strftime("%d.%m.%Y %H:%M") if ticket.created_at else "?"
-        updated = ticket.updated_at.strftime("%d.%m.%Y %H:%M") if ticket.updated_at else "?"
-
-        msg = (
-            f"📨 Обращение #{ticket.id}\n\n"
-            f"👤 Пользователь: {ticket.user_name}\n"
-            f"📅 Создано: {created}\n"
-            f"🔄 Обновлено: {updated}\n"
-            f"Статус: {status_emoji} {ticket.status.upper()}\n\n"
-            f"💬 Сообщение:\n{ticket.message}\n\n"
+        is_open = ticket.status == "open"
+        return TICKET_DETAILS.render(
+            ticket_id=ticket.id,
+            user_name=ticket.user_name,
+            created=format_datetime(ticket.created_at, "?"),
+            updated=format_datetime(ticket.updated_at, "?"),
+            status_emoji="🟢" if is_open else "🔴",
+            status=ticket.status.upper(),
+            message=ticket.message,
+            footer="⌛ Поддержка пока не ответила." if is_open else "✅ Тикет закрыт. Спасибо за обращение!",
         )
 
-        if ticket.status == "open":
-            msg += "⌛ Поддержка пока не ответила.\n"
-        else:
-            msg += "✅ Тикет закрыт. Спасибо за обращение!\n"
-
-        return msg
-
     # === Форматирование для админа ===
+    @traced()
     async def format_support_message_for_admin(self, user_id: int, user_name: str, message: str) -> str:
         """Форматирует сообщение для отправки администратору"""
         return (
@@ -115,18 +132,22 @@ class SupportService:
         return "📞 Для связи с техподдержкой используйте кнопку ниже"
 
     # === Закрытие тикета ===
+    @traced()
     async def close_ticket(self, ticket_id: int) -> bool:
         """Закрывает тикет"""
         return await self.support_repository.update_ticket_status(ticket_id, "closed")
 
+    @traced()
     async def reopen_ticket(self, ticket_id: int) -> bool:
         """Переоткрывает тикет"""
         return await self.support_repository.update_ticket_status(ticket_id, "open")
 
+    @traced()
     async def update_ticket_status(self, ticket_id: int, status: str) -> bool:
         """Обновляет статус тикета произвольно"""
         return await self.support_repository.update_ticket_status(ticket_id, status)
 
+    @traced()
     async def add_ticket_response(self, ticket_id: int, response: str) -> bool:
         """Сохраняет ответ поддержки"""
         return await self.support_repository.update_ticket_response(ticket_id, response)
@@ -0,0 +1,58 @@
+#domain/services/telegram_id_resolver.py
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional
+
+from infrastructure.marzban.api_client import MarzbanAPIClient
+from domain.services.user_service import UserService
+from core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramIdResolver:
+    """
+    Telegram ID пользователей Marzban для уведомлений.
+
+    Имена сначала ищутся в bot_users одним запросом на пачку; к панели
+    обращаются только за ненайденными, не больше ``concurrency`` запросов
+    одновременно.
+    """
+
+    def __init__(self, user_service: UserService, marzban_client: MarzbanAPIClient, concurrency: int = 8):
+        self.user_service = user_service
+        self.marzban_client = marzban_client
+        self.concurrency = max(1, concurrency)
+
+    @traced()
+    async def resolve(self, usernames: Iterable[str]) -> Dict[str, int]:
+        """Telegram ID по именам; пользователи без Telegram ID в ответ не попадают"""
+        unique = list(dict.fromkeys(username for username in usernames if username))
+        try:
+            found = await self.user_service.get_telegram_ids(unique)
+        except Exception as e:
+            logger.error(f"Не удалось получить Telegram ID пользователей из базы: {e}")
+            found = {}
+
+        missing = [username for username in unique if username not in found]
+        if missing:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def from_panel(username: str) -> Optional[int]:
+                async with semaphore:
+                    return await self._get_from_panel(username)
+
+            results = await asyncio.gather(*(from_panel(username) for username in missing))
+            found.update((username, telegram_id) for username, telegram_id in zip(missing, results) if telegram_id)
+        return found
+
+    async def _get_from_panel(self, username: str) -> Optional[int]:
+        try:
+            user = await self.marzban_client.get_user(username)
+        except Exception as e:
+            logger.error(f"Не удалось получить данные пользователя {username} из Marzban: {e}")
+            return None
+        try:
+            return int(user.get("telegram_id")) if user and user.get("telegram_id") else None
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,113 @@
+#domain/services/ticket_alert_service.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Iterable, List, Optional, Set
+
+from infrastructure.telegram import MessageSender, SendPriority
+from domain.models.support import SupportTicket
+
+logger = logging.getLogger(__name__)
+
+
+class TicketAlertService:
+    """
+    Фоновая рассылка уведомлений о новых тикетах администраторам и поддержке.
+
+    Уведомления уходят всем получателям одновременно через общий планировщик,
+    ошибка доставки одному получателю не влияет на остальных. Если за окно
+    ``digest_window`` секунд приходит больше ``digest_threshold`` тикетов,
+    следующие тикеты окна собираются в одну сводку.
+    """
+
+    DIGEST_MAX_LINES = 20
+    DIGEST_PREVIEW_LENGTH = 60
+
+    def __init__(
+        self,
+        message_sender: MessageSender,
+        recipients: Iterable[int],
+        digest_threshold: int = 5,
+        digest_window: float = 60.0,
+    ):
+        self.message_sender = message_sender
+        self.recipients: List[int] = sorted(set(recipients))
+        self.digest_threshold = max(1, digest_threshold)
+        self.digest_window = max(1.0, digest_window)
+
+        self._recent: Deque[float] = deque()
+        self._digest: List[SupportTicket] = []
+        self._digest_task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def notify_new_ticket(self, ticket: SupportTicket, alert_text: str):
+        """Ставит уведомление о тикете в фон и сразу возвращает управление"""
+        if not self.recipients:
+            return
+
+        now = time.monotonic()
+        while self._recent and self._recent[0] <= now - self.digest_window:
+            self._recent.popleft()
+        self._recent.append(now)
+
+        if len(self._recent) <= self.digest_threshold:
+            self._spawn(self._fan_out(alert_text))
+            return
+
+        self._digest.append(ticket)
+        if self._digest_task is None or self._digest_task.done():
+            self._digest_task = self._spawn(self._flush_digest_later())
+
+    async def stop(self):
+        """Отправляет накопленную сводку и дожидается фоновых рассылок"""
+        if self._digest_task and not self._digest_task.done():
+            self._digest_task.cancel()
+        if self._digest:
+            await self._flush_digest()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _fan_out(self, text: str) -> int:
+        results = await asyncio.gather(*(self._deliver(recipient, text) for recipient in self.recipients))
+        return sum(1 for delivered in results if delivered)
+
+    async def _deliver(self, recipient: int, text: str) -> bool:
+        try:
+            await self.message_sender.send_message(recipient, text, priority=SendPriority.NOTIFICATION)
+            return True
+        except Exception as e:
+            logger.error(f"Не удалось отправить сообщение саппорту {recipient}: {e}")
+            return False
+
+    async def _flush_digest_later(self):
+        await asyncio.sleep(self.digest_window)
+        await self._flush_digest()
+
+    async def _flush_digest(self):
+        tickets, self._digest = self._digest, []
+        if not tickets:
+            return
+        await self._fan_out(self._format_digest(tickets))
+
+    def _format_digest(self, tickets: List[SupportTicket]) -> str:
+        if self.digest_window >= 60:
+            window_text = f"{self.digest_window / 60:g} мин."
+        else:
+            window_text = f"{self.digest_window:g} сек."
+        lines = [f"🆘 Новые обращения в поддержку: {len(tickets)} за последние {window_text}\n"]
+        for ticket in tickets[:self.DIGEST_MAX_LINES]:
+            preview = " ".join((ticket.message or "").split())
+            if len(preview) > self.DIGEST_PREVIEW_LENGTH:
+                preview = preview[:self.DIGEST_PREVIEW_LENGTH - 1] + "…"
+            lines.append(f"#{ticket.id} · @{ticket.user_name} ({ticket.user_id}): {preview}")
+        if len(tickets) > self.DIGEST_MAX_LINES:
+            lines.append(f"…и еще {len(tickets) - self.DIGEST_MAX_LINES}")
+        lines.append("\nПодробнее — в разделе «Тикеты поддержки» админ-панели.")
+        return "\n".join(lines)
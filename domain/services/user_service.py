@@ -1,16 +1,21 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 from infrastructure.database.repositories import UserRepository
 from domain.models.user import TelegramUser
+from core.tracing import traced
 
 
 class UserService:
     def __init__(self, user_repository: UserRepository):
         self.user_repository = user_repository
 
+    @traced()
     async def get_or_create_user(self, telegram_id: int) -> TelegramUser:
         """Получает или создает пользователя"""
         marzban_username = f"qwqvpn_{telegram_id}"
 
+        # Пользователь снова пишет боту — чат опять доступен для рассылок
+        await self.user_repository.unblock_chat(telegram_id)
+
         existing_user = await self.user_repository.get_by_telegram_id(telegram_id)
         if existing_user:
             if not existing_user.marzban_username:
@@ -25,19 +30,28 @@ class UserService:
         await self.user_repository.save(new_user)
         return new_user
 
+    @traced()
     async def get_user_marzban_username(self, telegram_id: int) -> Optional[str]:
         """Получает имя пользователя Marzban по Telegram ID"""
         user = await self.user_repository.get_by_telegram_id(telegram_id)
         return user.marzban_username if user else None
 
+    @traced()
     async def get_user_by_marzban_username(self, username: str) -> Optional[TelegramUser]:
         """Получает пользователя по имени в Marzban"""
         return await self.user_repository.get_by_marzban_username(username)
 
+    @traced()
+    async def get_telegram_ids(self, usernames: List[str]) -> Dict[str, int]:
+        """Telegram ID пользователей бота по именам в Marzban; ненайденных в ответе нет"""
+        return await self.user_repository.get_telegram_ids_by_usernames(usernames)
+
+    @traced()
     async def get_all_users(self) -> List[TelegramUser]:
         """Возвращает всех пользователей бота"""
         return await self.user_repository.get_all()
 
+    @traced()
     async def update_user_subscription_type(self, telegram_id: int, subscription_type: str):
         """Обновляет тип подписки пользователя"""
         user = await self.user_repository.get_by_telegram_id(telegram_id)
@@ -1,3 +1,10 @@
-from .repositories import UserRepository, SupportRepository
+from .repositories import (
+    UserRepository,
+    SupportRepository,
+    BroadcastRepository,
+    SubscriptionSnapshotRepository,
+    PaymentRepository,
+    MassOperationRepository,
+)
 
-__all__ = ['UserRepository', 'SupportRepository']
\ No newline at end of file
+__all__ = ['UserRepository', 'SupportRepository', 'BroadcastRepository', 'SubscriptionSnapshotRepository', 'PaymentRepository', 'MassOperationRepository']
\ No newline at end of file
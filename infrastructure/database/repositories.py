@@ -1,15 +1,24 @@
 #infrastructure/database/repositories.py
+import json
 import sqlite3
+import time
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict, Any
 
 import aiosqlite
 
 from domain.models.user import TelegramUser
 from domain.models.support import SupportTicket
+from domain.models.broadcast import Broadcast, BroadcastAudience
+from domain.models.payment import PaymentOrder
+from domain.models.mass_operation import MassOperation
+from core.tracing import traced
 
 
 class UserRepository:
+    # Имен в одном запросе WHERE ... IN (...)
+    IN_CHUNK_SIZE = 500
+
     def __init__(self, db_path: str):
         self.db_path = db_path
         self._init_db()
@@ -24,14 +33,21 @@ class UserRepository:
                     marzban_username TEXT UNIQUE,
                     subscription_type TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS blocked_chats(
+                    telegram_id INTEGER PRIMARY KEY,
+                    reason TEXT,
+                    blocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
             conn.commit()
 
+    @traced()
     async def get_by_telegram_id(self, telegram_id: int) -> Optional[TelegramUser]:
         """Получает пользователя по Telegram ID"""
         async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = await conn.execute(
                 'SELECT telegram_id, marzban_username, subscription_type, created_at FROM bot_users WHERE telegram_id = ?',
                 (telegram_id,)
@@ -40,21 +56,13 @@ class UserRepository:
             await cursor.close()
 
         if result:
-            created_at = result[3]
-            if created_at:
-                created_at = datetime.fromisoformat(created_at)
-            return TelegramUser(
-                telegram_id=result[0],
-                marzban_username=result[1],
-                subscription_type=result[2],
-                created_at=created_at
-            )
+            return TelegramUser.from_row(result)
         return None
 
+    @traced()
     async def get_by_marzban_username(self, username: str) -> Optional[TelegramUser]:
         """Получает пользователя по имени в Marzban"""
         async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = await conn.execute(
                 'SELECT telegram_id, marzban_username, subscription_type, created_at FROM bot_users WHERE marzban_username = ?',
                 (username,)
@@ -63,17 +71,28 @@ class UserRepository:
             await cursor.close()
 
         if result:
-            created_at = result[3]
-            if created_at:
-                created_at = datetime.fromisoformat(created_at)
-            return TelegramUser(
-                telegram_id=result[0],
-                marzban_username=result[1],
-                subscription_type=result[2],
-                created_at=created_at
-            )
+            return TelegramUser.from_row(result)
         return None
 
+    @traced()
+    async def get_telegram_ids_by_usernames(self, usernames: List[str]) -> Dict[str, int]:
+        """Telegram ID по именам в Marzban: один запрос на каждые IN_CHUNK_SIZE имен"""
+        found: Dict[str, int] = {}
+        if not usernames:
+            return found
+        async with aiosqlite.connect(self.db_path) as conn:
+            for start in range(0, len(usernames), self.IN_CHUNK_SIZE):
+                chunk = usernames[start:start + self.IN_CHUNK_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor = await conn.execute(
+                    f'SELECT marzban_username, telegram_id FROM bot_users WHERE marzban_username IN ({placeholders})',
+                    chunk
+                )
+                found.update(await cursor.fetchall())
+                await cursor.close()
+        return found
+
+    @traced()
     async def save(self, user: TelegramUser):
         """Сохраняет пользователя"""
         async with aiosqlite.connect(self.db_path) as conn:
@@ -83,26 +102,47 @@ class UserRepository:
             ''', (user.telegram_id, user.marzban_username, user.subscription_type))
             await conn.commit()
 
+    @traced()
     async def get_all(self) -> List[TelegramUser]:
         """Получает всех пользователей"""
         async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = await conn.execute('SELECT telegram_id, marzban_username, subscription_type, created_at FROM bot_users')
             results = await cursor.fetchall()
             await cursor.close()
 
-        users = []
-        for result in results:
-            created_at = result[3]
-            if created_at:
-                created_at = datetime.fromisoformat(created_at)
-            users.append(TelegramUser(
-                telegram_id=result[0],
-                marzban_username=result[1],
-                subscription_type=result[2],
-                created_at=created_at
-            ))
-        return users
+        return [TelegramUser.from_row(result) for result in results]
+
+    @traced()
+    async def mark_chats_blocked(self, chats: List[Tuple[int, str]]):
+        """Отмечает чаты, доставка в которые невозможна (бот заблокирован, аккаунт удален)"""
+        if not chats:
+            return
+        blocked_at = datetime.now().isoformat()
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.executemany(
+                'INSERT OR REPLACE INTO blocked_chats (telegram_id, reason, blocked_at) VALUES (?, ?, ?)',
+                [(telegram_id, reason, blocked_at) for telegram_id, reason in chats]
+            )
+            await conn.commit()
+
+    @traced()
+    async def unblock_chat(self, telegram_id: int) -> bool:
+        """Снимает отметку о недоступности чата"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute('DELETE FROM blocked_chats WHERE telegram_id = ?', (telegram_id,))
+            await conn.commit()
+            affected = cursor.rowcount
+            await cursor.close()
+        return affected > 0
+
+    @traced()
+    async def count_blocked_chats(self) -> int:
+        """Считает чаты, исключенные из рассылок"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute('SELECT COUNT(*) FROM blocked_chats')
+            result = await cursor.fetchone()
+            await cursor.close()
+        return result[0] if result else 0
 
 
 class SupportRepository:
@@ -129,6 +169,7 @@ class SupportRepository:
             ''')
             conn.commit()
 
+    @traced()
     async def save_ticket(self, ticket: SupportTicket) -> SupportTicket:
         """Сохраняет тикет поддержки"""
         created_at = ticket.created_at or datetime.now()
@@ -151,10 +192,10 @@ class SupportRepository:
             created_at=created_at
         )
 
+    @traced()
     async def get_tickets_by_user(self, user_id: int, limit: int = 5) -> List[SupportTicket]:
         """Получает последние тикеты пользователя"""
         async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = await conn.execute(
                 '''SELECT id, user_id, user_name, message, response, status, created_at, updated_at
                    FROM support_tickets
@@ -166,24 +207,12 @@ class SupportRepository:
             results = await cursor.fetchall()
             await cursor.close()
 
-        tickets = []
-        for result in results:
-            tickets.append(SupportTicket(
-                id=result[0],
-                user_id=result[1],
-                user_name=result[2],
-                message=result[3],
-                response=result[4],
-                status=result[5],
-                created_at=datetime.fromisoformat(result[6]) if result[6] else None,
-                updated_at=datetime.fromisoformat(result[7]) if result[7] else None
-            ))
-        return tickets
+        return [SupportTicket.from_row(result) for result in results]
 
+    @traced()
     async def get_ticket_by_id(self, ticket_id: int, user_id: int) -> Optional[SupportTicket]:
         """Получает один тикет, принадлежащий пользователю"""
         async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = await conn.execute(
                 '''SELECT id, user_id, user_name, message, response, status, created_at, updated_at
                    FROM support_tickets
@@ -194,21 +223,12 @@ class SupportRepository:
             await cursor.close()
         if not result:
             return None
-        return SupportTicket(
-            id=result[0],
-            user_id=result[1],
-            user_name=result[2],
-            message=result[3],
-            response=result[4],
-            status=result[5],
-            created_at=datetime.fromisoformat(result[6]) if result[6] else None,
-            updated_at=datetime.fromisoformat(result[7]) if result[7] else None
-        )
+        return SupportTicket.from_row(result)
 
+    @traced()
     async def get_ticket_by_id_admin(self, ticket_id: int) -> Optional[SupportTicket]:
         """Получает тикет по ID без ограничения по пользователю"""
         async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = await conn.execute(
                 '''SELECT id, user_id, user_name, message, response, status, created_at, updated_at
                    FROM support_tickets
@@ -221,17 +241,9 @@ class SupportRepository:
         if not result:
             return None
 
-        return SupportTicket(
-            id=result[0],
-            user_id=result[1],
-            user_name=result[2],
-            message=result[3],
-            response=result[4],
-            status=result[5],
-            created_at=datetime.fromisoformat(result[6]) if result[6] else None,
-            updated_at=datetime.fromisoformat(result[7]) if result[7] else None
-        )
+        return SupportTicket.from_row(result)
 
+    @traced()
     async def get_all_tickets(self, limit: Optional[int] = None) -> List[SupportTicket]:
         """Возвращает все тикеты (опционально ограничивая количество)"""
         query = '''SELECT id, user_id, user_name, message, response, status, created_at, updated_at
@@ -243,25 +255,22 @@ class SupportRepository:
             params.append(limit)
 
         async with aiosqlite.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
             cursor = await conn.execute(query, params)
             results = await cursor.fetchall()
             await cursor.close()
 
-        tickets = []
-        for result in results:
-            tickets.append(SupportTicket(
-                id=result[0],
-                user_id=result[1],
-                user_name=result[2],
-                message=result[3],
-                response=result[4],
-                status=result[5],
-                created_at=datetime.fromisoformat(result[6]) if result[6] else None,
-                updated_at=datetime.fromisoformat(result[7]) if result[7] else None
-            ))
-        return tickets
+        return [SupportTicket.from_row(result) for result in results]
 
+    @traced()
+    async def count_tickets_by_status(self) -> Dict[str, int]:
+        """Число тикетов по статусам"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute("SELECT status, COUNT(*) FROM support_tickets GROUP BY status")
+            results = await cursor.fetchall()
+            await cursor.close()
+        return {status: count for status, count in results}
+
+    @traced()
     async def get_open_ticket_count(self, user_id: int) -> int:
         """Считает количество открытых тикетов пользователя"""
         async with aiosqlite.connect(self.db_path) as conn:
@@ -273,6 +282,7 @@ class SupportRepository:
             await cursor.close()
         return result[0] if result else 0
 
+    @traced()
     async def update_ticket_status(self, ticket_id: int, status: str) -> bool:
         """Обновляет статус тикета"""
         updated_at = datetime.now().isoformat()
@@ -286,6 +296,7 @@ class SupportRepository:
             await cursor.close()
         return affected > 0
 
+    @traced()
     async def update_ticket_response(self, ticket_id: int, response: str) -> bool:
         """Сохраняет ответ поддержки для тикета"""
         updated_at = datetime.now().isoformat()
@@ -298,3 +309,872 @@ class SupportRepository:
             affected = cursor.rowcount
             await cursor.close()
         return affected > 0
+
+
+class BroadcastRepository:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._init_broadcast_db()
+
+    def _init_broadcast_db(self):
+        """Инициализация таблицы рассылок"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS broadcasts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    text TEXT NOT NULL,
+                    created_by INTEGER,
+                    status TEXT DEFAULT 'pending',
+                    cursor INTEGER DEFAULT 0,
+                    sent_count INTEGER DEFAULT 0,
+                    failed_count INTEGER DEFAULT 0,
+                    blocked_count INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    audience TEXT
+                )
+            ''')
+            cursor.execute("PRAGMA table_info(broadcasts)")
+            if "audience" not in {column[1] for column in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE broadcasts ADD COLUMN audience TEXT")
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts(status)')
+            conn.commit()
+
+    @staticmethod
+    def _row_to_broadcast(result) -> Broadcast:
+        return Broadcast(
+            id=result[0],
+            text=result[1],
+            created_by=result[2],
+            status=result[3],
+            cursor=result[4],
+            sent_count=result[5],
+            failed_count=result[6],
+            blocked_count=result[7],
+            created_at=datetime.fromisoformat(result[8]) if result[8] else None,
+            updated_at=datetime.fromisoformat(result[9]) if result[9] else None,
+            finished_at=datetime.fromisoformat(result[10]) if result[10] else None,
+            audience=BroadcastAudience.from_dict(json.loads(result[11]) if result[11] else None)
+        )
+
+    @traced()
+    async def create(self, text: str, created_by: int, audience: Optional[BroadcastAudience] = None) -> Broadcast:
+        """Создает задание на рассылку"""
+        audience = audience or BroadcastAudience()
+        created_at = datetime.now()
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''INSERT INTO broadcasts (text, created_by, status, created_at, updated_at, audience)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (
+                    text,
+                    created_by,
+                    'pending',
+                    created_at.isoformat(),
+                    created_at.isoformat(),
+                    json.dumps(audience.to_dict())
+                )
+            )
+            broadcast_id = cursor.lastrowid
+            await conn.commit()
+            await cursor.close()
+
+        return Broadcast(
+            id=broadcast_id,
+            text=text,
+            created_by=created_by,
+            created_at=created_at,
+            updated_at=created_at,
+            audience=audience
+        )
+
+    @traced()
+    async def get_by_id(self, broadcast_id: int) -> Optional[Broadcast]:
+        """Получает рассылку по ID"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''SELECT id, text, created_by, status, cursor, sent_count, failed_count, blocked_count,
+                          created_at, updated_at, finished_at, audience
+                   FROM broadcasts WHERE id = ?''',
+                (broadcast_id,)
+            )
+            result = await cursor.fetchone()
+            await cursor.close()
+        return self._row_to_broadcast(result) if result else None
+
+    @traced()
+    async def get_unfinished(self) -> List[Broadcast]:
+        """Возвращает рассылки, прерванные до завершения"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''SELECT id, text, created_by, status, cursor, sent_count, failed_count, blocked_count,
+                          created_at, updated_at, finished_at, audience
+                   FROM broadcasts WHERE status IN ('pending', 'running')
+                   ORDER BY id'''
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [self._row_to_broadcast(result) for result in results]
+
+    @traced()
+    async def save_progress(self, broadcast: Broadcast) -> bool:
+        """Сохраняет курсор и счетчики рассылки (контрольная точка)"""
+        broadcast.updated_at = datetime.now()
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''UPDATE broadcasts
+                   SET status = ?, cursor = ?, sent_count = ?, failed_count = ?, blocked_count = ?,
+                       updated_at = ?, finished_at = ?
+                   WHERE id = ?''',
+                (
+                    broadcast.status,
+                    broadcast.cursor,
+                    broadcast.sent_count,
+                    broadcast.failed_count,
+                    broadcast.blocked_count,
+                    broadcast.updated_at.isoformat(),
+                    broadcast.finished_at.isoformat() if broadcast.finished_at else None,
+                    broadcast.id
+                )
+            )
+            await conn.commit()
+            affected = cursor.rowcount
+            await cursor.close()
+        return affected > 0
+
+
+class SubscriptionSnapshotRepository:
+    """
+    Локальная копия состояния подписок из Marzban.
+
+    Нужна для выборок по статусу, сроку и трафику без обхода панели:
+    аудитория рассылки считается одним запросом bot_users ⨝ subscription_snapshots.
+    """
+
+    # Коды статусов для аналитики; неизвестный статус получает код len(STATUS_CODES)
+    STATUS_CODES = ("active", "expired", "limited", "disabled", "on_hold")
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._init_snapshot_db()
+
+    def _init_snapshot_db(self):
+        """Инициализация таблицы снимков подписок"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS subscription_snapshots (
+                    marzban_username TEXT PRIMARY KEY,
+                    status TEXT,
+                    expire INTEGER,
+                    data_limit INTEGER,
+                    used_traffic INTEGER,
+                    updated_at TIMESTAMP
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_status ON subscription_snapshots(status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_expire ON subscription_snapshots(expire)')
+            conn.commit()
+
+    @staticmethod
+    def _snapshot_row(user_data: Dict[str, Any], updated_at: str) -> tuple:
+        status = user_data.get("status")
+        return (
+            user_data.get("username"),
+            getattr(status, "value", status),
+            user_data.get("expire") or None,
+            user_data.get("data_limit") or 0,
+            user_data.get("used_traffic") or 0,
+            updated_at
+        )
+
+    @traced()
+    async def upsert_many(self, users: List[Dict[str, Any]], updated_at: Optional[datetime] = None):
+        """Сохраняет снимки подписок по данным пользователей Marzban"""
+        rows = [
+            self._snapshot_row(user_data, (updated_at or datetime.now()).isoformat())
+            for user_data in users
+            if user_data and user_data.get("username")
+        ]
+        if not rows:
+            return
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.executemany(
+                '''INSERT OR REPLACE INTO subscription_snapshots
+                   (marzban_username, status, expire, data_limit, used_traffic, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                rows
+            )
+            await conn.commit()
+
+    @traced()
+    async def get_usage_rows(self) -> List[Tuple[int, int, int, int]]:
+        """Строки (код статуса, expire, data_limit, used_traffic) всех снимков; пустые значения — 0"""
+        status_case = " ".join(f"WHEN '{status}' THEN {code}" for code, status in enumerate(self.STATUS_CODES))
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                f'''SELECT CASE status {status_case} ELSE {len(self.STATUS_CODES)} END,
+                           COALESCE(expire, 0), COALESCE(data_limit, 0), COALESCE(used_traffic, 0)
+                    FROM subscription_snapshots'''
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return results
+
+    @traced()
+    async def delete_stale(self, updated_before: datetime) -> int:
+        """Удаляет снимки пользователей, которых больше нет в панели"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                'DELETE FROM subscription_snapshots WHERE updated_at < ?',
+                (updated_before.isoformat(),)
+            )
+            await conn.commit()
+            affected = cursor.rowcount
+            await cursor.close()
+        return affected
+
+    @staticmethod
+    def _audience_filter(audience: Optional[BroadcastAudience]) -> Tuple[str, List[Any]]:
+        """Строит условие WHERE для аудитории рассылки"""
+        conditions = ["b.telegram_id IS NULL"]
+        params: List[Any] = []
+        if not audience:
+            return " AND ".join(conditions), params
+
+        if audience.never_purchased:
+            conditions.append("u.subscription_type IS NULL AND s.marzban_username IS NULL")
+        if audience.subscription_type:
+            conditions.append("u.subscription_type = ?")
+            params.append(audience.subscription_type)
+        if audience.status:
+            conditions.append("s.status = ?")
+            params.append(audience.status)
+        if audience.expires_within_days is not None:
+            now = int(time.time())
+            conditions.append("s.expire > ? AND s.expire <= ?")
+            params.extend([now, now + audience.expires_within_days * 86400])
+        if audience.usage_above_percent is not None:
+            conditions.append("s.data_limit > 0 AND s.used_traffic * 100.0 >= s.data_limit * ?")
+            params.append(audience.usage_above_percent)
+        return " AND ".join(conditions), params
+
+    @traced()
+    async def get_audience_ids_after(
+        self,
+        after_id: int,
+        limit: int,
+        audience: Optional[BroadcastAudience] = None
+    ) -> List[int]:
+        """Возвращает следующую пачку Telegram ID аудитории, пропуская заблокированные чаты"""
+        where, params = self._audience_filter(audience)
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                f'''SELECT u.telegram_id
+                    FROM bot_users u
+                    LEFT JOIN subscription_snapshots s ON s.marzban_username = u.marzban_username
+                    LEFT JOIN blocked_chats b ON b.telegram_id = u.telegram_id
+                    WHERE u.telegram_id > ? AND {where}
+                    ORDER BY u.telegram_id
+                    LIMIT ?''',
+                [after_id, *params, limit]
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [row[0] for row in results]
+
+    @traced()
+    async def count_audience(self, audience: Optional[BroadcastAudience] = None) -> int:
+        """Считает получателей рассылки"""
+        where, params = self._audience_filter(audience)
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                f'''SELECT COUNT(*)
+                    FROM bot_users u
+                    LEFT JOIN subscription_snapshots s ON s.marzban_username = u.marzban_username
+                    LEFT JOIN blocked_chats b ON b.telegram_id = u.telegram_id
+                    WHERE {where}''',
+                params
+            )
+            result = await cursor.fetchone()
+            await cursor.close()
+        return result[0] if result else 0
+
+
+class PaymentRepository:
+    """
+    Очередь оплаченных заказов (outbox) и журнал платежей.
+
+    Оплата записывается сразу после successful_payment, а выдача подписки
+    выполняется фоновыми обработчиками; незавершенные заказы подхватываются
+    после перезапуска. charge_id уникален, поэтому повторное обновление с
+    той же оплатой не создает второй заказ, а claim() отдает заказ в работу
+    только одному обработчику.
+
+    Перед записью в панель прежнее и новое значение срока или лимита
+    сохраняются в заказе (mark_applying), поэтому повтор после сбоя или
+    перезапуска сверяется с панелью и не начисляет подписку второй раз.
+    """
+
+    COLUMNS = (
+        "id, telegram_id, plan, quantity, amount, currency, payload, charge_id, "
+        "status, attempts, last_error, created_at, updated_at, fulfilled_at, before_value, target_value"
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._init_payments_db()
+
+    def _init_payments_db(self):
+        """Инициализация таблицы платежей"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS payments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    telegram_id INTEGER NOT NULL,
+                    plan TEXT NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    amount INTEGER NOT NULL,
+                    currency TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    charge_id TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at TIMESTAMP NOT NULL,
+                    updated_at TIMESTAMP NOT NULL,
+                    fulfilled_at TIMESTAMP,
+                    before_value INTEGER,
+                    target_value INTEGER
+                )
+            ''')
+            cursor.execute("PRAGMA table_info(payments)")
+            columns = {column[1] for column in cursor.fetchall()}
+            for column in ("before_value", "target_value"):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE payments ADD COLUMN {column} INTEGER")
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status)')
+            cursor.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_charge_id ON payments(charge_id) '
+                'WHERE charge_id IS NOT NULL'
+            )
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_payments_user ON payments(telegram_id, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_payments_created ON payments(created_at)')
+            conn.commit()
+
+    @traced()
+    async def create(self, order: PaymentOrder) -> Tuple[PaymentOrder, bool]:
+        """
+        Записывает оплату в очередь выдачи.
+
+        Возвращает (заказ, создан). Если оплата с тем же charge_id уже
+        записана, возвращается существующий заказ и False.
+        """
+        if order.charge_id:
+            # Быстрая проверка по индексу; гонку двух вставок закрывает уникальный индекс
+            existing = await self.get_by_charge_id(order.charge_id)
+            if existing:
+                return existing, False
+
+        now = datetime.now()
+        order.created_at = order.created_at or now
+        order.updated_at = now
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''INSERT INTO payments (telegram_id, plan, quantity, amount, currency, payload, charge_id,
+                                         status, attempts, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (charge_id) WHERE charge_id IS NOT NULL DO NOTHING''',
+                (
+                    order.telegram_id,
+                    order.plan,
+                    order.quantity,
+                    order.amount,
+                    order.currency,
+                    order.payload,
+                    order.charge_id,
+                    order.status,
+                    order.attempts,
+                    order.created_at.isoformat(),
+                    order.updated_at.isoformat()
+                )
+            )
+            created = cursor.rowcount > 0
+            order.id = cursor.lastrowid if created else None
+            await conn.commit()
+            await cursor.close()
+
+        if not created:
+            existing = await self.get_by_charge_id(order.charge_id)
+            return existing or order, False
+        return order, True
+
+    @traced()
+    async def get_by_charge_id(self, charge_id: str) -> Optional[PaymentOrder]:
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(f'SELECT {self.COLUMNS} FROM payments WHERE charge_id = ?', (charge_id,))
+            result = await cursor.fetchone()
+            await cursor.close()
+        return PaymentOrder.from_row(result) if result else None
+
+    @traced()
+    async def get_by_id(self, order_id: int) -> Optional[PaymentOrder]:
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(f'SELECT {self.COLUMNS} FROM payments WHERE id = ?', (order_id,))
+            result = await cursor.fetchone()
+            await cursor.close()
+        return PaymentOrder.from_row(result) if result else None
+
+    @traced()
+    async def get_unfinished(self) -> List[PaymentOrder]:
+        """
+        Заказы, выдача которых не завершена.
+
+        Вызывается при запуске: заказы в статусе processing остались от
+        прерванного процесса, поэтому сначала возвращаются в pending. Если
+        запись в панель уже начиналась, в заказе сохранен журнал, и повтор
+        сверяет панель с ним вместо нового начисления.
+        """
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute(
+                "UPDATE payments SET status = 'pending', updated_at = ? WHERE status = 'processing'",
+                (datetime.now().isoformat(),)
+            )
+            await conn.commit()
+            cursor = await conn.execute(
+                f"SELECT {self.COLUMNS} FROM payments WHERE status = 'pending' ORDER BY id"
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [PaymentOrder.from_row(result) for result in results]
+
+    @traced()
+    async def get_journaled_pending(self, telegram_id: int, exclude_id: int) -> List[PaymentOrder]:
+        """
+        Ожидающие повтора заказы пользователя, запись которых в панель уже
+        начиналась (заполнен журнал), кроме exclude_id; индекс idx_payments_user.
+        """
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                f'''SELECT {self.COLUMNS} FROM payments
+                    WHERE telegram_id = ? AND status = 'pending' AND target_value IS NOT NULL AND id != ?
+                    ORDER BY id''',
+                (telegram_id, exclude_id)
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [PaymentOrder.from_row(result) for result in results]
+
+    @traced()
+    async def claim(self, order: PaymentOrder) -> bool:
+        """
+        Атомарно переводит заказ из pending в processing.
+
+        Из нескольких обработчиков, взявших один заказ, True получит только
+        один; остальные должны пропустить заказ.
+        """
+        updated_at = datetime.now()
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''UPDATE payments
+                   SET status = 'processing', attempts = attempts + 1, updated_at = ?
+                   WHERE id = ? AND status = 'pending'
+                   RETURNING attempts''',
+                (updated_at.isoformat(), order.id)
+            )
+            result = await cursor.fetchone()
+            await cursor.close()
+            await conn.commit()
+
+        if not result:
+            return False
+        order.status = 'processing'
+        order.attempts = result[0]
+        order.updated_at = updated_at
+        return True
+
+    @traced()
+    async def mark_applying(self, order: PaymentOrder) -> bool:
+        """Сохраняет журнал заказа (before_value, target_value) перед записью в панель"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''UPDATE payments SET before_value = ?, target_value = ?, updated_at = ?
+                   WHERE id = ? AND status = 'processing' ''',
+                (order.before_value, order.target_value, datetime.now().isoformat(), order.id)
+            )
+            await conn.commit()
+            affected = cursor.rowcount
+            await cursor.close()
+        return affected > 0
+
+    @traced()
+    async def get_user_history(self, telegram_id: int, limit: int = 20) -> List[PaymentOrder]:
+        """Последние платежи пользователя (индекс idx_payments_user)"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                f'''SELECT {self.COLUMNS} FROM payments
+                    WHERE telegram_id = ?
+                    ORDER BY created_at DESC
+                    LIMIT ?''',
+                (telegram_id, limit)
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [PaymentOrder.from_row(result) for result in results]
+
+    @traced()
+    async def get_daily_totals(self, since: datetime) -> List[Tuple[str, int, int, int]]:
+        """
+        Итоги по дням начиная с ``since`` (индекс idx_payments_created).
+
+        Возвращает (дата, число платежей, сумма, число не выданных заказов)
+        по убыванию даты.
+        """
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''SELECT substr(created_at, 1, 10) AS day,
+                          COUNT(*),
+                          COALESCE(SUM(amount), 0),
+                          SUM(CASE WHEN status != 'fulfilled' THEN 1 ELSE 0 END)
+                   FROM payments
+                   WHERE created_at >= ?
+                   GROUP BY day
+                   ORDER BY day DESC''',
+                (since.isoformat(),)
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [tuple(result) for result in results]
+
+    @traced()
+    async def save_state(self, order: PaymentOrder) -> bool:
+        """Сохраняет статус, число попыток и последнюю ошибку заказа"""
+        order.updated_at = datetime.now()
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''UPDATE payments
+                   SET status = ?, attempts = ?, last_error = ?, updated_at = ?, fulfilled_at = ?
+                   WHERE id = ?''',
+                (
+                    order.status,
+                    order.attempts,
+                    order.last_error,
+                    order.updated_at.isoformat(),
+                    order.fulfilled_at.isoformat() if order.fulfilled_at else None,
+                    order.id
+                )
+            )
+            await conn.commit()
+            affected = cursor.rowcount
+            await cursor.close()
+        return affected > 0
+
+
+class MassOperationRepository:
+    """
+    Задания массовых начислений и их замороженные списки пользователей.
+
+    Список целей записывается целиком при создании задания, у каждого
+    пользователя свой статус: pending → applying → done / skipped / failed.
+    Перед записью в панель сохраняются прежнее и новое значение (applying),
+    поэтому после перезапуска прерванная запись проверяется по панели, а не
+    выполняется повторно.
+
+    Прежние expire и data_limit каждого измененного пользователя дописываются
+    в журнал отмены mass_operation_undo. Отмена — такое же задание (undo_of),
+    у пользователей которого значения заполнены заранее: текущее значение
+    ожидается равным записанному начислением, новое — прежнему из журнала.
+    """
+
+    COLUMNS = (
+        "id, kind, amount, created_by, status, total, updated_count, skipped_count, failed_count, "
+        "created_at, updated_at, finished_at, undo_of"
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._init_mass_operations_db()
+
+    def _init_mass_operations_db(self):
+        """Инициализация таблиц массовых операций"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS mass_operations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    created_by INTEGER,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    total INTEGER NOT NULL DEFAULT 0,
+                    updated_count INTEGER NOT NULL DEFAULT 0,
+                    skipped_count INTEGER NOT NULL DEFAULT 0,
+                    failed_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP NOT NULL,
+                    updated_at TIMESTAMP NOT NULL,
+                    finished_at TIMESTAMP,
+                    undo_of INTEGER
+                )
+            ''')
+            cursor.execute("PRAGMA table_info(mass_operations)")
+            if "undo_of" not in {column[1] for column in cursor.fetchall()}:
+                cursor.execute("ALTER TABLE mass_operations ADD COLUMN undo_of INTEGER")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS mass_operation_items (
+                    operation_id INTEGER NOT NULL,
+                    username TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    before_value INTEGER,
+                    target_value INTEGER,
+                    PRIMARY KEY (operation_id, username)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS mass_operation_undo (
+                    operation_id INTEGER NOT NULL,
+                    username TEXT NOT NULL,
+                    expire INTEGER,
+                    data_limit INTEGER,
+                    PRIMARY KEY (operation_id, username)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_mass_operations_status ON mass_operations(status)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_mass_operations_undo_of ON mass_operations(undo_of)')
+            conn.commit()
+
+    @staticmethod
+    def _row_to_operation(result) -> MassOperation:
+        return MassOperation(
+            id=result[0],
+            kind=result[1],
+            amount=result[2],
+            created_by=result[3],
+            status=result[4],
+            total=result[5],
+            updated_count=result[6],
+            skipped_count=result[7],
+            failed_count=result[8],
+            created_at=datetime.fromisoformat(result[9]) if result[9] else None,
+            updated_at=datetime.fromisoformat(result[10]) if result[10] else None,
+            finished_at=datetime.fromisoformat(result[11]) if result[11] else None,
+            undo_of=result[12]
+        )
+
+    @traced()
+    async def create(self, kind: str, amount: float, created_by: int, usernames: List[str]) -> MassOperation:
+        """Создает задание и одной транзакцией записывает список его пользователей"""
+        created_at = datetime.now()
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''INSERT INTO mass_operations (kind, amount, created_by, status, total, created_at, updated_at)
+                   VALUES (?, ?, ?, 'pending', ?, ?, ?)''',
+                (kind, amount, created_by, len(usernames), created_at.isoformat(), created_at.isoformat())
+            )
+            operation_id = cursor.lastrowid
+            await cursor.close()
+            await conn.executemany(
+                'INSERT OR IGNORE INTO mass_operation_items (operation_id, username) VALUES (?, ?)',
+                [(operation_id, username) for username in usernames]
+            )
+            await conn.commit()
+
+        return MassOperation(
+            id=operation_id,
+            kind=kind,
+            amount=amount,
+            created_by=created_by,
+            total=len(usernames),
+            created_at=created_at,
+            updated_at=created_at
+        )
+
+    @traced()
+    async def get_by_id(self, operation_id: int) -> Optional[MassOperation]:
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(f'SELECT {self.COLUMNS} FROM mass_operations WHERE id = ?', (operation_id,))
+            result = await cursor.fetchone()
+            await cursor.close()
+        return self._row_to_operation(result) if result else None
+
+    @traced()
+    async def get_unfinished(self) -> List[MassOperation]:
+        """Задания, прерванные до завершения"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                f'''SELECT {self.COLUMNS} FROM mass_operations
+                    WHERE status IN ('pending', 'running')
+                    ORDER BY id'''
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [self._row_to_operation(result) for result in results]
+
+    @traced()
+    async def get_open_items(
+        self, operation_id: int, after_username: str, limit: int
+    ) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """
+        Необработанные пользователи задания по возрастанию имени после after_username.
+
+        Возвращает (username, before_value, target_value); значения заполнены
+        только у пользователей, запись которым была прервана.
+        """
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''SELECT username, before_value, target_value FROM mass_operation_items
+                   WHERE operation_id = ? AND username > ? AND status IN ('pending', 'applying')
+                   ORDER BY username
+                   LIMIT ?''',
+                (operation_id, after_username, limit)
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [tuple(result) for result in results]
+
+    @traced()
+    async def get_done_items(self, operation_id: int) -> List[Tuple[str, Optional[int]]]:
+        """Измененные пользователи задания и записанные им значения"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''SELECT username, target_value FROM mass_operation_items
+                   WHERE operation_id = ? AND status = 'done'
+                   ORDER BY username''',
+                (operation_id,)
+            )
+            results = await cursor.fetchall()
+            await cursor.close()
+        return [tuple(result) for result in results]
+
+    @traced()
+    async def get_undo_for(self, operation_id: int) -> Optional[MassOperation]:
+        """Последняя отмена задания, если она запускалась"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                f'SELECT {self.COLUMNS} FROM mass_operations WHERE undo_of = ? ORDER BY id DESC LIMIT 1',
+                (operation_id,)
+            )
+            result = await cursor.fetchone()
+            await cursor.close()
+        return self._row_to_operation(result) if result else None
+
+    @traced()
+    async def create_undo(self, source: MassOperation, created_by: int) -> Optional[MassOperation]:
+        """
+        Создает задание отмены по журналу source.
+
+        Пользователи берутся из журнала отмены, у каждого заполняются ожидаемое
+        текущее значение (записанное начислением) и прежнее. Возвращает None,
+        если журнал пуст или уже удален по сроку хранения.
+        """
+        target_field = "expire" if source.kind == "hours" else "data_limit"
+        created_at = datetime.now()
+        async with aiosqlite.connect(self.db_path) as conn:
+            cursor = await conn.execute(
+                '''INSERT INTO mass_operations (kind, amount, created_by, status, created_at, updated_at, undo_of)
+                   VALUES (?, ?, ?, 'pending', ?, ?, ?)''',
+                (source.kind, source.amount, created_by, created_at.isoformat(), created_at.isoformat(), source.id)
+            )
+            operation_id = cursor.lastrowid
+            await cursor.close()
+            cursor = await conn.execute(
+                f'''INSERT INTO mass_operation_items (operation_id, username, before_value, target_value)
+                    SELECT ?, items.username, items.target_value, undo.{target_field}
+                    FROM mass_operation_items AS items
+                    JOIN mass_operation_undo AS undo
+                      ON undo.operation_id = items.operation_id AND undo.username = items.username
+                    WHERE items.status = 'done' AND items.operation_id = ?''',
+                (operation_id, source.id)
+            )
+            total = cursor.rowcount
+            await cursor.close()
+            if total <= 0:
+                await conn.rollback()
+                return None
+            await conn.execute('UPDATE mass_operations SET total = ? WHERE id = ?', (total, operation_id))
+            await conn.commit()
+
+        return MassOperation(
+            id=operation_id,
+            kind=source.kind,
+            amount=source.amount,
+            created_by=created_by,
+            total=total,
+            created_at=created_at,
+            updated_at=created_at,
+            undo_of=source.id
+        )
+
+    @traced()
+    async def mark_applying(
+        self,
+        operation_id: int,
+        username: str,
+        previous: Dict[str, int],
+        before_value: int,
+        target_value: int,
+    ):
+        """Фиксирует прежнее и новое значение перед записью в панель и дописывает журнал отмены"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.execute(
+                '''UPDATE mass_operation_items
+                   SET status = 'applying', before_value = ?, target_value = ?
+                   WHERE operation_id = ? AND username = ?''',
+                (before_value, target_value, operation_id, username)
+            )
+            await conn.execute(
+                '''INSERT OR IGNORE INTO mass_operation_undo (operation_id, username, expire, data_limit)
+                   VALUES (?, ?, ?, ?)''',
+                (operation_id, username, previous.get("expire"), previous.get("data_limit"))
+            )
+            await conn.commit()
+
+    @traced()
+    async def prune_undo_logs(self, finished_before: datetime) -> int:
+        """Удаляет журналы отмены и списки пользователей заданий, завершенных раньше finished_before"""
+        async with aiosqlite.connect(self.db_path) as conn:
+            expired = '''SELECT id FROM mass_operations
+                          WHERE status = 'finished' AND finished_at < ?'''
+            cursor = await conn.execute(
+                f'DELETE FROM mass_operation_undo WHERE operation_id IN ({expired})',
+                (finished_before.isoformat(),)
+            )
+            deleted = cursor.rowcount
+            await cursor.close()
+            await conn.execute(
+                f'DELETE FROM mass_operation_items WHERE operation_id IN ({expired})',
+                (finished_before.isoformat(),)
+            )
+            await conn.commit()
+        return deleted
+
+    @traced()
+    async def save_progress(self, operation: MassOperation, item_statuses: List[Tuple[str, str]]) -> bool:
+        """Контрольная точка: статусы обработанных пользователей и счетчики задания одной транзакцией"""
+        operation.updated_at = datetime.now()
+        async with aiosqlite.connect(self.db_path) as conn:
+            await conn.executemany(
+                'UPDATE mass_operation_items SET status = ? WHERE operation_id = ? AND username = ?',
+                [(status, operation.id, username) for username, status in item_statuses]
+            )
+            cursor = await conn.execute(
+                '''UPDATE mass_operations
+                   SET status = ?, updated_count = ?, skipped_count = ?, failed_count = ?,
+                       updated_at = ?, finished_at = ?
+                   WHERE id = ?''',
+                (
+                    operation.status,
+                    operation.updated_count,
+                    operation.skipped_count,
+                    operation.failed_count,
+                    operation.updated_at.isoformat(),
+                    operation.finished_at.isoformat() if operation.finished_at else None,
+                    operation.id
+                )
+            )
+            await conn.commit()
+            affected = cursor.rowcount
+            await cursor.close()
+        return affected > 0
@@ -1,3 +1,3 @@
-from .api_client import MarzbanAPIClient
+from .api_client import MarzbanAPIClient, UnsupportedEndpointError
 
-__all__ = ['MarzbanAPIClient']
\ No newline at end of file
+__all__ = ['MarzbanAPIClient', 'UnsupportedEndpointError']
\ No newline at end of file
@@ -4,12 +4,30 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from marzban import MarzbanAPI
 from marzban.models import UserCreate, UserModify, ProxySettings
+import httpx
 import ssl
 import logging
+from core.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
+class UnsupportedEndpointError(Exception):
+    """Панель не поддерживает метод API (старая версия Marzban)"""
+
+
+def _is_missing_endpoint(error: Exception) -> bool:
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in (404, 405)
+
+
+class _UserPatch(UserModify):
+    """UserModify, который сериализуется только с явно переданными полями"""
+
+    def model_dump(self, **kwargs):
+        kwargs["exclude_unset"] = True
+        return super().model_dump(**kwargs)
+
+
 class MarzbanAPIClient:
     def __init__(self, base_url: str, username: str, password: str, verify_ssl: bool = False, api_prefix: str = ""):
         self.base_url = base_url.rstrip('/')
@@ -29,11 +47,13 @@ class MarzbanAPIClient:
         else:
             self.ssl_context = None
 
+    @traced()
     async def _ensure_api(self):
         """Инициализация API клиента при необходимости"""
         if not self.api or not self.token or (self.token_expires and datetime.now() >= self.token_expires):
             await self._initialize_api()
 
+    @traced()
     async def _initialize_api(self):
         """Инициализация API клиента и получение токена"""
         try:
@@ -57,6 +77,7 @@ class MarzbanAPIClient:
             raise Exception(f"Ошибка инициализации API: {str(e)}")
 
     # Системная статистика
+    @traced()
     async def get_system_stats(self) -> Dict[str, Any]:
         """Получение системной статистики"""
         await self._ensure_api()
@@ -102,6 +123,7 @@ class MarzbanAPIClient:
         return normalized_stats
 
     # Методы для работы с пользователями
+    @traced()
     async def get_users(self, offset: int = 0, limit: int = 100, search: Optional[str] = None) -> Dict[str, Any]:
         """Получение списка пользователей с учетом пагинации"""
         await self._ensure_api()
@@ -122,6 +144,7 @@ class MarzbanAPIClient:
             "users": [user.dict() for user in users] if users else []
         }
 
+    @traced()
     async def get_user(self, username: str) -> Optional[Dict[str, Any]]:
         """Получение информации о пользователе"""
         await self._ensure_api()
@@ -133,6 +156,7 @@ class MarzbanAPIClient:
                 return None
             raise e
 
+    @traced()
     async def create_user(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Создание нового пользователя"""
         await self._ensure_api()
@@ -152,6 +176,7 @@ class MarzbanAPIClient:
         result = await self.api.add_user(user=user_create, token=self.token.access_token)
         return result.dict() if result else {}
 
+    @traced()
     async def modify_user(self, username: str, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Изменение пользователя"""
         await self._ensure_api()
@@ -170,19 +195,66 @@ class MarzbanAPIClient:
         result = await self.api.modify_user(username=username, user=user_modify, token=self.token.access_token)
         return result.dict() if result else {}
 
+    @traced()
+    async def patch_user(self, username: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Частичное изменение пользователя: в запрос попадают только переданные поля.
+
+        В отличие от modify_user не отправляет настройки прокси, поэтому
+        панель не перенастраивает прокси пользователя при продлении срока
+        или изменении лимита.
+        """
+        await self._ensure_api()
+        user_patch = _UserPatch(**changes)
+        result = await self.api.modify_user(username=username, user=user_patch, token=self.token.access_token)
+        return result.dict() if result else {}
+
+    @traced()
     async def delete_user(self, username: str) -> Dict[str, Any]:
         """Удаление пользователя"""
         await self._ensure_api()
         result = await self.api.remove_user(username=username, token=self.token.access_token)
         return result.dict() if result else {}
 
+    @traced()
     async def reset_user_traffic(self, username: str) -> Dict[str, Any]:
         """Сброс трафика пользователя"""
         await self._ensure_api()
         result = await self.api.reset_user_data_usage(username=username, token=self.token.access_token)
         return result.dict() if result else {}
 
+    # Массовые операции на стороне панели
+    @traced()
+    async def reset_all_users_traffic(self):
+        """Сброс трафика всех пользователей одним запросом"""
+        await self._ensure_api()
+        try:
+            await self.api.reset_users_data_usage(token=self.token.access_token)
+        except Exception as e:
+            if _is_missing_endpoint(e):
+                raise UnsupportedEndpointError("reset_users_data_usage") from e
+            raise
+
+    @traced()
+    async def delete_expired_users(self, expired_before: Optional[datetime] = None) -> List[str]:
+        """Удаление истекших пользователей одним запросом; возвращает имена удаленных"""
+        await self._ensure_api()
+        try:
+            result = await self.api.delete_expired_users(
+                token=self.token.access_token,
+                expired_before=expired_before.isoformat(timespec="seconds") if expired_before else None,
+            )
+        except Exception as e:
+            if _is_missing_endpoint(e):
+                # Когда удалять некого, панель тоже отвечает 404, но с пояснением
+                if "expired" in e.response.text.lower():
+                    return []
+                raise UnsupportedEndpointError("delete_expired_users") from e
+            raise
+        return result if isinstance(result, list) else []
+
     # Методы для работы с администраторами
+    @traced()
     async def get_admins(self, offset: int = 0, limit: int = 100, username: Optional[str] = None) -> List[Dict[str, Any]]:
         """Получение списка администраторов"""
         await self._ensure_api()
@@ -194,11 +266,13 @@ class MarzbanAPIClient:
         )
         return [admin.dict() for admin in admins] if admins else []
 
+    @traced()
     async def get_admin(self, username: str) -> Optional[Dict[str, Any]]:
         """Получение информации об администраторе"""
         admins = await self.get_admins(username=username, limit=1)
         return admins[0] if admins else None
 
+    @traced()
     async def create_admin(self, admin_data: Dict[str, Any]) -> Dict[str, Any]:
         """Создание администратора"""
         await self._ensure_api()
@@ -207,6 +281,7 @@ class MarzbanAPIClient:
         result = await self.api.create_admin(admin=admin_create, token=self.token.access_token)
         return result.dict() if result else {}
 
+    @traced()
     async def modify_admin(self, username: str, admin_data: Dict[str, Any]) -> Dict[str, Any]:
         """Изменение администратора"""
         await self._ensure_api()
@@ -215,6 +290,7 @@ class MarzbanAPIClient:
         result = await self.api.modify_admin(username=username, admin=admin_modify, token=self.token.access_token)
         return result.dict() if result else {}
 
+    @traced()
     async def delete_admin(self, username: str) -> Dict[str, Any]:
         """Удаление администратора"""
         await self._ensure_api()
@@ -222,12 +298,14 @@ class MarzbanAPIClient:
         return result.dict() if result else {}
 
     # Методы для работы с узлами
+    @traced()
     async def get_nodes(self) -> List[Dict[str, Any]]:
         """Получение списка узлов"""
         await self._ensure_api()
         nodes = await self.api.get_nodes(token=self.token.access_token)
         return [node.dict() for node in nodes] if nodes else []
 
+    @traced()
     async def get_node(self, node_id: int) -> Dict[str, Any]:
         """Получение информации об узле"""
         await self._ensure_api()
@@ -235,6 +313,7 @@ class MarzbanAPIClient:
         return node.dict() if node else {}
 
     # Получение подписки пользователя
+    @traced()
     async def get_user_subscription(self, username: str) -> str:
         """Получение рабочей ссылки на подписку через информацию о пользователе с 3 попытками"""
         max_attempts = 3
@@ -0,0 +1,3 @@
+from .sender import MessageSender, SendPriority, permanent_failure_reason
+
+__all__ = ['MessageSender', 'SendPriority', 'permanent_failure_reason']
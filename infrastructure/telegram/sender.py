@@ -0,0 +1,254 @@
+# infrastructure/telegram/sender.py
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.types import Message
+
+from core.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+# Ошибки Bad Request, после которых повторная отправка в чат бессмысленна
+_PERMANENT_BAD_REQUEST_MARKERS = ("chat not found", "user is deactivated", "peer_id_invalid")
+
+
+def permanent_failure_reason(error: Exception) -> Optional[str]:
+    """Возвращает причину, если доставка в чат невозможна в принципе (бот заблокирован и т.п.)"""
+    if isinstance(error, TelegramForbiddenError):
+        return error.message
+    if isinstance(error, TelegramBadRequest):
+        message = error.message.lower()
+        if any(marker in message for marker in _PERMANENT_BAD_REQUEST_MARKERS):
+            return error.message
+    return None
+
+
+class SendPriority(IntEnum):
+    INTERACTIVE = 0   # ответы на действия пользователя/админа
+    NOTIFICATION = 1  # уведомления поддержки, бонусы
+    BROADCAST = 2     # массовые рассылки
+
+
+@dataclass(order=True)
+class _OutboundMessage:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    text: str = field(compare=False)
+    kwargs: Dict[str, Any] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class MessageSender:
+    """
+    Общий планировщик исходящих сообщений.
+
+    Соблюдает глобальный лимит Telegram (~30 сообщений/с) и лимит на чат
+    (1 сообщение/с), учитывает ``retry_after`` из ошибок flood control и
+    отправляет сообщения в порядке приоритета: интерактивные ответы раньше
+    уведомлений, уведомления раньше рассылок.
+    """
+
+    RATE_WINDOW = 10.0  # окно расчета скорости отправки, секунды
+
+    def __init__(
+        self,
+        bot: Bot,
+        global_rate: float = 30.0,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 3,
+    ):
+        self.bot = bot
+        self.global_rate = max(global_rate, 1.0)
+        self.per_chat_interval = max(per_chat_interval, 0.0)
+        self.max_retries = max_retries
+
+        self._queue: List[_OutboundMessage] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._chat_next_at: Dict[int, float] = {}
+        self._paused_until = 0.0
+        self._tokens = self.global_rate
+        self._last_refill = time.monotonic()
+
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._sent_times: Deque[float] = deque()
+        self.sent_total = 0
+        self.failed_total = 0
+        self.retry_after_total = 0
+
+    # === Публичный интерфейс ===
+    @traced()
+    async def send_message(
+        self,
+        chat_id: int,
+        text: str,
+        *,
+        priority: SendPriority = SendPriority.INTERACTIVE,
+        **kwargs: Any,
+    ) -> Message:
+        """Ставит сообщение в очередь и ждёт результата отправки"""
+        future = asyncio.get_running_loop().create_future()
+        item = _OutboundMessage(int(priority), next(self._seq), chat_id, text, kwargs, future)
+        heapq.heappush(self._queue, item)
+        self._wakeup.set()
+        return await future
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+            logger.info(
+                f"Планировщик отправки запущен: {self.global_rate:g} сообщ./с, "
+                f"интервал на чат {self.per_chat_interval:g} с"
+            )
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            if not item.future.done():
+                item.future.set_exception(RuntimeError("Планировщик отправки остановлен"))
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def send_rate(self) -> float:
+        """Фактическая скорость отправки за последние RATE_WINDOW секунд"""
+        self._trim_sent_times(time.monotonic())
+        return len(self._sent_times) / self.RATE_WINDOW
+
+    def stats(self) -> Dict[str, Any]:
+        by_priority = {priority.name.lower(): 0 for priority in SendPriority}
+        for item in self._queue:
+            by_priority[SendPriority(item.priority).name.lower()] += 1
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_by_priority": by_priority,
+            "in_flight": len(self._in_flight),
+            "send_rate": self.send_rate,
+            "sent_total": self.sent_total,
+            "failed_total": self.failed_total,
+            "retry_after_total": self.retry_after_total,
+        }
+
+    # === Внутренняя логика ===
+    async def _run(self):
+        while True:
+            item = await self._next_item()
+            await self._acquire_global_slot()
+            now = time.monotonic()
+            self._chat_next_at[item.chat_id] = now + self.per_chat_interval
+            task = asyncio.create_task(self._deliver(item))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _next_item(self) -> _OutboundMessage:
+        """Возвращает самое приоритетное сообщение, чей чат готов к отправке"""
+        while True:
+            now = time.monotonic()
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            deferred: List[_OutboundMessage] = []
+            ready: Optional[_OutboundMessage] = None
+            while self._queue:
+                item = heapq.heappop(self._queue)
+                if item.future.done():
+                    continue  # отправитель уже отказался от ожидания
+                if self._chat_next_at.get(item.chat_id, 0.0) <= now:
+                    ready = item
+                    break
+                deferred.append(item)
+
+            for item in deferred:
+                heapq.heappush(self._queue, item)
+
+            if ready:
+                return ready
+
+            self._prune_chats(now)
+            self._wakeup.clear()
+            timeout = None
+            if deferred:
+                timeout = max(min(self._chat_next_at[item.chat_id] for item in deferred) - now, 0.0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _acquire_global_slot(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.global_rate, self._tokens + (now - self._last_refill) * self.global_rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.global_rate)
+
+    async def _deliver(self, item: _OutboundMessage):
+        if item.future.done():
+            return
+        try:
+            result = await self.bot.send_message(item.chat_id, item.text, **item.kwargs)
+        except TelegramRetryAfter as e:
+            self.retry_after_total += 1
+            resume_at = time.monotonic() + e.retry_after
+            self._paused_until = max(self._paused_until, resume_at)
+            self._chat_next_at[item.chat_id] = max(self._chat_next_at.get(item.chat_id, 0.0), resume_at)
+            logger.warning(f"Flood control при отправке в {item.chat_id}: пауза {e.retry_after} с")
+            if item.attempts < self.max_retries and not item.future.done():
+                item.attempts += 1
+                heapq.heappush(self._queue, item)
+                self._wakeup.set()
+            elif not item.future.done():
+                self.failed_total += 1
+                item.future.set_exception(e)
+        except Exception as e:
+            self.failed_total += 1
+            if not item.future.done():
+                item.future.set_exception(e)
+        else:
+            self.sent_total += 1
+            now = time.monotonic()
+            self._sent_times.append(now)
+            # Окно держим обрезанным, иначе отметки копятся все время работы бота
+            self._trim_sent_times(now)
+            if not item.future.done():
+                item.future.set_result(result)
+
+    def _trim_sent_times(self, now: float):
+        border = now - self.RATE_WINDOW
+        while self._sent_times and self._sent_times[0] < border:
+            self._sent_times.popleft()
+
+    def _prune_chats(self, now: float):
+        if len(self._chat_next_at) > 10_000:
+            self._chat_next_at = {
+                chat_id: next_at for chat_id, next_at in self._chat_next_at.items() if next_at > now
+            }
@@ -1,17 +1,33 @@
 #main.py
 import logging
 import asyncio
+from dataclasses import dataclass
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from core.config import config
-from infrastructure.database.repositories import UserRepository, SupportRepository
+from core.tracing import tracer
+from infrastructure.database.repositories import (
+    UserRepository,
+    SupportRepository,
+    BroadcastRepository,
+    SubscriptionSnapshotRepository,
+    PaymentRepository,
+    MassOperationRepository,
+)
 from infrastructure.marzban.api_client import MarzbanAPIClient
+from infrastructure.telegram import MessageSender
 from domain.services.user_service import UserService
 from domain.services.subscription_service import SubscriptionService
 from domain.services.support_service import SupportService
+from domain.services.broadcast_service import BroadcastService
+from domain.services.ticket_alert_service import TicketAlertService
+from domain.services.fulfillment_service import FulfillmentService
+from domain.services.analytics_service import AnalyticsService
+from domain.services.mass_operation_service import MassOperationService
 from presentation.handlers.user_handlers import UserHandlers
 from presentation.handlers.admin_handlers import AdminHandlers
 from presentation.handlers.support_handlers import SupportHandlers
+from presentation.middlewares import TracingMiddleware, TracingRequestMiddleware
 
 # Настройка логирования
 logging.basicConfig(
@@ -21,40 +37,156 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    """Основная функция запуска бота"""
+@dataclass
+class Application:
+    """Собранный бот: диспетчер с роутерами и фоновые сервисы"""
+    bot: Bot
+    dispatcher: Dispatcher
+    marzban_client: MarzbanAPIClient
+    message_sender: MessageSender
+    subscription_service: SubscriptionService
+    broadcast_service: BroadcastService
+    mass_operation_service: MassOperationService
+    fulfillment_service: FulfillmentService
+    ticket_alert_service: TicketAlertService
+    admin_handlers: AdminHandlers
+
+    async def start(self):
+        """Запускает фоновые сервисы и продолжает прерванные задания"""
+        self.message_sender.start()
+        resumed = await self.broadcast_service.resume_unfinished()
+        if resumed:
+            logger.info(f"Возобновлено рассылок: {resumed}")
+        resumed_operations = await self.mass_operation_service.resume_unfinished()
+        if resumed_operations:
+            logger.info(f"Возобновлено массовых начислений: {resumed_operations}")
+        self.fulfillment_service.start()
+        recovered = await self.fulfillment_service.recover()
+        if recovered:
+            logger.info(f"Возобновлена выдача оплаченных заказов: {recovered}")
+
+    async def stop(self):
+        """Останавливает фоновые сервисы и закрывает соединения"""
+        await self.broadcast_service.stop()
+        await self.mass_operation_service.stop()
+        await self.fulfillment_service.stop()
+        await self.admin_handlers.page_cache.stop()
+        await self.ticket_alert_service.stop()
+        await self.message_sender.stop()
+        await self.marzban_client.close()
+        await self.bot.session.close()
+
+
+def build_application(bot: Bot, marzban_client: MarzbanAPIClient, db_path: str = config.DB_PATH) -> Application:
+    """
+    Собирает репозитории, сервисы и обработчики вокруг готовых клиентов
+    Telegram и Marzban. Бенчмарки подставляют сюда клиентов локальных заглушек.
+    """
 
     # Инициализация инфраструктуры
-    user_repository = UserRepository(config.DB_PATH)
-    support_repository = SupportRepository(config.DB_PATH)
-    marzban_client = MarzbanAPIClient(
-        base_url=config.MARZBAN_API_URL,
-        username=config.MARZBAN_USERNAME,
-        password=config.MARZBAN_PASSWORD,
-        verify_ssl=config.VERIFY_SSL,
-        api_prefix=config.MARZBAN_API_PREFIX
-    )
+    user_repository = UserRepository(db_path)
+    support_repository = SupportRepository(db_path)
+    broadcast_repository = BroadcastRepository(db_path)
+    snapshot_repository = SubscriptionSnapshotRepository(db_path)
+    payment_repository = PaymentRepository(db_path)
+    mass_operation_repository = MassOperationRepository(db_path)
 
     # Инициализация сервисов
     user_service = UserService(user_repository)
     support_service = SupportService(support_repository)
-    subscription_service = SubscriptionService(marzban_client, user_service)
+    subscription_service = SubscriptionService(marzban_client, user_service, snapshot_repository)
+    analytics_service = AnalyticsService(snapshot_repository)
+    fulfillment_service = FulfillmentService(
+        payment_repository,
+        subscription_service,
+        workers=config.FULFILLMENT_WORKERS,
+        max_attempts=config.FULFILLMENT_MAX_ATTEMPTS,
+        retry_delay=config.FULFILLMENT_RETRY_DELAY,
+    )
 
-    # Инициализация бота и диспетчера с FSM
-    bot = Bot(token=config.BOT_TOKEN)
+    # Диспетчер с FSM
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
 
+    # Трассировка обновлений и запросов к Bot API
+    dp.update.outer_middleware(TracingMiddleware())
+    bot.session.middleware(TracingRequestMiddleware())
+
+    # Общий планировщик исходящих сообщений
+    message_sender = MessageSender(
+        bot,
+        global_rate=config.TELEGRAM_GLOBAL_RATE,
+        per_chat_interval=config.TELEGRAM_PER_CHAT_INTERVAL,
+    )
+    broadcast_service = BroadcastService(
+        broadcast_repository,
+        user_repository,
+        snapshot_repository,
+        message_sender,
+        batch_size=config.BROADCAST_BATCH_SIZE,
+    )
+    mass_operation_service = MassOperationService(
+        mass_operation_repository,
+        subscription_service,
+        batch_size=config.MASS_OPERATION_BATCH_SIZE,
+        concurrency=config.MASS_OPERATION_CONCURRENCY,
+        undo_retention_days=config.MASS_OPERATION_UNDO_RETENTION_DAYS,
+    )
+    ticket_alert_service = TicketAlertService(
+        message_sender,
+        recipients=config.ADMIN_TG_IDS + config.SUPPORT_TG_IDS,
+        digest_threshold=config.TICKET_ALERT_DIGEST_THRESHOLD,
+        digest_window=config.TICKET_ALERT_DIGEST_WINDOW,
+    )
+
     # Инициализация обработчиков
-    user_handlers = UserHandlers(subscription_service, user_service, support_service)
-    admin_handlers = AdminHandlers(marzban_client, support_service, user_service)
-    support_handlers = SupportHandlers(support_service)
+    user_handlers = UserHandlers(
+        subscription_service, user_service, support_service, message_sender, fulfillment_service
+    )
+    admin_handlers = AdminHandlers(
+        marzban_client,
+        support_service,
+        user_service,
+        message_sender,
+        broadcast_service,
+        fulfillment_service,
+        subscription_service,
+        analytics_service,
+        mass_operation_service,
+    )
+    support_handlers = SupportHandlers(support_service, ticket_alert_service)
 
     # Регистрация роутеров
     dp.include_router(user_handlers.get_router())
     dp.include_router(admin_handlers.get_router())
     dp.include_router(support_handlers.get_router())
 
+    return Application(
+        bot=bot,
+        dispatcher=dp,
+        marzban_client=marzban_client,
+        message_sender=message_sender,
+        subscription_service=subscription_service,
+        broadcast_service=broadcast_service,
+        mass_operation_service=mass_operation_service,
+        fulfillment_service=fulfillment_service,
+        ticket_alert_service=ticket_alert_service,
+        admin_handlers=admin_handlers,
+    )
+
+
+async def main():
+    """Основная функция запуска бота"""
+    marzban_client = MarzbanAPIClient(
+        base_url=config.MARZBAN_API_URL,
+        username=config.MARZBAN_USERNAME,
+        password=config.MARZBAN_PASSWORD,
+        verify_ssl=config.VERIFY_SSL,
+        api_prefix=config.MARZBAN_API_PREFIX
+    )
+    bot = Bot(token=config.BOT_TOKEN)
+    app = build_application(bot, marzban_client)
+
     # Запуск бота
     logger.info("Бот запущен...")
     logger.info(f"Подключение к Marzban API: {config.MARZBAN_API_URL}")
@@ -62,15 +194,22 @@ async def main():
     logger.info(f"Администраторы: {config.ADMIN_TG_IDS}")
     logger.info(f"Поддержка: {config.SUPPORT_TG_IDS}")
     logger.info(f"Проверка SSL: {'Включена' if config.VERIFY_SSL else 'Отключена'}")
+    if tracer.enabled:
+        logger.info(f"Трассировка: {config.TRACE_SAMPLE_RATE:.0%} обновлений → {config.TRACE_LOG_PATH}")
+
+    await app.start()
+    snapshot_sync_task = asyncio.create_task(
+        app.subscription_service.run_snapshot_sync(config.SNAPSHOT_SYNC_INTERVAL)
+    )
 
     try:
-        await dp.start_polling(bot)
+        await app.dispatcher.start_polling(bot)
     except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("Бот остановлен")
     finally:
         # Закрытие соединения с API
-        await marzban_client.close()
-        await bot.session.close()
+        snapshot_sync_task.cancel()
+        await app.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,255 @@
+# presentation/callbacks.py
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, Union
+
+from aiogram.filters import Filter
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+from core.security import can_access_admin_panel, can_access_support_tickets
+
+
+# === Типизированные callback'и админ-панели ===
+# Префиксы и порядок полей совпадают с прежним форматом строк, поэтому
+# кнопки в уже отправленных сообщениях продолжают работать.
+
+class UsersListCallback(CallbackData, prefix="users_list"):
+    page: int
+
+
+class UserViewCallback(CallbackData, prefix="users_view"):
+    username: str
+    page: int
+
+
+class UserEditCallback(CallbackData, prefix="users_edit"):
+    username: str
+    page: int
+
+
+class UserDeleteCallback(CallbackData, prefix="users_delete"):
+    username: str
+    page: int
+
+
+class UserDeleteConfirmCallback(CallbackData, prefix="users_delete_confirm"):
+    username: str
+    page: int
+
+
+class UserEditStatusCallback(CallbackData, prefix="users_edit_status"):
+    username: str
+    page: int
+    choice: str
+
+
+class UserEditLimitCallback(CallbackData, prefix="users_edit_limit"):
+    username: str
+    page: int
+    choice: str
+
+
+class UserEditResetCallback(CallbackData, prefix="users_edit_reset"):
+    username: str
+    page: int
+    choice: str
+
+
+class UserEditExpireCallback(CallbackData, prefix="users_edit_expire"):
+    username: str
+    page: int
+    choice: str
+
+
+class UserEditNoteCallback(CallbackData, prefix="users_edit_note"):
+    username: str
+    page: int
+    choice: str
+
+
+class UserEditLimitMenuCallback(CallbackData, prefix="users_edit_limit_menu"):
+    username: str
+    page: int
+
+
+class UserEditExpireMenuCallback(CallbackData, prefix="users_edit_expire_menu"):
+    username: str
+    page: int
+
+
+class UserEditNoteMenuCallback(CallbackData, prefix="users_edit_note_menu"):
+    username: str
+    page: int
+
+
+class UserEditCancelCallback(CallbackData, prefix="users_edit_cancel"):
+    username: str
+    page: int
+
+
+class BroadcastSegmentCallback(CallbackData, prefix="users_broadcast_seg"):
+    segment: str
+
+
+class MassUndoCallback(CallbackData, prefix="mass_undo"):
+    operation_id: int
+
+
+class MassUndoConfirmCallback(CallbackData, prefix="mass_undo_confirm"):
+    operation_id: int
+
+
+class AdminsListCallback(CallbackData, prefix="admins_list"):
+    page: int
+
+
+class AdminManageCallback(CallbackData, prefix="admin_manage"):
+    username: str
+    page: int
+
+
+class AdminEditCallback(CallbackData, prefix="admins_edit"):
+    username: str
+    page: int
+
+
+class AdminDeleteCallback(CallbackData, prefix="admins_delete"):
+    username: str
+    page: int
+
+
+class AdminDeleteConfirmCallback(CallbackData, prefix="admins_delete_confirm"):
+    username: str
+    page: int
+
+
+class SupportTicketsListCallback(CallbackData, prefix="support_tickets_list"):
+    offset: int
+
+
+class SupportTicketToggleCallback(CallbackData, prefix="support_ticket_toggle"):
+    ticket_id: int
+    status: str
+
+
+class SupportTicketReplyCallback(CallbackData, prefix="support_ticket_reply"):
+    ticket_id: int
+
+
+# === Таблица маршрутов ===
+
+class AccessLevel(IntEnum):
+    ADMIN = 0    # только администраторы
+    SUPPORT = 1  # администраторы и сотрудники поддержки
+
+
+CallbackHandler = Callable[[CallbackQuery, Any, Optional[CallbackData]], Awaitable[Any]]
+
+_ACCESS_CHECKS = {
+    AccessLevel.ADMIN: can_access_admin_panel,
+    AccessLevel.SUPPORT: can_access_support_tickets,
+}
+
+# Приведение поля callback'а по аннотации до валидации: pydantic быстрее
+# проверяет готовый int, чем разбирает строку. Прочие типы разбирает pydantic
+_FIELD_PARSERS: Dict[Any, Callable[[str], Any]] = {int: int}
+
+
+@dataclass(frozen=True)
+class CallbackRoute:
+    handler: CallbackHandler
+    access: AccessLevel
+    callback_type: Optional[Type[CallbackData]] = None
+    # Имена полей и их разбор, вычисленные один раз при регистрации маршрута
+    fields: Tuple[str, ...] = ()
+    parsers: Tuple[Callable[[str], Any], ...] = ()
+
+    def is_allowed(self, user_id: int) -> bool:
+        return _ACCESS_CHECKS[self.access](user_id)
+
+    def parse(self, data: str) -> CallbackData:
+        """
+        Разбирает строку в экземпляр callback_type.
+
+        Формат тот же, что у ``CallbackData.pack``; в отличие от
+        ``CallbackData.unpack`` строка делится один раз, без повторного
+        обхода полей модели: значения приводятся заранее подобранными
+        функциями и передаются валидатору модели готовым словарем. Ошибка
+        разбора — ValueError (ошибка валидации pydantic — его подкласс).
+        """
+        parts = data.split(self.callback_type.__separator__)
+        if len(parts) != len(self.fields) + 1:
+            raise ValueError(f"Некорректное число полей в callback: {data!r}")
+        return self.callback_type.__pydantic_validator__.validate_python(
+            {name: parse(value) for name, parse, value in zip(self.fields, self.parsers, parts[1:])}
+        )
+
+
+class CallbackRouter:
+    """
+    Диспетчеризация callback'ов по таблице.
+
+    Callback без параметров ищется по точному совпадению строки, callback с
+    параметрами — по префиксу до первого ``:``; обе операции — поиск в dict.
+    Данные разбираются один раз, в фильтре, и передаются обработчику
+    уже типизированными. Кеша разбора нет: строка содержит имя пользователя
+    и страницу, поэтому повторы редки и кеш почти всегда промахивается.
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, CallbackRoute] = {}
+        self._prefixed: Dict[str, CallbackRoute] = {}
+
+    def exact(self, data: str, handler: CallbackHandler, access: AccessLevel = AccessLevel.ADMIN):
+        self._exact[data] = CallbackRoute(handler, access)
+
+    def prefixed(
+        self,
+        callback_type: Type[CallbackData],
+        handler: CallbackHandler,
+        access: AccessLevel = AccessLevel.ADMIN,
+    ):
+        fields = tuple(callback_type.model_fields)
+        parsers = tuple(
+            _FIELD_PARSERS.get(field.annotation, str) for field in callback_type.model_fields.values()
+        )
+        self._prefixed[callback_type.__prefix__] = CallbackRoute(handler, access, callback_type, fields, parsers)
+
+    def resolve(self, data: Optional[str]) -> Optional[Tuple[CallbackRoute, Optional[CallbackData]]]:
+        if not data:
+            return None
+
+        route = self._exact.get(data)
+        if route is not None:
+            return route, None
+        return self._resolve_prefixed(data)
+
+    def _resolve_prefixed(self, data: str) -> Optional[Tuple[CallbackRoute, Optional[CallbackData]]]:
+        prefix, separator, _ = data.partition(":")
+        if not separator:
+            return None
+        route = self._prefixed.get(prefix)
+        if route is None:
+            return None
+        try:
+            return route, route.parse(data)
+        except ValueError:
+            return None
+
+    def filter(self) -> "CallbackRouteFilter":
+        return CallbackRouteFilter(self)
+
+
+class CallbackRouteFilter(Filter):
+    """Фильтр aiogram: пропускает известные callback'и и передает в обработчик маршрут и данные"""
+
+    def __init__(self, router: CallbackRouter):
+        self.router = router
+
+    async def __call__(self, callback: CallbackQuery) -> Union[bool, Dict[str, Any]]:
+        resolved = self.router.resolve(callback.data)
+        if resolved is None:
+            return False
+        route, callback_data = resolved
+        return {"route": route, "callback_data": callback_data}
@@ -1,10 +1,11 @@
 # presentation/handlers/admin_handlers.py
-from aiogram import F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, BufferedInputFile
 from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from presentation.handlers.base import BaseHandler
+from presentation import templates
 from presentation.keyboards import (
     get_admin_main_keyboard,
     get_admin_users_keyboard,
@@ -16,20 +17,66 @@ from presentation.keyboards import (
     get_support_tickets_pagination_keyboard,
     get_support_ticket_search_keyboard,
     get_admin_ticket_actions_keyboard,
-    get_confirmation_keyboard,
+    get_broadcast_audience_keyboard,
+    get_broadcast_confirm_keyboard,
 )
+from presentation.callbacks import (
+    AccessLevel,
+    CallbackRoute,
+    CallbackRouter,
+    UsersListCallback,
+    UserViewCallback,
+    UserEditCallback,
+    UserDeleteCallback,
+    UserDeleteConfirmCallback,
+    UserEditStatusCallback,
+    UserEditLimitCallback,
+    UserEditResetCallback,
+    UserEditExpireCallback,
+    UserEditNoteCallback,
+    UserEditLimitMenuCallback,
+    UserEditExpireMenuCallback,
+    UserEditNoteMenuCallback,
+    UserEditCancelCallback,
+    BroadcastSegmentCallback,
+    MassUndoCallback,
+    MassUndoConfirmCallback,
+    AdminsListCallback,
+    AdminManageCallback,
+    AdminEditCallback,
+    AdminDeleteCallback,
+    AdminDeleteConfirmCallback,
+    SupportTicketsListCallback,
+    SupportTicketToggleCallback,
+    SupportTicketReplyCallback,
+)
+from presentation.page_cache import CachedPage, PageCache
 from infrastructure.marzban.api_client import MarzbanAPIClient
+from infrastructure.telegram import MessageSender, SendPriority
 from domain.services.support_service import SupportService
 from domain.services.user_service import UserService
+from domain.services.broadcast_service import BroadcastService
+from domain.services.fulfillment_service import FulfillmentService
+from domain.services.subscription_service import SubscriptionService
+from domain.services.analytics_service import AnalyticsService
+from domain.services.mass_operation_service import MassOperationService, UndoUnavailableError
+from domain.services.telegram_id_resolver import TelegramIdResolver
+from domain.models.analytics import UserAnalytics
+from domain.models.broadcast import BroadcastAudience
+from domain.models.mass_operation import MassGrantPlan, MassOperation
 from core.security import (
-    is_admin,
     is_support,
     can_access_support_tickets,
     can_access_admin_panel
 )
 from core.config import config
+from core.templates import format_datetime
+from core.gather import gather_partial
+from core.profiling import ProfileReport, ProfilerBusyError, profiler
+import asyncio
 import logging
 import html
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any
 
@@ -82,10 +129,13 @@ class MassOperationStates(StatesGroup):
     waiting_for_hours = State()
     waiting_for_traffic = State()
     waiting_for_broadcast_message = State()
+    waiting_for_broadcast_filter = State()
+    confirming_broadcast = State()
     waiting_for_hours_user = State()
     waiting_for_hours_amount = State()
     waiting_for_traffic_user = State()
     waiting_for_traffic_amount = State()
+    confirming_mass_grant = State()
 
 
 class AdminHandlers(BaseHandler):
@@ -102,17 +152,78 @@ class AdminHandlers(BaseHandler):
         "disabled": "Отключен",
     }
 
-    def __init__(self, marzban_client: MarzbanAPIClient, support_service: SupportService, user_service: UserService):
+    BROADCAST_AUDIENCES = {
+        "all": BroadcastAudience(),
+        "monthly": BroadcastAudience(subscription_type="monthly"),
+        "traffic": BroadcastAudience(subscription_type="traffic"),
+        "active": BroadcastAudience(status="active"),
+        "expired": BroadcastAudience(status="expired"),
+        "exp3": BroadcastAudience(expires_within_days=3),
+        "exp7": BroadcastAudience(expires_within_days=7),
+        "usage80": BroadcastAudience(usage_above_percent=80),
+        "never": BroadcastAudience(never_purchased=True),
+    }
+
+    BROADCAST_FILTER_HELP = (
+        "⚙️ Введите фильтр аудитории через пробел, например:\n"
+        "<code>type=traffic status=active usage=80</code>\n\n"
+        "Доступные условия:\n"
+        "• <code>type=monthly|traffic</code> — тип подписки\n"
+        "• <code>status=active|expired|limited|disabled|on_hold</code> — статус в Marzban\n"
+        "• <code>expires=N</code> — подписка истекает в течение N дней\n"
+        "• <code>usage=X</code> — израсходовано более X% трафика\n"
+        "• <code>new</code> — пользователи без покупок"
+    )
+
+    # Предпросмотр массового начисления действителен столько секунд
+    GRANT_PLAN_TTL = 600
+    # Уведомлений о начислении в одной пачке после массового начисления
+    BONUS_NOTIFY_BATCH = 100
+
+    PAYMENT_STATUS_LABELS = {
+        "pending": "⏳ ожидает выдачи",
+        "processing": "⚙️ выдается",
+        "fulfilled": "✅ выдан",
+        "failed": "❌ не выдан",
+        "needs_review": "🔍 на проверке",
+    }
+
+    def __init__(
+        self,
+        marzban_client: MarzbanAPIClient,
+        support_service: SupportService,
+        user_service: UserService,
+        message_sender: MessageSender,
+        broadcast_service: BroadcastService,
+        fulfillment_service: FulfillmentService,
+        subscription_service: SubscriptionService,
+        analytics_service: AnalyticsService,
+        mass_operation_service: MassOperationService,
+    ):
         self.marzban_client = marzban_client
         self.support_service = support_service
         self.user_service = user_service
+        self.message_sender = message_sender
+        self.broadcast_service = broadcast_service
+        self.fulfillment_service = fulfillment_service
+        self.subscription_service = subscription_service
+        self.analytics_service = analytics_service
+        self.mass_operation_service = mass_operation_service
+        self.mass_operation_service.set_result_handler(self._send_mass_operation_result)
+        self.telegram_ids = TelegramIdResolver(user_service, marzban_client)
         self.users_page_limit = max(1, config.USERS_PER_PAGE)
         self.admins_page_limit = max(1, config.ADMINS_PER_PAGE)
+        self.page_cache = PageCache(ttl=config.ADMIN_PAGE_CACHE_TTL)
+        # Рассчитанные, но еще не подтвержденные массовые начисления по администраторам
+        self.grant_plans: Dict[int, MassGrantPlan] = {}
+        self.callback_routes = self._build_callback_router()
         super().__init__()
 
     def _register_handlers(self):
         """Регистрация обработчиков администратора"""
         self.router.message.register(self.admin_panel, Command("admin"))
+        self.router.message.register(self.payments_command, Command("payments"))
+        self.router.message.register(self.profile_command, Command("profile"))
         # FSM обработчики администратора
         self.router.message.register(self._process_admin_search_input, AdminSearchStates.waiting_for_username)
         self.router.message.register(self._process_new_admin_username, AdminCreationStates.waiting_for_username)
@@ -136,17 +247,14 @@ class AdminHandlers(BaseHandler):
         self.router.message.register(self._process_mass_hours_input, MassOperationStates.waiting_for_hours)
         self.router.message.register(self._process_mass_traffic_input, MassOperationStates.waiting_for_traffic)
         self.router.message.register(self._process_broadcast_message, MassOperationStates.waiting_for_broadcast_message)
+        self.router.message.register(self._process_broadcast_filter, MassOperationStates.waiting_for_broadcast_filter)
         self.router.message.register(self._process_mass_hours_user, MassOperationStates.waiting_for_hours_user)
         self.router.message.register(self._process_mass_hours_amount, MassOperationStates.waiting_for_hours_amount)
         self.router.message.register(self._process_mass_traffic_user, MassOperationStates.waiting_for_traffic_user)
         self.router.message.register(self._process_mass_traffic_amount, MassOperationStates.waiting_for_traffic_amount)
         self.router.message.register(self._process_ticket_search_input, SupportTicketStates.waiting_for_ticket_id)
         self.router.message.register(self._process_ticket_reply_message, SupportTicketStates.waiting_for_reply_message)
-        self.router.callback_query.register(self.admin_callback_handler, F.data.startswith("admin_"))
-        self.router.callback_query.register(self.admin_callback_handler, F.data.startswith("users_"))
-        self.router.callback_query.register(self.admin_callback_handler, F.data.startswith("admins_"))
-        self.router.callback_query.register(self._cancel_support_action, F.data == "support_ticket_cancel")
-        self.router.callback_query.register(self.admin_callback_handler, F.data.startswith("support_"))
+        self.router.callback_query.register(self.admin_callback_handler, self.callback_routes.filter())
 
     async def admin_panel(self, message: Message):
         """Показ панели администратора"""
@@ -159,33 +267,99 @@ class AdminHandlers(BaseHandler):
             reply_markup=get_admin_main_keyboard()
         )
 
-    @staticmethod
-    def _is_cancel_message(text: Optional[str]) -> bool:
-        if not text:
-            return False
-        return text.strip().lower() in {"отмена", "cancel", "/cancel"}
+    async def payments_command(self, message: Message):
+        """/payments — итоги по дням, /payments <telegram_id> — история платежей пользователя"""
+        if not can_access_admin_panel(message.from_user.id):
+            await message.answer("❌ У вас нет доступа к панели администратора")
+            return
 
-    @staticmethod
-    def _extract_page_from_callback(data: str, default: int = 0) -> int:
-        parts = data.split(":")
-        if len(parts) > 1 and parts[-1].isdigit():
-            return max(0, int(parts[-1]))
-        return default
+        parts = (message.text or "").split()
+        if len(parts) < 2:
+            await message.answer(await self._format_payment_totals())
+            return
+        if not parts[1].isdigit():
+            await message.answer("Использование: /payments <telegram_id>")
+            return
+        await message.answer(await self._format_user_payments(int(parts[1])))
+
+    async def profile_command(self, message: Message):
+        """/profile <секунды> — профилирование работающего бота и топ функций по накопленному времени"""
+        if not can_access_admin_panel(message.from_user.id):
+            await message.answer("❌ У вас нет доступа к панели администратора")
+            return
+
+        parts = (message.text or "").split()
+        try:
+            seconds = float(parts[1].replace(",", "."))
+            if not 1 <= seconds <= profiler.max_seconds:
+                raise ValueError
+        except (IndexError, ValueError):
+            await message.answer(f"Использование: /profile <секунды>, от 1 до {profiler.max_seconds:g}")
+            return
+        if profiler.running:
+            await message.answer("⚠️ Профилирование уже идет, дождитесь его окончания")
+            return
+
+        progress = await message.answer(f"⏱ Профилирование {seconds:g} с, бот продолжает работать…")
+        try:
+            report = await profiler.profile(seconds)
+        except ProfilerBusyError:
+            await progress.edit_text("⚠️ Профилирование уже идет, дождитесь его окончания")
+            return
+        logger.info(f"Профилирование по запросу {message.from_user.id}: {report.duration:.1f} с, вызовов {report.total_calls}")
+
+        await progress.edit_text(self._format_profile_report(report), parse_mode="HTML")
+        await message.answer_document(
+            BufferedInputFile(report.stats, filename=f"profile-{datetime.now():%Y%m%d-%H%M%S}.prof"),
+            caption="Статистика cProfile: python -m pstats <файл> или snakeviz <файл>",
+        )
 
     @staticmethod
-    def _extract_username_and_page(data: str, default_page: int = 0) -> tuple[str, int]:
-        parts = data.split(":")
-        username = parts[1] if len(parts) > 1 else ""
-        page = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else default_page
-        return username, max(0, page)
+    def _format_profile_report(report: ProfileReport) -> str:
+        rows = ["накопл., с | собств., с | вызовов | функция"]
+        for function, calls, own_time, cumulative_time in report.top:
+            name = function if len(function) <= 80 else "…" + function[-79:]
+            rows.append(f"{cumulative_time:10.3f} | {own_time:10.3f} | {calls:7} | {name}")
+        table = html.escape("\n".join(rows))
+        return (
+            f"⏱ <b>Профиль за {report.duration:.1f} с</b>, вызовов функций: {report.total_calls}\n\n"
+            f"<pre>{table}</pre>"
+        )
+
+    async def _format_payment_totals(self, days: int = 7) -> str:
+        totals = await self.fulfillment_service.get_daily_totals(days)
+        lines = [f"💳 Платежи за {days} дн.\n"]
+        if not totals:
+            lines.append("Платежей нет.")
+        for day, count, amount, unfinished in totals:
+            line = f"{datetime.fromisoformat(day).strftime('%d.%m.%Y')}: {count} шт., {amount}⭐"
+            if unfinished:
+                line += f" (не выдано: {unfinished})"
+            lines.append(line)
+        lines.append("\nИстория пользователя: /payments <telegram_id>")
+        return "\n".join(lines)
+
+    async def _format_user_payments(self, telegram_id: int) -> str:
+        orders = await self.fulfillment_service.get_user_payments(telegram_id)
+        if not orders:
+            return f"💳 У пользователя {telegram_id} нет платежей."
+        lines = [f"💳 Платежи пользователя {telegram_id}\n"]
+        for order in orders:
+            unit = "мес." if order.plan == "monthly" else "ГБ"
+            line = (
+                f"#{order.id} · {format_datetime(order.created_at)} · {order.quantity} {unit} · "
+                f"{order.amount}⭐ · {self.PAYMENT_STATUS_LABELS.get(order.status, order.status)}"
+            )
+            if order.status in ("failed", "needs_review") and order.last_error:
+                line += f"\n   {order.last_error}"
+            lines.append(line)
+        return "\n".join(lines)
 
     @staticmethod
-    def _split_username_page(payload: str) -> tuple[str, int]:
-        if ":" in payload:
-            username, page_str = payload.split(":", maxsplit=1)
-            if page_str.isdigit():
-                return username, int(page_str)
-        return payload, 0
+    def _is_cancel_message(text: Optional[str]) -> bool:
+        if not text:
+            return False
+        return text.strip().lower() in {"отмена", "cancel", "/cancel"}
 
     @staticmethod
     def _simple_back_keyboard(back_callback: str, cancel_callback: Optional[str] = None) -> InlineKeyboardMarkup:
@@ -196,15 +370,6 @@ class AdminHandlers(BaseHandler):
             buttons[0].append(InlineKeyboardButton(text="❌ Отмена", callback_data=cancel_callback))
         return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-    @staticmethod
-    def _parse_user_edit_callback(data: str, prefix: str, include_choice: bool = True) -> tuple[str, int, Optional[str]]:
-        payload = data[len(prefix):] if data.startswith(prefix) else ""
-        parts = payload.split(":") if payload else []
-        username = parts[0] if parts else ""
-        page = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
-        choice = parts[2] if include_choice and len(parts) > 2 else None
-        return username, page, choice
-
     async def _send_edit_step(
         self,
         text: str,
@@ -309,213 +474,429 @@ class AdminHandlers(BaseHandler):
                 reply_markup=get_admin_users_keyboard()
             )
 
-    async def admin_callback_handler(self, callback: CallbackQuery, state: FSMContext):
-        """Обработчик callback'ов администратора"""
-        user_id = callback.from_user.id
+    def _build_callback_router(self) -> CallbackRouter:
+        """Таблица callback'ов админ-панели: точные строки и типизированные префиксы"""
+        routes = CallbackRouter()
 
-        # Проверяем доступ для разных типов callback'ов
-        data = callback.data
+        # Главное меню
+        routes.exact("admin_dashboard", self._cb_show_dashboard)
+        routes.exact("admin_stats", self._cb_show_stats)
+        routes.exact("admin_users", self._cb_users_menu)
+        routes.exact("admin_admins", self._cb_admins_menu)
+        routes.exact("admin_nodes", self._cb_show_nodes)
+        routes.exact("admin_back", self._cb_admin_back)
+        routes.exact("admin_header", self._cb_noop, AccessLevel.SUPPORT)
+        routes.exact("admin_support_tickets", self._cb_support_tickets_menu, AccessLevel.SUPPORT)
+        routes.exact("admin_payments", self._cb_show_payments)
 
-        if data.startswith("admin_"):
-            # доступ к тикетам поддержки: админ или саппорт
-            if data == "admin_support_tickets":
-                if not can_access_support_tickets(user_id):
-                    await callback.answer("🚫 У вас нет доступа к тикетам поддержки", show_alert=True)
-                    return
-            # остальные админские действия — только для админов
-            elif not can_access_admin_panel(user_id):
+        # Пользователи
+        routes.prefixed(UsersListCallback, self._cb_users_list)
+        routes.prefixed(UserViewCallback, self._cb_user_view)
+        routes.prefixed(UserEditCallback, self._cb_user_edit)
+        routes.prefixed(UserDeleteCallback, self._cb_user_delete)
+        routes.prefixed(UserDeleteConfirmCallback, self._cb_user_delete_confirm)
+        routes.exact("users_delete_cancel", self._cb_user_delete_cancel)
+        routes.exact("users_search", self._cb_users_search)
+        routes.exact("users_search_cancel", self._cb_users_menu)
+        routes.exact("user_add", self._cb_user_add)
+        routes.prefixed(UserEditStatusCallback, self._cb_user_edit_status)
+        routes.prefixed(UserEditLimitCallback, self._cb_user_edit_limit)
+        routes.prefixed(UserEditResetCallback, self._cb_user_edit_reset)
+        routes.prefixed(UserEditExpireCallback, self._cb_user_edit_expire)
+        routes.prefixed(UserEditNoteCallback, self._cb_user_edit_note)
+        routes.prefixed(UserEditLimitMenuCallback, self._cb_user_edit_limit_menu)
+        routes.prefixed(UserEditExpireMenuCallback, self._cb_user_edit_expire_menu)
+        routes.prefixed(UserEditNoteMenuCallback, self._cb_user_edit_note_menu)
+        routes.prefixed(UserEditCancelCallback, self._cb_user_edit_cancel)
+
+        # Массовые операции и рассылки
+        routes.exact("users_add_time", self._cb_users_add_time)
+        routes.exact("users_add_time_all", self._cb_users_add_time_all)
+        routes.exact("users_add_time_user", self._cb_users_add_time_user)
+        routes.exact("users_add_data", self._cb_users_add_data)
+        routes.exact("users_add_data_all", self._cb_users_add_data_all)
+        routes.exact("users_add_data_user", self._cb_users_add_data_user)
+        routes.exact("users_grant_confirm", self._cb_users_grant_confirm)
+        routes.prefixed(MassUndoCallback, self._cb_mass_undo)
+        routes.prefixed(MassUndoConfirmCallback, self._cb_mass_undo_confirm)
+        routes.exact("users_reset_traffic", self._cb_users_reset_traffic)
+        routes.exact("users_reset_traffic_confirm", self._cb_users_reset_traffic_confirm)
+        routes.exact("users_delete_expired", self._cb_users_delete_expired)
+        routes.exact("users_delete_expired_confirm", self._cb_users_delete_expired_confirm)
+        routes.exact("users_broadcast", self._cb_broadcast_menu)
+        routes.prefixed(BroadcastSegmentCallback, self._cb_broadcast_segment)
+        routes.exact("users_broadcast_custom", self._cb_broadcast_custom)
+        routes.exact("users_broadcast_confirm", self._cb_broadcast_confirm)
+
+        # Администраторы Marzban
+        routes.prefixed(AdminsListCallback, self._cb_admins_list)
+        routes.exact("admins_search", self._cb_admins_search)
+        routes.exact("admins_add", self._cb_admins_add)
+        routes.prefixed(AdminManageCallback, self._cb_admin_manage)
+        routes.prefixed(AdminEditCallback, self._cb_admin_edit)
+        routes.prefixed(AdminDeleteCallback, self._cb_admin_delete)
+        routes.prefixed(AdminDeleteConfirmCallback, self._cb_admin_delete_confirm)
+        routes.exact("admins_delete_cancel", self._cb_admin_delete_cancel)
+
+        # Тикеты поддержки
+        routes.exact("support_header", self._cb_noop, AccessLevel.SUPPORT)
+        routes.exact("support_tickets_list", self._cb_support_tickets_list, AccessLevel.SUPPORT)
+        routes.prefixed(SupportTicketsListCallback, self._cb_support_tickets_list, AccessLevel.SUPPORT)
+        routes.exact("support_ticket_search", self._cb_support_ticket_search, AccessLevel.SUPPORT)
+        routes.exact("support_tickets_stats", self._cb_support_tickets_stats, AccessLevel.SUPPORT)
+        routes.exact("support_ticket_cancel", self._cb_support_ticket_cancel, AccessLevel.SUPPORT)
+        routes.prefixed(SupportTicketToggleCallback, self._cb_support_ticket_toggle, AccessLevel.SUPPORT)
+        routes.prefixed(SupportTicketReplyCallback, self._cb_support_ticket_reply, AccessLevel.SUPPORT)
+
+        return routes
+
+    async def admin_callback_handler(
+        self,
+        callback: CallbackQuery,
+        state: FSMContext,
+        route: CallbackRoute,
+        callback_data: Optional[CallbackData] = None,
+    ):
+        """Обработчик callback'ов администратора: маршрут уже найден фильтром"""
+        if not route.is_allowed(callback.from_user.id):
+            if route.access == AccessLevel.SUPPORT:
+                await callback.answer("🚫 У вас нет доступа к тикетам поддержки", show_alert=True)
+            else:
                 await callback.answer("🚫 У вас нет прав администратора", show_alert=True)
-                return
-
-        if data in ["admin_stats", "admin_admins", "admin_users", "admin_nodes"] and not is_admin(user_id):
-            await callback.answer("❌ Только для администраторов", show_alert=True)
             return
 
         try:
-            if data == "admin_stats":
-                await self._show_system_stats(callback)
-            elif data == "admin_users":
-                await state.clear()
-                await self._show_users_menu(callback)
-            elif data == "admin_admins":
-                await state.clear()
-                await self._show_admins_menu(callback)
-            elif data == "admin_nodes":
-                await self._show_nodes_list(callback)
-            elif data == "admin_support_tickets":
-                await state.clear()
-                await self._show_support_tickets_menu(callback)
-            elif data == "admin_back":
-                await state.clear()
-                await callback.message.edit_text(
-                    "👨‍💼 Панель администратора Marzban",
-                    reply_markup=get_admin_main_keyboard()
-                )
-            elif data.startswith("users_list:"):
-                page = self._extract_page_from_callback(data)
-                await state.clear()
-                await self._show_users_list(callback, page)
-            elif data.startswith("users_view:"):
-                username, page = self._extract_username_and_page(data)
-                await state.clear()
-                await self._show_user_details(callback, username, page)
-            elif data.startswith("users_edit:"):
-                username, page = self._extract_username_and_page(data)
-                await state.clear()
-                await self._start_user_edit(callback, state, username, page)
-            elif data.startswith("users_delete:"):
-                username, page = self._extract_username_and_page(data)
-                await self._confirm_user_deletion(callback, state, username, page)
-            elif data.startswith("confirm_delete_user_"):
-                payload = data[len("confirm_delete_user_"):]
-                username, page = self._split_username_page(payload)
-                await self._delete_user(callback, state, username, page)
-            elif data == "cancel_delete_user":
-                await self._cancel_delete_user(callback, state)
-            elif data == "users_search":
-                await state.set_state(UserSearchStates.waiting_for_username)
-                await callback.message.edit_text(
-                    "🔍 Введите имя пользователя Marzban:\n\nНажмите «Назад», чтобы отменить поиск.",
-                    reply_markup=get_user_search_keyboard()
-                )
-                await callback.answer()
-            elif data == "users_search_cancel":
-                await state.clear()
-                await self._show_users_menu(callback)
-            elif data == "user_add":
-                await state.clear()
-                await self._start_user_creation(callback, state)
-            elif data == "users_add_time":
-                await state.clear()
-                await callback.message.edit_text(
-                    "⏰ Выберите режим добавления времени:",
-                    reply_markup=get_users_add_time_keyboard()
-                )
-                await callback.answer()
-            elif data == "users_add_time_all":
-                await state.set_state(MassOperationStates.waiting_for_hours)
-                await callback.message.edit_text(
-                    "⏰ Укажите количество часов для продления подписки всех пользователей с месячным тарифом:",
-                    reply_markup=self._simple_back_keyboard("users_add_time", "admin_users")
-                )
-                await callback.answer()
-            elif data == "users_add_time_user":
-                await state.set_state(MassOperationStates.waiting_for_hours_user)
-                await state.update_data(mass_operation=None)
-                await callback.message.edit_text(
-                    "👤 Введите имя пользователя Marzban, которому нужно добавить время:",
-                    reply_markup=self._simple_back_keyboard("users_add_time", "admin_users")
-                )
-                await callback.answer()
-            elif data == "users_add_data":
-                await state.clear()
-                await callback.message.edit_text(
-                    "💽 Выберите режим добавления трафика:",
-                    reply_markup=get_users_add_data_keyboard()
-                )
-                await callback.answer()
-            elif data == "users_add_data_all":
-                await state.set_state(MassOperationStates.waiting_for_traffic)
-                await callback.message.edit_text(
-                    "💽 Укажите количество ГБ, которое добавить к лимиту всех пользователей с ограничением:",
-                    reply_markup=self._simple_back_keyboard("users_add_data", "admin_users")
-                )
-                await callback.answer()
-            elif data == "users_add_data_user":
-                await state.set_state(MassOperationStates.waiting_for_traffic_user)
-                await state.update_data(mass_operation=None)
-                await callback.message.edit_text(
-                    "👤 Введите имя пользователя Marzban, которому нужно добавить трафик:",
-                    reply_markup=self._simple_back_keyboard("users_add_data", "admin_users")
-                )
-                await callback.answer()
-            elif data == "users_broadcast":
-                await state.set_state(MassOperationStates.waiting_for_broadcast_message)
-                await callback.message.edit_text(
-                    "📣 Введите текст рассылки для всех пользователей:",
-                    reply_markup=self._simple_back_keyboard("admin_users")
-                )
-                await callback.answer()
-            elif data.startswith("users_edit_status:"):
-                username, page, choice = self._parse_user_edit_callback(data, "users_edit_status:")
-                await self._handle_user_edit_status(callback, state, username, page, choice)
-            elif data.startswith("users_edit_limit:"):
-                username, page, choice = self._parse_user_edit_callback(data, "users_edit_limit:")
-                await self._handle_user_edit_limit(callback, state, username, page, choice)
-            elif data.startswith("users_edit_limit_menu:"):
-                username, page, _ = self._parse_user_edit_callback(data, "users_edit_limit_menu:", include_choice=False)
-                context = await self._get_edit_user_context(state, username)
-                if not context:
-                    await callback.answer("Контекст редактирования потерян", show_alert=True)
-                    await self._show_user_details(callback, username, page)
-                else:
-                    await state.set_state(UserEditStates.waiting_for_limit)
-                    await self._prompt_user_limit_choice(callback=callback, context=context)
-            elif data.startswith("users_edit_reset:"):
-                username, page, choice = self._parse_user_edit_callback(data, "users_edit_reset:")
-                await self._handle_user_edit_reset(callback, state, username, page, choice)
-            elif data.startswith("users_edit_expire:"):
-                username, page, choice = self._parse_user_edit_callback(data, "users_edit_expire:")
-                await self._handle_user_edit_expire(callback, state, username, page, choice)
-            elif data.startswith("users_edit_expire_menu:"):
-                username, page, _ = self._parse_user_edit_callback(data, "users_edit_expire_menu:", include_choice=False)
-                context = await self._get_edit_user_context(state, username)
-                if not context:
-                    await callback.answer("Контекст редактирования потерян", show_alert=True)
-                    await self._show_user_details(callback, username, page)
-                else:
-                    await state.set_state(UserEditStates.waiting_for_expire)
-                    await self._prompt_user_expire_choice(callback=callback, context=context)
-            elif data.startswith("users_edit_note:"):
-                username, page, choice = self._parse_user_edit_callback(data, "users_edit_note:")
-                await self._handle_user_edit_note(callback, state, username, page, choice)
-            elif data.startswith("users_edit_note_menu:"):
-                username, page, _ = self._parse_user_edit_callback(data, "users_edit_note_menu:", include_choice=False)
-                context = await self._get_edit_user_context(state, username)
-                if not context:
-                    await callback.answer("Контекст редактирования потерян", show_alert=True)
-                    await self._show_user_details(callback, username, page)
-                else:
-                    await state.set_state(UserEditStates.waiting_for_note)
-                    await self._prompt_user_note_choice(callback=callback, context=context)
-            elif data.startswith("users_edit_cancel:"):
-                username, page, _ = self._parse_user_edit_callback(data, "users_edit_cancel:", include_choice=False)
-                await self._cancel_user_edit(callback, state, username, page)
-            elif data.startswith("admins_list:"):
-                page = self._extract_page_from_callback(data)
-                await state.clear()
-                await self._show_admins_list(callback, page)
-            elif data == "admins_search":
-                await state.set_state(AdminSearchStates.waiting_for_username)
-                await callback.message.edit_text(
-                    "🔍 Введите имя администратора (или напишите «отмена»):",
-                    reply_markup=None
-                )
-                await callback.answer()
-            elif data == "admins_add":
-                await state.clear()
-                await self._start_admin_creation(callback, state)
-            elif data.startswith("admin_manage:"):
-                username, page = self._extract_username_and_page(data)
-                await state.clear()
-                await self._show_admin_details(callback, username, page)
-            elif data.startswith("admins_edit:"):
-                username, page = self._extract_username_and_page(data)
-                await state.clear()
-                await self._start_admin_edit(callback, state, username, page)
-            elif data.startswith("admins_delete:"):
-                username, page = self._extract_username_and_page(data)
-                await self._confirm_admin_deletion(callback, state, username, page)
-            elif data.startswith("confirm_delete_admin_"):
-                username = data[len("confirm_delete_admin_"):]
-                await self._delete_admin(callback, state, username)
-            elif data == "cancel_delete_admin":
-                await self._cancel_delete_admin(callback, state)
-            elif data.startswith("support_"):
-                await self._handle_support_callbacks(callback, data, state)
+            await route.handler(callback, state, callback_data)
         except Exception as e:
             logger.error(f"Error in admin callback handler: {e}")
             await callback.answer("❌ Произошла ошибка", show_alert=True)
+
+    # === Обработчики маршрутов ===
+    async def _cb_noop(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await callback.answer()
+
+    async def _cb_show_dashboard(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._show_dashboard(callback)
+
+    async def _cb_show_stats(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._show_system_stats(callback)
+
+    async def _cb_show_payments(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await callback.message.edit_text(
+            await self._format_payment_totals(),
+            reply_markup=self._simple_back_keyboard("admin_back")
+        )
+        await callback.answer()
+
+    async def _cb_users_menu(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._show_users_menu(callback)
+
+    async def _cb_admins_menu(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._show_admins_menu(callback)
+
+    async def _cb_show_nodes(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._show_nodes_list(callback)
+
+    async def _cb_support_tickets_menu(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._show_support_tickets_menu(callback)
+
+    async def _cb_admin_back(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await callback.message.edit_text(
+            "👨‍💼 Панель администратора Marzban",
+            reply_markup=get_admin_main_keyboard()
+        )
+
+    async def _cb_users_list(self, callback: CallbackQuery, state: FSMContext, data: UsersListCallback):
+        await state.clear()
+        await self._show_users_list(callback, max(0, data.page))
+
+    async def _cb_user_view(self, callback: CallbackQuery, state: FSMContext, data: UserViewCallback):
+        await state.clear()
+        await self._show_user_details(callback, data.username, max(0, data.page))
+
+    async def _cb_user_edit(self, callback: CallbackQuery, state: FSMContext, data: UserEditCallback):
+        await state.clear()
+        await self._start_user_edit(callback, state, data.username, max(0, data.page))
+
+    async def _cb_user_delete(self, callback: CallbackQuery, state: FSMContext, data: UserDeleteCallback):
+        await self._confirm_user_deletion(callback, state, data.username, max(0, data.page))
+
+    async def _cb_user_delete_confirm(self, callback: CallbackQuery, state: FSMContext, data: UserDeleteConfirmCallback):
+        await self._delete_user(callback, state, data.username, max(0, data.page))
+
+    async def _cb_user_delete_cancel(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._cancel_delete_user(callback, state)
+
+    async def _cb_users_search(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(UserSearchStates.waiting_for_username)
+        await callback.message.edit_text(
+            "🔍 Введите имя пользователя Marzban:\n\nНажмите «Назад», чтобы отменить поиск.",
+            reply_markup=get_user_search_keyboard()
+        )
+        await callback.answer()
+
+    async def _cb_user_add(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._start_user_creation(callback, state)
+
+    async def _cb_users_add_time(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await callback.message.edit_text(
+            "⏰ Выберите режим добавления времени:",
+            reply_markup=get_users_add_time_keyboard()
+        )
+        await callback.answer()
+
+    async def _cb_users_add_time_all(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(MassOperationStates.waiting_for_hours)
+        await callback.message.edit_text(
+            "⏰ Укажите количество часов для продления подписки всех пользователей с месячным тарифом.\n"
+            "Перед записью будет показан предпросмотр:",
+            reply_markup=self._simple_back_keyboard("users_add_time", "admin_users")
+        )
+        await callback.answer()
+
+    async def _cb_users_add_time_user(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(MassOperationStates.waiting_for_hours_user)
+        await state.update_data(mass_operation=None)
+        await callback.message.edit_text(
+            "👤 Введите имя пользователя Marzban, которому нужно добавить время:",
+            reply_markup=self._simple_back_keyboard("users_add_time", "admin_users")
+        )
+        await callback.answer()
+
+    async def _cb_users_add_data(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await callback.message.edit_text(
+            "💽 Выберите режим добавления трафика:",
+            reply_markup=get_users_add_data_keyboard()
+        )
+        await callback.answer()
+
+    async def _cb_users_add_data_all(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(MassOperationStates.waiting_for_traffic)
+        await callback.message.edit_text(
+            "💽 Укажите количество ГБ, которое добавить к лимиту всех пользователей с ограничением.\n"
+            "Перед записью будет показан предпросмотр:",
+            reply_markup=self._simple_back_keyboard("users_add_data", "admin_users")
+        )
+        await callback.answer()
+
+    async def _cb_users_add_data_user(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(MassOperationStates.waiting_for_traffic_user)
+        await state.update_data(mass_operation=None)
+        await callback.message.edit_text(
+            "👤 Введите имя пользователя Marzban, которому нужно добавить трафик:",
+            reply_markup=self._simple_back_keyboard("users_add_data", "admin_users")
+        )
+        await callback.answer()
+
+    async def _cb_broadcast_menu(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await callback.message.edit_text(
+            "📣 Выберите аудиторию рассылки:",
+            reply_markup=get_broadcast_audience_keyboard()
+        )
+        await callback.answer()
+
+    async def _cb_broadcast_segment(self, callback: CallbackQuery, state: FSMContext, data: BroadcastSegmentCallback):
+        audience = self.BROADCAST_AUDIENCES.get(data.segment)
+        if audience is None:
+            await callback.answer("Неизвестная аудитория", show_alert=True)
+            return
+        await self._ask_broadcast_text(callback.message, state, audience, edit=True)
+        await callback.answer()
+
+    async def _cb_broadcast_custom(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(MassOperationStates.waiting_for_broadcast_filter)
+        await callback.message.edit_text(
+            self.BROADCAST_FILTER_HELP,
+            reply_markup=self._simple_back_keyboard("users_broadcast", "admin_users"),
+            parse_mode="HTML"
+        )
+        await callback.answer()
+
+    async def _cb_broadcast_confirm(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._confirm_broadcast(callback, state)
+
+    async def _cb_users_grant_confirm(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._apply_mass_grant(callback, state)
+
+    async def _cb_mass_undo(self, callback: CallbackQuery, state: FSMContext, data: MassUndoCallback):
+        await state.clear()
+        await self._ask_bulk_confirmation(
+            callback,
+            f"↩️ <b>Отмена начисления #{data.operation_id}</b>\n\n"
+            "Пользователям вернется срок или лимит, который был до начисления. "
+            "Тех, кого изменили после начисления (например, после покупки), отмена не затронет. Продолжить?",
+            MassUndoConfirmCallback(operation_id=data.operation_id).pack(),
+        )
+
+    async def _cb_mass_undo_confirm(self, callback: CallbackQuery, state: FSMContext, data: MassUndoConfirmCallback):
+        try:
+            undo = await self.mass_operation_service.start_undo(data.operation_id, callback.from_user.id)
+        except UndoUnavailableError as e:
+            await callback.answer(str(e), show_alert=True)
+            return
+        except Exception as e:
+            logger.error(f"Не удалось запустить отмену начисления #{data.operation_id}: {e}")
+            await callback.answer("Не удалось запустить отмену. Попробуйте позже.", show_alert=True)
+            return
+        self.page_cache.invalidate("users")
+
+        await callback.message.edit_text(
+            f"↩️ Отмена начисления #{data.operation_id} запущена для {undo.total} пользователей.\n"
+            "По завершении придет уведомление с итогами.",
+            reply_markup=get_admin_users_keyboard()
+        )
+        await callback.answer()
+
+    async def _cb_users_reset_traffic(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._ask_bulk_confirmation(
+            callback,
+            "♻️ <b>Сброс трафика всем пользователям</b>\n\n"
+            "Использованный трафик обнулится у всех пользователей панели. Продолжить?",
+            "users_reset_traffic_confirm",
+        )
+
+    async def _cb_users_reset_traffic_confirm(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._run_bulk_operation(
+            callback,
+            self.subscription_service.reset_all_traffic,
+            "♻️ Трафик сброшен у {count} пользователей",
+        )
+
+    async def _cb_users_delete_expired(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._ask_bulk_confirmation(
+            callback,
+            "🗑 <b>Удаление истекших пользователей</b>\n\n"
+            "Все пользователи со статусом expired (истек срок) и limited (исчерпан трафик) "
+            "будут удалены из панели. "
+            "Это действие нельзя отменить. Продолжить?",
+            "users_delete_expired_confirm",
+        )
+
+    async def _cb_users_delete_expired_confirm(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._run_bulk_operation(
+            callback,
+            self.subscription_service.delete_expired_users,
+            "🗑 Удалено истекших пользователей: {count}",
+        )
+
+    async def _cb_user_edit_status(self, callback: CallbackQuery, state: FSMContext, data: UserEditStatusCallback):
+        await self._handle_user_edit_status(callback, state, data.username, max(0, data.page), data.choice)
+
+    async def _cb_user_edit_limit(self, callback: CallbackQuery, state: FSMContext, data: UserEditLimitCallback):
+        await self._handle_user_edit_limit(callback, state, data.username, max(0, data.page), data.choice)
+
+    async def _cb_user_edit_reset(self, callback: CallbackQuery, state: FSMContext, data: UserEditResetCallback):
+        await self._handle_user_edit_reset(callback, state, data.username, max(0, data.page), data.choice)
+
+    async def _cb_user_edit_expire(self, callback: CallbackQuery, state: FSMContext, data: UserEditExpireCallback):
+        await self._handle_user_edit_expire(callback, state, data.username, max(0, data.page), data.choice)
+
+    async def _cb_user_edit_note(self, callback: CallbackQuery, state: FSMContext, data: UserEditNoteCallback):
+        await self._handle_user_edit_note(callback, state, data.username, max(0, data.page), data.choice)
+
+    async def _cb_user_edit_limit_menu(self, callback: CallbackQuery, state: FSMContext, data: UserEditLimitMenuCallback):
+        context = await self._get_edit_user_context(state, data.username)
+        if not context:
+            await callback.answer("Контекст редактирования потерян", show_alert=True)
+            await self._show_user_details(callback, data.username, max(0, data.page))
+            return
+        await state.set_state(UserEditStates.waiting_for_limit)
+        await self._prompt_user_limit_choice(callback=callback, context=context)
+
+    async def _cb_user_edit_expire_menu(self, callback: CallbackQuery, state: FSMContext, data: UserEditExpireMenuCallback):
+        context = await self._get_edit_user_context(state, data.username)
+        if not context:
+            await callback.answer("Контекст редактирования потерян", show_alert=True)
+            await self._show_user_details(callback, data.username, max(0, data.page))
+            return
+        await state.set_state(UserEditStates.waiting_for_expire)
+        await self._prompt_user_expire_choice(callback=callback, context=context)
+
+    async def _cb_user_edit_note_menu(self, callback: CallbackQuery, state: FSMContext, data: UserEditNoteMenuCallback):
+        context = await self._get_edit_user_context(state, data.username)
+        if not context:
+            await callback.answer("Контекст редактирования потерян", show_alert=True)
+            await self._show_user_details(callback, data.username, max(0, data.page))
+            return
+        await state.set_state(UserEditStates.waiting_for_note)
+        await self._prompt_user_note_choice(callback=callback, context=context)
+
+    async def _cb_user_edit_cancel(self, callback: CallbackQuery, state: FSMContext, data: UserEditCancelCallback):
+        await self._cancel_user_edit(callback, state, data.username, max(0, data.page))
+
+    async def _cb_admins_list(self, callback: CallbackQuery, state: FSMContext, data: AdminsListCallback):
+        await state.clear()
+        await self._show_admins_list(callback, max(0, data.page))
+
+    async def _cb_admins_search(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(AdminSearchStates.waiting_for_username)
+        await callback.message.edit_text(
+            "🔍 Введите имя администратора (или напишите «отмена»):",
+            reply_markup=None
+        )
+        await callback.answer()
+
+    async def _cb_admins_add(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.clear()
+        await self._start_admin_creation(callback, state)
+
+    async def _cb_admin_manage(self, callback: CallbackQuery, state: FSMContext, data: AdminManageCallback):
+        await state.clear()
+        await self._show_admin_details(callback, data.username, max(0, data.page))
+
+    async def _cb_admin_edit(self, callback: CallbackQuery, state: FSMContext, data: AdminEditCallback):
+        await state.clear()
+        await self._start_admin_edit(callback, state, data.username, max(0, data.page))
+
+    async def _cb_admin_delete(self, callback: CallbackQuery, state: FSMContext, data: AdminDeleteCallback):
+        await self._confirm_admin_deletion(callback, state, data.username, max(0, data.page))
+
+    async def _cb_admin_delete_confirm(self, callback: CallbackQuery, state: FSMContext, data: AdminDeleteConfirmCallback):
+        await self._delete_admin(callback, state, data.username, max(0, data.page))
+
+    async def _cb_admin_delete_cancel(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._cancel_delete_admin(callback, state)
+
+    async def _cb_support_tickets_list(
+        self,
+        callback: CallbackQuery,
+        state: FSMContext,
+        data: Optional[SupportTicketsListCallback],
+    ):
+        await self._show_support_tickets_list(callback, data.offset if data else 0)
+
+    async def _cb_support_ticket_search(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await state.set_state(SupportTicketStates.waiting_for_ticket_id)
+        await state.update_data(origin_message_id=callback.message.message_id)
+        await callback.message.edit_text(
+            "🔍 Введите ID тикета, который хотите открыть:",
+            reply_markup=get_support_ticket_search_keyboard()
+        )
+        await callback.answer()
+
+    async def _cb_support_tickets_stats(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._show_support_tickets_stats(callback)
+
+    async def _cb_support_ticket_cancel(self, callback: CallbackQuery, state: FSMContext, data: None):
+        await self._cancel_support_action(callback, state)
+
+    async def _cb_support_ticket_toggle(self, callback: CallbackQuery, state: FSMContext, data: SupportTicketToggleCallback):
+        await self._toggle_ticket_status(callback, data.ticket_id, data.status)
+
+    async def _cb_support_ticket_reply(self, callback: CallbackQuery, state: FSMContext, data: SupportTicketReplyCallback):
+        await self._start_ticket_reply(callback, data.ticket_id, state)
 
     async def _show_support_tickets_menu(self, callback: CallbackQuery):
         """Показ меню управления тикетами поддержки"""
@@ -545,29 +926,6 @@ class AdminHandlers(BaseHandler):
             await callback.message.edit_text(
                 f"❌ Ошибка загрузки меню тикетов: {str(e)}"
             )
-
-    async def _handle_support_callbacks(self, callback: CallbackQuery, data: str, state: FSMContext):
-        """Обработчик callback'ов поддержки"""
-        if data.startswith("support_tickets_list"):
-            parts = data.split(":", maxsplit=1)
-            offset = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
-            await self._show_support_tickets_list(callback, offset)
-        elif data == "support_ticket_search":
-            await state.set_state(SupportTicketStates.waiting_for_ticket_id)
-            await state.update_data(origin_message_id=callback.message.message_id)
-            await callback.message.edit_text(
-                "🔍 Введите ID тикета, который хотите открыть:",
-                reply_markup=get_support_ticket_search_keyboard()
-            )
-            await callback.answer()
-        elif data == "support_tickets_stats":
-            await self._show_support_tickets_stats(callback)
-        elif data.startswith("support_ticket_toggle:"):
-            await self._toggle_ticket_status(callback, data)
-        elif data.startswith("support_ticket_reply:"):
-            await self._start_ticket_reply(callback, data, state)
-        else:
-            await callback.answer("⏳ Функция в разработке", show_alert=True)
 
     async def _show_support_tickets_list(self, callback: CallbackQuery, offset: int = 0):
         """Показ списка тикетов поддержки"""
@@ -689,20 +1047,8 @@ class AdminHandlers(BaseHandler):
         await callback.answer("❌ Действие отменено")
         await self._show_support_tickets_menu(callback)
 
-    async def _toggle_ticket_status(self, callback: CallbackQuery, data: str):
+    async def _toggle_ticket_status(self, callback: CallbackQuery, ticket_id: int, new_status: str):
         """Переключение статуса тикета"""
-        if not can_access_support_tickets(callback.from_user.id):
-            await callback.answer("🚫 Нет доступа", show_alert=True)
-            return
-
-        parts = data.split(":")
-        if len(parts) != 3 or not parts[1].isdigit():
-            await callback.answer("❌ Некорректные данные", show_alert=True)
-            return
-
-        ticket_id = int(parts[1])
-        new_status = parts[2]
-
         if new_status not in {"open", "closed"}:
             await callback.answer("❌ Некорректный статус", show_alert=True)
             return
@@ -724,18 +1070,8 @@ class AdminHandlers(BaseHandler):
             reply_markup=get_admin_ticket_actions_keyboard(ticket.id, ticket.status == "open")
         )
 
-    async def _start_ticket_reply(self, callback: CallbackQuery, data: str, state: FSMContext):
+    async def _start_ticket_reply(self, callback: CallbackQuery, ticket_id: int, state: FSMContext):
         """Начинает процесс отправки ответа пользователю"""
-        if not can_access_support_tickets(callback.from_user.id):
-            await callback.answer("🚫 Нет доступа", show_alert=True)
-            return
-
-        parts = data.split(":")
-        if len(parts) < 2 or not parts[1].isdigit():
-            await callback.answer("❌ Некорректный ID тикета", show_alert=True)
-            return
-
-        ticket_id = int(parts[1])
         ticket = await self.support_service.get_ticket_for_admin(ticket_id)
         if not ticket:
             await callback.answer("❌ Тикет не найден", show_alert=True)
@@ -821,12 +1157,13 @@ class AdminHandlers(BaseHandler):
             return
 
         try:
-            await message.bot.send_message(
-                chat_id=ticket.user_id,
-                text=(
+            await self.message_sender.send_message(
+                ticket.user_id,
+                (
                     f"📩 Ответ от поддержки по тикету #{ticket.id}\n\n"
                     f"{reply_text}"
-                )
+                ),
+                priority=SendPriority.INTERACTIVE,
             )
         except Exception as e:
             logger.error(f"Не удалось отправить сообщение пользователю {ticket.user_id}: {e}")
@@ -1022,6 +1359,7 @@ class AdminHandlers(BaseHandler):
             await self._cancel_operation(message, state, "users")
             return
 
+        self.page_cache.invalidate("users")
         await state.clear()
         await message.answer("✅ Пользователь успешно создан.")
         await self._send_user_details_message(message, username)
@@ -1182,6 +1520,7 @@ class AdminHandlers(BaseHandler):
             await self._cancel_operation(message, state, "admins")
             return
 
+        self.page_cache.invalidate("admins")
         await state.clear()
         await message.answer("✅ Администратор создан.")
         await self._send_admin_details_message(message, username, 0)
@@ -1299,6 +1638,7 @@ class AdminHandlers(BaseHandler):
             await state.clear()
             return
 
+        self.page_cache.invalidate("admins")
         await state.clear()
         await message.answer("✅ Изменения администратора сохранены.")
         await self._send_admin_details_message(message, username, page)
@@ -1318,12 +1658,7 @@ class AdminHandlers(BaseHandler):
             return
 
         await state.clear()
-        updated, errors = await self._bulk_add_hours(hours)
-        await message.answer(
-            f"⏰ Добавлено {hours} ч подписки {updated} пользователям."
-            + (f"\n⚠️ Ошибок: {errors}" if errors else "")
-        )
-        await self._show_users_menu_from_message(message)
+        await self._preview_mass_grant(message, state, self.subscription_service.plan_bulk_hours, hours)
 
     async def _process_mass_traffic_input(self, message: Message, state: FSMContext):
         text = message.text or ""
@@ -1340,12 +1675,7 @@ class AdminHandlers(BaseHandler):
             return
 
         await state.clear()
-        updated, errors = await self._bulk_add_traffic(amount)
-        await message.answer(
-            f"💽 Добавлено {amount} ГБ {updated} пользователям."
-            + (f"\n⚠️ Ошибок: {errors}" if errors else "")
-        )
-        await self._show_users_menu_from_message(message)
+        await self._preview_mass_grant(message, state, self.subscription_service.plan_bulk_traffic, amount)
 
     async def _process_mass_hours_user(self, message: Message, state: FSMContext):
         text = message.text or ""
@@ -1400,7 +1730,8 @@ class AdminHandlers(BaseHandler):
             await self._cancel_operation(message, state, "users")
             return
 
-        success, new_expire = await self._add_hours_to_user(username, hours)
+        success, new_expire = await self.subscription_service.add_hours(username, hours)
+        self.page_cache.invalidate("users")
         if not success:
             await message.answer("❌ Не удалось добавить время пользователю. Попробуйте позже.")
             await state.clear()
@@ -1409,7 +1740,6 @@ class AdminHandlers(BaseHandler):
         hours_text = format(hours, "g")
         expire_text = self._format_expire(new_expire)
         notified = await self._notify_user_bonus(
-            message.bot,
             username,
             f"🎁 Вам добавлено {hours_text} ч. бесплатного времени!\nНовый срок действия: {expire_text}",
         )
@@ -1474,7 +1804,8 @@ class AdminHandlers(BaseHandler):
             await self._cancel_operation(message, state, "users")
             return
 
-        success, new_limit = await self._add_traffic_to_user(username, amount)
+        success, new_limit = await self.subscription_service.add_traffic(username, amount)
+        self.page_cache.invalidate("users")
         if not success:
             await message.answer("❌ Не удалось добавить трафик пользователю. Попробуйте позже.")
             await state.clear()
@@ -1483,7 +1814,6 @@ class AdminHandlers(BaseHandler):
         amount_text = format(amount, "g")
         limit_text = self._format_data_limit(new_limit)
         notified = await self._notify_user_bonus(
-            message.bot,
             username,
             f"🎁 Вам добавлено {amount_text} ГБ бесплатного трафика!\nТеперь доступно: {limit_text}",
         )
@@ -1495,6 +1825,60 @@ class AdminHandlers(BaseHandler):
         await state.clear()
         await self._show_users_menu_from_message(message)
 
+    @staticmethod
+    def _parse_broadcast_filter(text: str) -> Optional[BroadcastAudience]:
+        """Разбирает фильтр вида «type=traffic status=active expires=7 usage=80 new»"""
+        audience = BroadcastAudience()
+        for token in text.lower().split():
+            key, _, value = token.partition("=")
+            try:
+                if key == "new" and not value:
+                    audience.never_purchased = True
+                elif key == "type" and value in {"monthly", "traffic"}:
+                    audience.subscription_type = value
+                elif key == "status" and value in {"active", "expired", "limited", "disabled", "on_hold"}:
+                    audience.status = value
+                elif key == "expires" and int(value) > 0:
+                    audience.expires_within_days = int(value)
+                elif key == "usage" and 0 <= float(value.replace(",", ".")) <= 100:
+                    audience.usage_above_percent = float(value.replace(",", "."))
+                else:
+                    return None
+            except ValueError:
+                return None
+        return audience
+
+    async def _ask_broadcast_text(self, message: Message, state: FSMContext, audience: BroadcastAudience, edit: bool):
+        recipients = await self.broadcast_service.count_recipients(audience)
+        await state.set_state(MassOperationStates.waiting_for_broadcast_message)
+        await state.update_data(broadcast_audience=audience.to_dict())
+        text = (
+            f"📣 Аудитория: {audience.describe()}\n"
+            f"👥 Получателей: {recipients}\n\n"
+            "Введите текст рассылки:"
+        )
+        keyboard = self._simple_back_keyboard("users_broadcast", "admin_users")
+        if edit:
+            await message.edit_text(text, reply_markup=keyboard)
+        else:
+            await message.answer(text, reply_markup=keyboard)
+
+    async def _process_broadcast_filter(self, message: Message, state: FSMContext):
+        text = message.text or ""
+        if self._is_cancel_message(text):
+            await self._cancel_operation(message, state, "users")
+            return
+
+        audience = self._parse_broadcast_filter(text)
+        if audience is None:
+            await message.answer(
+                "❌ Не удалось разобрать фильтр.\n\n" + self.BROADCAST_FILTER_HELP,
+                parse_mode="HTML"
+            )
+            return
+
+        await self._ask_broadcast_text(message, state, audience, edit=False)
+
     async def _process_broadcast_message(self, message: Message, state: FSMContext):
         text = message.text or ""
         if self._is_cancel_message(text):
@@ -1506,191 +1890,273 @@ class AdminHandlers(BaseHandler):
             await message.answer("Сообщение не может быть пустым. Введите текст рассылки или «отмена»:")
             return
 
-        await state.clear()
-        sent, failed = await self._send_broadcast(message, content)
-        await message.answer(
-            f"📣 Рассылка завершена. Успешно: {sent}, ошибок: {failed}.")
-        await self._show_users_menu_from_message(message)
+        data = await state.get_data()
+        audience = BroadcastAudience.from_dict(data.get("broadcast_audience"))
+        recipients = await self.broadcast_service.count_recipients(audience)
+        if not recipients:
+            await state.clear()
+            await message.answer("⚠️ В выбранной аудитории нет получателей. Рассылка не создана.")
+            await self._show_users_menu_from_message(message)
+            return
 
-    async def _show_users_menu_from_message(self, message: Message):
+        await state.set_state(MassOperationStates.confirming_broadcast)
+        await state.update_data(broadcast_text=content)
         await message.answer(
-            "Выберите дальнейшее действие:",
+            "📣 Предпросмотр рассылки\n"
+            f"Аудитория: {audience.describe()}\n"
+            f"Получателей: {recipients}\n\n"
+            f"{content}",
+            reply_markup=get_broadcast_confirm_keyboard()
+        )
+
+    async def _confirm_broadcast(self, callback: CallbackQuery, state: FSMContext):
+        data = await state.get_data()
+        content = data.get("broadcast_text")
+        if await state.get_state() != MassOperationStates.confirming_broadcast.state or not content:
+            await callback.answer("Рассылка уже запущена или устарела", show_alert=True)
+            return
+
+        audience = BroadcastAudience.from_dict(data.get("broadcast_audience"))
+        await state.clear()
+        try:
+            broadcast = await self.broadcast_service.start_broadcast(content, callback.from_user.id, audience)
+        except Exception as e:
+            logger.error(f"Не удалось создать рассылку: {e}")
+            await callback.message.edit_text("❌ Не удалось запустить рассылку. Попробуйте позже.")
+            await callback.answer()
+            return
+
+        await callback.message.edit_text(
+            f"📣 Рассылка #{broadcast.id} запущена ({audience.describe()}).\n"
+            "По завершении придет уведомление с итогами.",
             reply_markup=get_admin_users_keyboard()
         )
+        await callback.answer()
 
-    async def _bulk_add_hours(self, hours: int) -> tuple[int, int]:
-        offset = 0
-        limit = max(50, self.users_page_limit)
-        updated = 0
-        errors = 0
-
-        while True:
-            response = await self.marzban_client.get_users(offset=offset, limit=limit)
-            users = response.get("users", [])
-            if not users:
-                break
-
-            for user in users:
-                expire = user.get("expire")
-                username = user.get("username")
-                if not username or not expire:
-                    continue
-                try:
-                    new_expire = int(expire) + hours * 3600
-                    await self.marzban_client.modify_user(username, {"expire": new_expire})
-                    updated += 1
-                except Exception as e:
-                    errors += 1
-                    logger.error(f"Не удалось обновить expire пользователя {username}: {e}")
-
-            offset += len(users)
-            total = response.get("total", offset)
-            if offset >= total:
-                break
-
-        return updated, errors
-
-    async def _bulk_add_traffic(self, amount_gb: float) -> tuple[int, int]:
-        offset = 0
-        limit = max(50, self.users_page_limit)
-        updated = 0
-        errors = 0
-        delta_bytes = int(amount_gb * (1024 ** 3))
-
-        while True:
-            response = await self.marzban_client.get_users(offset=offset, limit=limit)
-            users = response.get("users", [])
-            if not users:
-                break
-
-            for user in users:
-                username = user.get("username")
-                data_limit = user.get("data_limit")
-                if not username or not data_limit:
-                    continue
-                try:
-                    new_limit = int(data_limit) + delta_bytes
-                    await self.marzban_client.modify_user(username, {"data_limit": max(new_limit, 0)})
-                    updated += 1
-                except Exception as e:
-                    errors += 1
-                    logger.error(f"Не удалось обновить лимит пользователя {username}: {e}")
-
-            offset += len(users)
-            total = response.get("total", offset)
-            if offset >= total:
-                break
-
-        return updated, errors
-
-    async def _add_hours_to_user(self, username: str, hours: float) -> tuple[bool, Optional[int]]:
+    async def _preview_mass_grant(self, message: Message, state: FSMContext, planner, amount: float):
+        """Считает, кого затронет массовое начисление, и просит подтверждение"""
+        progress = await message.answer("⏳ Считаю, кого затронет начисление…")
         try:
-            user = await self.marzban_client.get_user(username)
+            plan = await planner(amount, page_size=max(50, self.users_page_limit))
         except Exception as e:
-            logger.error(f"Не удалось получить пользователя {username} при добавлении времени: {e}")
-            return False, None
+            logger.error(f"Не удалось рассчитать массовое начисление: {e}")
+            await progress.edit_text(
+                "❌ Не удалось получить пользователей панели. Попробуйте позже.",
+                reply_markup=get_admin_users_keyboard()
+            )
+            return
 
-        if not user:
-            return False, None
+        if not plan.changed:
+            await progress.edit_text(
+                self._format_grant_plan(plan) + "\n\nНачисление никому ничего не изменит, запись не требуется.",
+                parse_mode="HTML",
+                reply_markup=get_admin_users_keyboard()
+            )
+            return
 
-        expire = user.get("expire")
-        now_ts = int(datetime.utcnow().timestamp())
-        base = now_ts
-        if isinstance(expire, (int, float)) and expire:
-            expire_int = int(expire)
-            base = max(expire_int, now_ts)
+        self.grant_plans[message.from_user.id] = plan
+        await state.set_state(MassOperationStates.confirming_mass_grant)
+        await progress.edit_text(
+            self._format_grant_plan(plan) + "\n\nПрименить?",
+            parse_mode="HTML",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="✅ Применить", callback_data="users_grant_confirm"),
+                InlineKeyboardButton(text="❌ Отмена", callback_data="admin_users"),
+            ]])
+        )
 
-        try:
-            delta_seconds = int(hours * 3600)
-        except Exception:
-            return False, None
+    async def _apply_mass_grant(self, callback: CallbackQuery, state: FSMContext):
+        plan = self.grant_plans.pop(callback.from_user.id, None)
+        if await state.get_state() != MassOperationStates.confirming_mass_grant.state or plan is None:
+            await callback.answer("Начисление уже выполнено или отменено", show_alert=True)
+            return
+        await state.clear()
+        if plan.age > self.GRANT_PLAN_TTL:
+            await callback.answer()
+            await callback.message.edit_text(
+                "⌛ Предпросмотр устарел: данные пользователей могли измениться. Запустите начисление заново.",
+                reply_markup=get_admin_users_keyboard()
+            )
+            return
 
-        new_expire = base + max(delta_seconds, 0)
         try:
-            await self.marzban_client.modify_user(username, {"expire": new_expire})
+            operation = await self.mass_operation_service.start(plan, callback.from_user.id)
         except Exception as e:
-            logger.error(f"Не удалось продлить пользователя {username}: {e}")
-            return False, None
+            logger.error(f"Не удалось создать массовое начисление: {e}")
+            await callback.message.edit_text("❌ Не удалось запустить начисление. Попробуйте позже.")
+            await callback.answer()
+            return
+        self.page_cache.invalidate("users")
 
-        return True, new_expire
+        await callback.message.edit_text(
+            f"🚀 Начисление #{operation.id} запущено для {operation.total} пользователей.\n"
+            "По завершении придет уведомление с итогами; после перезапуска бота оно продолжится.",
+            reply_markup=get_admin_users_keyboard()
+        )
+        await callback.answer()
 
-    async def _add_traffic_to_user(self, username: str, amount_gb: float) -> tuple[bool, Optional[int]]:
-        try:
-            user = await self.marzban_client.get_user(username)
-        except Exception as e:
-            logger.error(f"Не удалось получить пользователя {username} при добавлении трафика: {e}")
-            return False, None
+    async def _send_mass_operation_result(self, operation: MassOperation):
+        """Уведомляет автора о завершении массового начисления (вызывается MassOperationService)"""
+        self.page_cache.invalidate("users")
+        if not operation.created_by:
+            return
 
-        if not user:
-            return False, None
+        if operation.is_undo:
+            lines = [
+                f"↩️ Отмена начисления #{operation.undo_of} завершена.",
+                f"Восстановлено: {operation.updated_count}, пропущено (изменены после начисления): "
+                f"{operation.skipped_count}, ошибок: {operation.failed_count}.",
+            ]
+        else:
+            unit = "ч" if operation.kind == "hours" else "ГБ"
+            lines = [
+                f"{'⏰' if operation.kind == 'hours' else '💽'} Начисление #{operation.id} "
+                f"({operation.amount:+g} {unit}) завершено.",
+                f"Изменено: {operation.updated_count}, пропущено: {operation.skipped_count}, "
+                f"ошибок: {operation.failed_count}.",
+            ]
 
-        try:
-            delta_bytes = int(amount_gb * (1024 ** 3))
-        except Exception:
-            return False, None
+        reply_markup = None
+        if not operation.is_undo and operation.updated_count:
+            retention_days = config.MASS_OPERATION_UNDO_RETENTION_DAYS
+            lines.append(f"Отменить начисление можно в течение {retention_days:g} дн.")
+            reply_markup = InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(
+                    text="↩️ Отменить",
+                    callback_data=MassUndoCallback(operation_id=operation.id).pack()
+                )
+            ]])
+        await self.message_sender.send_message(
+            operation.created_by,
+            "\n".join(lines),
+            priority=SendPriority.NOTIFICATION,
+            reply_markup=reply_markup,
+        )
 
-        current_limit = user.get("data_limit") or 0
-        try:
-            current_limit = int(current_limit)
-        except Exception:
-            current_limit = 0
+        # Пользователей уведомляем только о прибавке, как при начислении одному пользователю
+        if not operation.is_undo and operation.amount > 0 and operation.updated_count:
+            await self._notify_mass_grant_users(operation)
+
+    async def _notify_mass_grant_users(self, operation: MassOperation):
+        amount_text = format(operation.amount, "g")
+        messages: Dict[str, str] = {}
+        for username, value in await self.mass_operation_service.get_changed_users(operation.id):
+            if operation.kind == "hours":
+                messages[username] = (
+                    f"🎁 Вам добавлено {amount_text} ч. бесплатного времени!\n"
+                    f"Новый срок действия: {self._format_expire(value)}"
+                )
+            else:
+                messages[username] = (
+                    f"🎁 Вам добавлено {amount_text} ГБ бесплатного трафика!\n"
+                    f"Теперь доступно: {self._format_data_limit(value)}"
+                )
+        notified = await self._notify_users_bonus(messages)
+        logger.info(f"Начисление #{operation.id}: уведомлено пользователей {notified} из {len(messages)}")
 
-        new_limit = max(current_limit + max(delta_bytes, 0), 0)
-        try:
-            await self.marzban_client.modify_user(username, {"data_limit": new_limit})
-        except Exception as e:
-            logger.error(f"Не удалось обновить лимит пользователя {username}: {e}")
-            return False, None
+    @staticmethod
+    def _format_grant_plan(plan: MassGrantPlan) -> str:
+        if plan.kind == "hours":
+            title = f"⏰ <b>Изменение срока подписки на {plan.amount:+g} ч</b>"
+            ineligible = "Без срока (не затрагиваются)"
+            clamped = "Срок сократится только до текущего момента"
+            distribution = "Остаток срока"
+        else:
+            title = f"💽 <b>Изменение лимита трафика на {plan.amount:+g} ГБ</b>"
+            ineligible = "Без лимита (не затрагиваются)"
+            clamped = "Лимит сократится только до израсходованного"
+            distribution = "Остаток трафика"
 
-        return True, new_limit
+        lines = [
+            title,
+            "",
+            f"Пользователей в панели: {plan.total}",
+            f"Будет изменено: <b>{plan.changed}</b>",
+            f"Без изменений: {plan.unchanged}",
+            f"{ineligible}: {plan.ineligible}",
+        ]
+        if plan.clamped:
+            lines.append(f"{clamped}: {plan.clamped}")
+        lines.extend(["", f"<b>{distribution}</b>: до → после"])
+        for label, before, after in zip(plan.buckets, plan.before, plan.after):
+            lines.append(f"• {html.escape(label)}: {before} → {after}")
+        return "\n".join(lines)
+
+    async def _ask_bulk_confirmation(self, callback: CallbackQuery, text: str, confirm_callback: str):
+        await callback.message.edit_text(
+            text,
+            parse_mode="HTML",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="✅ Да", callback_data=confirm_callback),
+                InlineKeyboardButton(text="❌ Нет", callback_data="admin_users"),
+            ]])
+        )
+        await callback.answer()
 
-    async def _notify_user_bonus(self, bot, username: str, message_text: str) -> bool:
-        telegram_id = None
+    async def _run_bulk_operation(self, callback: CallbackQuery, operation, result_text: str):
+        """Выполняет массовую операцию панели и показывает число затронутых пользователей и время"""
+        await callback.answer()
+        await callback.message.edit_text("⏳ Операция выполняется…")
 
+        started = time.monotonic()
         try:
-            user = await self.user_service.get_user_by_marzban_username(username)
+            count, errors, per_user = await operation(page_size=max(50, self.users_page_limit))
         except Exception as e:
-            logger.error(f"Не удалось получить Telegram пользователя {username}: {e}")
-            user = None
+            logger.error(f"Ошибка массовой операции: {e}")
+            await callback.message.edit_text(
+                "❌ Не удалось выполнить операцию. Попробуйте позже.",
+                reply_markup=get_admin_users_keyboard()
+            )
+            return
+        finally:
+            self.page_cache.invalidate("users")
+        elapsed = time.monotonic() - started
 
-        if user and user.telegram_id:
-            telegram_id = user.telegram_id
-        else:
-            try:
-                marzban_user = await self.marzban_client.get_user(username)
-                if marzban_user and marzban_user.get("telegram_id"):
-                    telegram_id = marzban_user.get("telegram_id")
-            except Exception as e:
-                logger.error(f"Не удалось получить данные пользователя {username} из Marzban: {e}")
+        lines = [result_text.format(count=count) + f" за {elapsed:.1f} с."]
+        if per_user:
+            lines.append("ℹ️ Панель не поддерживает массовый метод, операция выполнена по одному пользователю.")
+        if errors:
+            lines.append(f"⚠️ Ошибок: {errors}")
+        await callback.message.edit_text("\n".join(lines), reply_markup=get_admin_users_keyboard())
 
-        if not telegram_id:
-            return False
+    async def _show_users_menu_from_message(self, message: Message):
+        await message.answer(
+            "Выберите дальнейшее действие:",
+            reply_markup=get_admin_users_keyboard()
+        )
 
+    async def _notify_user_bonus(self, username: str, message_text: str) -> bool:
+        return await self._notify_users_bonus({username: message_text}) > 0
+
+    async def _notify_users_bonus(self, messages: Dict[str, str]) -> int:
+        """
+        Уведомляет пользователей Marzban о начислении, возвращает число отправленных.
+
+        Telegram ID определяются пачкой (один запрос к базе, панель — только
+        для ненайденных), сообщения отправляются через общий планировщик.
+        """
+        usernames = list(messages)
+        notified = 0
+        for start in range(0, len(usernames), self.BONUS_NOTIFY_BATCH):
+            batch = usernames[start:start + self.BONUS_NOTIFY_BATCH]
+            telegram_ids = await self.telegram_ids.resolve(batch)
+            results = await asyncio.gather(*(
+                self._send_bonus_notification(username, telegram_id, messages[username])
+                for username, telegram_id in telegram_ids.items()
+            ))
+            notified += sum(results)
+        return notified
+
+    async def _send_bonus_notification(self, username: str, telegram_id: int, message_text: str) -> bool:
         try:
-            await bot.send_message(int(telegram_id), message_text)
+            await self.message_sender.send_message(
+                int(telegram_id), message_text, priority=SendPriority.NOTIFICATION
+            )
             return True
         except Exception as e:
             logger.error(f"Не удалось отправить уведомление пользователю {username}: {e}")
             return False
 
-    async def _send_broadcast(self, message: Message, content: str) -> tuple[int, int]:
-        users = await self.user_service.get_all_users()
-        bot = message.bot
-        sent = 0
-        failed = 0
-
-        for user in users:
-            if not user.telegram_id:
-                continue
-            try:
-                await bot.send_message(user.telegram_id, content)
-                sent += 1
-            except Exception as e:
-                failed += 1
-                logger.error(f"Не удалось отправить сообщение {user.telegram_id}: {e}")
-
-        return sent, failed
-
 
     async def _process_user_edit_status(self, message: Message, state: FSMContext):
         text = message.text or ""
@@ -1895,6 +2361,7 @@ class AdminHandlers(BaseHandler):
             await state.clear()
             return
 
+        self.page_cache.invalidate("users")
         await state.clear()
         await message.answer("✅ Изменения сохранены.")
         await self._send_user_details_message(message, username, page)
@@ -1905,7 +2372,13 @@ class AdminHandlers(BaseHandler):
             "⚠️ <b>Удаление пользователя</b> <code>{}</code>\n\n"
             "Это действие нельзя отменить. Подтвердите удаление.".format(html.escape(username)),
             parse_mode="HTML",
-            reply_markup=get_confirmation_keyboard("delete_user", f"{username}:{page}")
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(
+                    text="✅ Да",
+                    callback_data=UserDeleteConfirmCallback(username=username, page=page).pack()
+                ),
+                InlineKeyboardButton(text="❌ Нет", callback_data="users_delete_cancel"),
+            ]])
         )
         await callback.answer()
 
@@ -1917,6 +2390,7 @@ class AdminHandlers(BaseHandler):
             await callback.answer("❌ Не удалось удалить пользователя", show_alert=True)
             return
 
+        self.page_cache.invalidate("users")
         await state.clear()
         await callback.answer("✅ Пользователь удален")
         await self._show_users_list(callback, page)
@@ -1939,14 +2413,17 @@ class AdminHandlers(BaseHandler):
             "⚠️ <b>Удаление администратора</b> <code>{}</code>\n\n"
             "Подтвердите удаление.".format(html.escape(username)),
             parse_mode="HTML",
-            reply_markup=get_confirmation_keyboard("delete_admin", username)
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(
+                    text="✅ Да",
+                    callback_data=AdminDeleteConfirmCallback(username=username, page=page).pack()
+                ),
+                InlineKeyboardButton(text="❌ Нет", callback_data="admins_delete_cancel"),
+            ]])
         )
         await callback.answer()
 
-    async def _delete_admin(self, callback: CallbackQuery, state: FSMContext, username: str):
-        data = await state.get_data()
-        context = data.get("pending_delete_admin")
-        page = context.get("page", 0) if context else 0
+    async def _delete_admin(self, callback: CallbackQuery, state: FSMContext, username: str, page: int):
         try:
             await self.marzban_client.delete_admin(username)
         except Exception as e:
@@ -1954,6 +2431,7 @@ class AdminHandlers(BaseHandler):
             await callback.answer("❌ Не удалось удалить администратора", show_alert=True)
             return
 
+        self.page_cache.invalidate("admins")
         await state.clear()
         await callback.answer("✅ Администратор удален")
         await self._show_admins_list(callback, page)
@@ -1973,35 +2451,30 @@ class AdminHandlers(BaseHandler):
 
     def _format_ticket_details_for_admin(self, ticket) -> str:
         """Формирует текст с деталями тикета для администратора"""
-        created = ticket.created_at.strftime('%d.%m.%Y %H:%M') if ticket.created_at else '—'
-        updated = ticket.updated_at.strftime('%d.%m.%Y %H:%M') if ticket.updated_at else '—'
-        status_icon = '🟢' if ticket.status == 'open' else '🔴'
-        user_name = html.escape(ticket.user_name) if ticket.user_name else '—'
-        message_text = html.escape(ticket.message or '—')
-        response_text = html.escape(ticket.response or '—')
-
-        details = [
-            f"<b>Тикет #{ticket.id}</b>",
-            f"{status_icon} Статус: <b>{ticket.status.upper()}</b>",
-            f"👤 Telegram ID: <code>{ticket.user_id}</code>",
-            f"👥 Пользователь: {user_name}",
-            f"📅 Создан: {created}",
-            f"🔄 Обновлен: {updated}",
-            "",
-            "💬 Сообщение:",
-            message_text,
-        ]
-
-        if ticket.response:
-            details.extend(["", "📣 Ответ поддержки:", response_text])
-
-        return "\n".join(details)
+        return templates.ADMIN_TICKET_DETAILS.render(
+            ticket_id=ticket.id,
+            icon='🟢' if ticket.status == 'open' else '🔴',
+            status=ticket.status.upper(),
+            user_id=ticket.user_id,
+            user_name=ticket.user_name or '—',
+            created=format_datetime(ticket.created_at),
+            updated=format_datetime(ticket.updated_at),
+            message=ticket.message or '—',
+            response=templates.ADMIN_TICKET_RESPONSE.render(response=ticket.response) if ticket.response else '',
+        )
 
     # Остальные методы остаются без изменений
     async def _show_system_stats(self, callback: CallbackQuery):
         """Показ системной статистики"""
         try:
-            stats = await self.marzban_client.get_system_stats()
+            results = await gather_partial(
+                {
+                    "stats": self.marzban_client.get_system_stats(),
+                    "analytics": self.analytics_service.get_user_analytics(),
+                },
+                timeout=config.ADMIN_GATHER_TIMEOUT,
+            )
+            stats = results.get("stats") or {}
 
             def _get_stat(*keys):
                 for key in keys:
@@ -2056,6 +2529,15 @@ class AdminHandlers(BaseHandler):
             def _format_users(value):
                 return str(int(value)) if isinstance(value, (int, float)) else "—"
 
+            sender_stats = self.message_sender.stats()
+            payment_stats = self.fulfillment_service.stats()
+            lock_stats = self.subscription_service.user_locks.stats()
+
+            def _format_latency(summary):
+                if not summary["count"]:
+                    return "нет данных"
+                return f"p50 {summary['p50']:.2f} с, p95 {summary['p95']:.2f} с"
+
             message = (
                 "📊 **Системная статистика**\n\n"
                 f"🖥️ **ЦП:** {cores_text} ядер\n"
@@ -2066,13 +2548,62 @@ class AdminHandlers(BaseHandler):
                 f"👥 **Всего пользователей:** {_format_users(total_users)}\n"
                 f"🟢 **Активные пользователи:** {_format_users(active_users)}\n"
                 f"⏸️ **В режиме ожидания:** {_format_users(on_hold_users)}\n"
-                f"🔴 **Неактивные пользователи:** {_format_users(disabled_users)}"
+                f"🔴 **Неактивные пользователи:** {_format_users(disabled_users)}\n\n"
+                f"📤 **Очередь отправки:** {sender_stats['queue_depth']} "
+                f"(рассылка: {sender_stats['queue_by_priority']['broadcast']})\n"
+                f"⚡ **Скорость отправки:** {sender_stats['send_rate']:.1f} сообщ./с\n"
+                f"📣 **Активных рассылок:** {self.broadcast_service.active_count}\n"
+                f"⚙️ **Массовых начислений в работе:** {self.mass_operation_service.active_count}\n\n"
+                f"💳 **Ответ на pre-checkout:** {_format_latency(payment_stats['pre_checkout_latency'])}\n"
+                f"📦 **Выдача подписки после оплаты:** {_format_latency(payment_stats['fulfillment_latency'])}\n"
+                f"⏳ **Заказов в очереди:** {payment_stats['queue_depth'] + payment_stats['retrying']}, "
+                f"выдано: {payment_stats['fulfilled_total']}, ошибок: {payment_stats['failed_total']}, "
+                f"на проверке: {payment_stats['review_total']}\n"
+                f"🔒 **Ожиданий блокировки пользователя:** {lock_stats['contended_total']} "
+                f"из {lock_stats['acquired_total']}, среднее {lock_stats['wait_avg']:.2f} с, "
+                f"макс. {lock_stats['wait_max']:.2f} с"
             )
+            analytics = results.get("analytics")
+            if analytics is not None and analytics.total:
+                message += "\n\n" + self._format_user_analytics(analytics)
+            if "stats" in results.missing:
+                message += "\n\n⚠️ Панель Marzban не ответила, показаны только данные бота."
 
             await callback.message.edit_text(message, parse_mode="Markdown")
 
         except Exception as e:
             await callback.message.edit_text(f"❌ Ошибка получения статистики: {str(e)}")
+
+    SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+
+    @classmethod
+    def _format_user_analytics(cls, analytics: UserAnalytics) -> str:
+        """Блок распределений по снимкам подписок для системной статистики (Markdown)"""
+        per_day = analytics.expiring_per_day
+        peak = max(per_day) if per_day else 0
+        sparkline = "".join(
+            cls.SPARKLINE_BLOCKS[min(len(cls.SPARKLINE_BLOCKS) - 1, count * len(cls.SPARKLINE_BLOCKS) // (peak + 1))]
+            for count in per_day
+        )
+        segments = analytics.segments
+        lines = [
+            f"📊 **Пользовательская база** (снимков: {analytics.total})",
+            f"📅 **Истекает:** сутки — {sum(per_day[:1])}, 7 дн. — {sum(per_day[:7])}, "
+            f"30 дн. — {sum(per_day)}",
+            f"`{sparkline}`",
+        ]
+        if analytics.usage_percentiles:
+            percentiles = " / ".join(f"{value:g}%" for value in analytics.usage_percentiles.values())
+            labels = "/".join(f"p{p}" for p in analytics.usage_percentiles)
+            lines.append(f"📶 **Расход трафика ({labels}):** {percentiles}")
+        lines.extend([
+            f"⚠️ **Близко к лимиту (≥80%):** {analytics.near_limit} из {analytics.limited_users} "
+            f"({analytics.near_limit_share:.0%})",
+            f"💰 **Сегменты:** месячные {segments['monthly_active']}, трафиковые {segments['traffic_active']}, "
+            f"продление ≤7 дн. {segments['renewal_due']}, докупка трафика {segments['upsell_near_limit']}, "
+            f"вернуть (expired/limited) {segments['winback']}",
+        ])
+        return "\n".join(lines)
 
     async def _show_users_menu(self, callback: CallbackQuery):
         """Меню управления пользователями"""
@@ -2103,85 +2634,112 @@ class AdminHandlers(BaseHandler):
     async def _show_users_list(self, callback: CallbackQuery, page: int):
         """Показ списка пользователей с пагинацией"""
         try:
-            per_page = self.users_page_limit
-            offset = page * per_page
-            response = await self.marzban_client.get_users(offset=offset, limit=per_page + 1)
-            users = response.get("users", [])
+            owner = callback.from_user.id
+            rendered = self.page_cache.get(owner, "users", page)
+            if rendered is None:
+                rendered = await self._render_users_page(page)
+                if rendered is None and page > 0:
+                    await self._show_users_list(callback, page - 1)
+                    return
+                if rendered is None:
+                    await callback.message.edit_text(
+                        "📭 Пользователи не найдены",
+                        reply_markup=get_admin_users_keyboard()
+                    )
+                    await callback.answer()
+                    return
+                self.page_cache.put(owner, "users", page, rendered)
 
-            if not users and page > 0:
-                await self._show_users_list(callback, page - 1)
-                return
+            await callback.message.edit_text(
+                rendered.text,
+                parse_mode="HTML",
+                reply_markup=rendered.markup
+            )
+            await callback.answer()
+            self.page_cache.prefetch(owner, "users", self._adjacent_pages(page, rendered), self._render_users_page)
+        except Exception as e:
+            await callback.message.edit_text(f"❌ Ошибка получения пользователей: {str(e)}")
 
-            has_next = len(users) > per_page
-            display_users = users[:per_page]
+    async def _render_users_page(self, page: int) -> Optional[CachedPage]:
+        """Загружает страницу списка пользователей из Marzban; None — страница пуста"""
+        per_page = self.users_page_limit
+        offset = page * per_page
+        response = await self.marzban_client.get_users(offset=offset, limit=per_page + 1)
+        users = response.get("users", [])
 
-            if not display_users:
-                await callback.message.edit_text(
-                    "📭 Пользователи не найдены",
-                    reply_markup=get_admin_users_keyboard()
-                )
-                await callback.answer()
-                return
+        has_next = len(users) > per_page
+        display_users = users[:per_page]
+        if not display_users:
+            return None
 
-            total = response.get("total", offset + len(display_users) + (1 if has_next else 0))
-            current_from = offset + 1
-            current_to = offset + len(display_users)
+        total = response.get("total", offset + len(display_users) + (1 if has_next else 0))
+        current_from = offset + 1
+        current_to = offset + len(display_users)
+
+        lines = ["<b>👤 Список пользователей</b>", ""]
+        for user in display_users:
+            username = html.escape(user.get("username", "N/A"))
+            status = self._format_status(user.get("status"))
+            expire_text = self._format_expire(user.get("expire"))
+            lines.append(f"<b>{status}</b> — <code>{username}</code>")
+            lines.append(f"⏳ {expire_text}")
+            lines.append("")
+
+        lines.append(
+            f"Показаны {current_from}–{current_to} из {total}"
+        )
 
-            lines = ["<b>👤 Список пользователей</b>", ""]
-            for user in display_users:
-                username = html.escape(user.get("username", "N/A"))
-                status = self._format_status(user.get("status"))
-                expire_text = self._format_expire(user.get("expire"))
-                lines.append(f"<b>{status}</b> — <code>{username}</code>")
-                lines.append(f"⏳ {expire_text}")
-                lines.append("")
+        keyboard_rows: List[List[InlineKeyboardButton]] = []
+        for user in display_users:
+            username = user.get("username", "")
+            keyboard_rows.append([
+                InlineKeyboardButton(
+                    text=f"ℹ️ {username}",
+                    callback_data=f"users_view:{username}:{page}"
+                )
+            ])
 
-            lines.append(
-                f"Показаны {current_from}–{current_to} из {total}"
+        nav_buttons: List[InlineKeyboardButton] = []
+        if page > 0:
+            nav_buttons.append(
+                InlineKeyboardButton(text="⬅️ Назад", callback_data=f"users_list:{page - 1}")
             )
+        if has_next:
+            nav_buttons.append(
+                InlineKeyboardButton(text="Вперед ➡️", callback_data=f"users_list:{page + 1}")
+            )
+        if nav_buttons:
+            keyboard_rows.append(nav_buttons)
 
-            keyboard_rows: List[List[InlineKeyboardButton]] = []
-            for user in display_users:
-                username = user.get("username", "")
-                keyboard_rows.append([
-                    InlineKeyboardButton(
-                        text=f"ℹ️ {username}",
-                        callback_data=f"users_view:{username}:{page}"
-                    )
-                ])
-
-            nav_buttons: List[InlineKeyboardButton] = []
-            if page > 0:
-                nav_buttons.append(
-                    InlineKeyboardButton(text="⬅️ Назад", callback_data=f"users_list:{page - 1}")
-                )
-            if has_next:
-                nav_buttons.append(
-                    InlineKeyboardButton(text="Вперед ➡️", callback_data=f"users_list:{page + 1}")
-                )
-            if nav_buttons:
-                keyboard_rows.append(nav_buttons)
+        keyboard_rows.append([
+            InlineKeyboardButton(text="🔙 Меню пользователей", callback_data="admin_users")
+        ])
 
-            keyboard_rows.append([
-                InlineKeyboardButton(text="🔙 Меню пользователей", callback_data="admin_users")
-            ])
+        return CachedPage("\n".join(lines), InlineKeyboardMarkup(inline_keyboard=keyboard_rows), has_next)
 
-            await callback.message.edit_text(
-                "\n".join(lines),
-                parse_mode="HTML",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
-            )
-            await callback.answer()
-        except Exception as e:
-            await callback.message.edit_text(f"❌ Ошибка получения пользователей: {str(e)}")
+    @staticmethod
+    def _adjacent_pages(page: int, rendered: CachedPage) -> List[int]:
+        pages = [page + 1] if rendered.has_next else []
+        if page > 0:
+            pages.append(page - 1)
+        return pages
 
     async def _compose_user_details(self, username: str, page: int) -> Optional[tuple[str, InlineKeyboardMarkup]]:
         """Формирует текст и клавиатуру с информацией о пользователе"""
-        user = await self.marzban_client.get_user(username)
+        results = await gather_partial(
+            {
+                "user": self.marzban_client.get_user(username),
+                "tg_user": self.user_service.get_user_by_marzban_username(username),
+            },
+            timeout=config.ADMIN_GATHER_TIMEOUT,
+        )
+        if "user" in results.missing:
+            raise RuntimeError("панель Marzban не ответила")
+        user = results.get("user")
         if not user:
             return None
 
-        tg_user = await self.user_service.get_user_by_marzban_username(username)
+        tg_user = results.get("tg_user")
         telegram_id = None
         if tg_user and tg_user.telegram_id:
             telegram_id = tg_user.telegram_id
@@ -2622,76 +3180,87 @@ class AdminHandlers(BaseHandler):
     async def _show_admins_list(self, callback: CallbackQuery, page: int):
         """Показ списка администраторов"""
         try:
-            per_page = self.admins_page_limit
-            offset = page * per_page
-            admins = await self.marzban_client.get_admins(offset=offset, limit=per_page + 1)
-
-            if not admins and page > 0:
-                await self._show_admins_list(callback, page - 1)
-                return
-
-            has_next = len(admins) > per_page
-            display_admins = admins[:per_page]
-
-            if not display_admins:
-                await callback.message.edit_text(
-                    "📭 Администраторы не найдены",
-                    reply_markup=get_admin_admins_keyboard()
-                )
-                await callback.answer()
-                return
-
-            current_from = offset + 1
-            current_to = offset + len(display_admins)
-            total = offset + len(display_admins) + (1 if has_next else 0)
-
-            lines = ["<b>👥 Список администраторов</b>", ""]
-            for admin in display_admins:
-                username = html.escape(admin.get("username", "N/A"))
-                role = "🔧 Супер-админ" if admin.get("is_sudo") else "👤 Админ"
-                lines.append(f"{role}: <code>{username}</code>")
-                telegram_id = admin.get("telegram_id")
-                if telegram_id:
-                    lines.append(f"🆔 Telegram ID: <code>{telegram_id}</code>")
-                lines.append("")
-
-            lines.append(f"Показаны {current_from}–{current_to} из {total}")
-
-            keyboard_rows: List[List[InlineKeyboardButton]] = []
-            for admin in display_admins:
-                username = admin.get("username", "")
-                keyboard_rows.append([
-                    InlineKeyboardButton(
-                        text=f"ℹ️ {username}",
-                        callback_data=f"admin_manage:{username}:{page}"
+            owner = callback.from_user.id
+            rendered = self.page_cache.get(owner, "admins", page)
+            if rendered is None:
+                rendered = await self._render_admins_page(page)
+                if rendered is None and page > 0:
+                    await self._show_admins_list(callback, page - 1)
+                    return
+                if rendered is None:
+                    await callback.message.edit_text(
+                        "📭 Администраторы не найдены",
+                        reply_markup=get_admin_admins_keyboard()
                     )
-                ])
-
-            nav_buttons: List[InlineKeyboardButton] = []
-            if page > 0:
-                nav_buttons.append(
-                    InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admins_list:{page - 1}")
-                )
-            if has_next:
-                nav_buttons.append(
-                    InlineKeyboardButton(text="Вперед ➡️", callback_data=f"admins_list:{page + 1}")
-                )
-            if nav_buttons:
-                keyboard_rows.append(nav_buttons)
-
-            keyboard_rows.append([
-                InlineKeyboardButton(text="🔙 Меню администраторов", callback_data="admin_admins")
-            ])
+                    await callback.answer()
+                    return
+                self.page_cache.put(owner, "admins", page, rendered)
 
             await callback.message.edit_text(
-                "\n".join(lines),
+                rendered.text,
                 parse_mode="HTML",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
+                reply_markup=rendered.markup
             )
             await callback.answer()
+            self.page_cache.prefetch(owner, "admins", self._adjacent_pages(page, rendered), self._render_admins_page)
         except Exception as e:
             await callback.message.edit_text(f"❌ Ошибка получения администраторов: {str(e)}")
 
+    async def _render_admins_page(self, page: int) -> Optional[CachedPage]:
+        """Загружает страницу списка администраторов из Marzban; None — страница пуста"""
+        per_page = self.admins_page_limit
+        offset = page * per_page
+        admins = await self.marzban_client.get_admins(offset=offset, limit=per_page + 1)
+
+        has_next = len(admins) > per_page
+        display_admins = admins[:per_page]
+        if not display_admins:
+            return None
+
+        current_from = offset + 1
+        current_to = offset + len(display_admins)
+        total = offset + len(display_admins) + (1 if has_next else 0)
+
+        lines = ["<b>👥 Список администраторов</b>", ""]
+        for admin in display_admins:
+            username = html.escape(admin.get("username", "N/A"))
+            role = "🔧 Супер-админ" if admin.get("is_sudo") else "👤 Админ"
+            lines.append(f"{role}: <code>{username}</code>")
+            telegram_id = admin.get("telegram_id")
+            if telegram_id:
+                lines.append(f"🆔 Telegram ID: <code>{telegram_id}</code>")
+            lines.append("")
+
+        lines.append(f"Показаны {current_from}–{current_to} из {total}")
+
+        keyboard_rows: List[List[InlineKeyboardButton]] = []
+        for admin in display_admins:
+            username = admin.get("username", "")
+            keyboard_rows.append([
+                InlineKeyboardButton(
+                    text=f"ℹ️ {username}",
+                    callback_data=f"admin_manage:{username}:{page}"
+                )
+            ])
+
+        nav_buttons: List[InlineKeyboardButton] = []
+        if page > 0:
+            nav_buttons.append(
+                InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admins_list:{page - 1}")
+            )
+        if has_next:
+            nav_buttons.append(
+                InlineKeyboardButton(text="Вперед ➡️", callback_data=f"admins_list:{page + 1}")
+            )
+        if nav_buttons:
+            keyboard_rows.append(nav_buttons)
+
+        keyboard_rows.append([
+            InlineKeyboardButton(text="🔙 Меню администраторов", callback_data="admin_admins")
+        ])
+
+        return CachedPage("\n".join(lines), InlineKeyboardMarkup(inline_keyboard=keyboard_rows), has_next)
+
     async def _show_nodes_list(self, callback: CallbackQuery):
         """Показ списка узлов"""
         try:
@@ -2702,7 +3271,7 @@ class AdminHandlers(BaseHandler):
                 message += "Пока нет доступных узлов."
             else:
                 for node in nodes:
-                    status = "🟢 Онлайн" if node.get('status', 'healthy') == 'healthy' else "🔴 Офлайн"
+                    status = "🟢 Онлайн" if self._is_node_online(node) else "🔴 Офлайн"
                     message += f"{status} {node.get('name', 'N/A')}\n"
                     message += f"   📍 {node.get('address', 'N/A')}\n"
                     message += f"   👥 Пользователей: {node.get('user_count', 0)}\n\n"
@@ -2721,6 +3290,77 @@ class AdminHandlers(BaseHandler):
         except Exception as e:
             await callback.message.edit_text(f"❌ Ошибка получения узлов: {str(e)}")
 
+    @staticmethod
+    def _is_node_online(node: Dict[str, Any]) -> bool:
+        return node.get('status', 'healthy') in ('healthy', 'connected')
+
+    async def _show_dashboard(self, callback: CallbackQuery):
+        """Сводка: панель, узлы, тикеты и очереди бота, собранные одним параллельным запросом"""
+        results = await gather_partial(
+            {
+                "stats": self.marzban_client.get_system_stats(),
+                "nodes": self.marzban_client.get_nodes(),
+                "tickets": self.support_service.get_ticket_counts(),
+            },
+            timeout=config.ADMIN_GATHER_TIMEOUT,
+        )
+        no_answer = "⚠️ нет ответа"
+        lines = ["<b>🧭 Сводка</b>", ""]
+
+        stats = results.get("stats")
+        if stats is None:
+            lines.append(f"📈 Панель: {no_answer}")
+        else:
+            cpu_usage = stats.get("cpu_usage")
+            cpu_text = f"{float(cpu_usage):.1f}%" if isinstance(cpu_usage, (int, float)) else "—"
+            ram_total, ram_usage = stats.get("ram_total"), stats.get("ram_usage")
+            if isinstance(ram_total, (int, float)) and isinstance(ram_usage, (int, float)) and ram_total:
+                ram_text = f"{ram_usage / ram_total * 100:.1f}%"
+            else:
+                ram_text = "—"
+            lines.append(f"📈 Панель: ЦП {cpu_text}, ОЗУ {ram_text}")
+            lines.append(
+                f"👥 Пользователи: {stats.get('total_users') or 0}, "
+                f"активных {stats.get('active_users') or 0}"
+            )
+
+        nodes = results.get("nodes")
+        if nodes is None:
+            lines.append(f"🌐 Узлы: {no_answer}")
+        else:
+            offline = [node for node in nodes if not self._is_node_online(node)]
+            lines.append(f"🌐 Узлы: {len(nodes) - len(offline)} из {len(nodes)} онлайн")
+            for node in offline[:5]:
+                lines.append(f"   🔴 {html.escape(str(node.get('name', 'N/A')))}")
+            if len(offline) > 5:
+                lines.append(f"   …и еще {len(offline) - 5}")
+
+        tickets = results.get("tickets")
+        if tickets is None:
+            lines.append(f"🆘 Тикеты: {no_answer}")
+        else:
+            lines.append(f"🆘 Открытых тикетов: {tickets.get('open', 0)} из {sum(tickets.values())}")
+
+        sender_stats = self.message_sender.stats()
+        payment_stats = self.fulfillment_service.stats()
+        lines.append(f"📤 Очередь отправки: {sender_stats['queue_depth']}")
+        lines.append(f"⏳ Заказов в очереди: {payment_stats['queue_depth'] + payment_stats['retrying']}")
+
+        lines.append("")
+        if results.missing:
+            lines.append(f"Часть данных не получена за {config.ADMIN_GATHER_TIMEOUT:g} с.")
+        lines.append(f"Обновлено: {datetime.now().strftime('%H:%M:%S')}")
+
+        await callback.message.edit_text(
+            "\n".join(lines),
+            parse_mode="HTML",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_dashboard")],
+                [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back")],
+            ])
+        )
+        await callback.answer()
+
     async def _compose_admin_details(self, username: str, page: int) -> Optional[tuple[str, InlineKeyboardMarkup]]:
         admin = await self.marzban_client.get_admin(username)
         if not admin:
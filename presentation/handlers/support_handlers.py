@@ -11,8 +11,8 @@ from presentation.keyboards import (
     get_user_main_keyboard
 )
 from domain.services.support_service import SupportService
+from domain.services.ticket_alert_service import TicketAlertService
 from core.security import can_access_support_tickets
-from core.config import config
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,8 +24,9 @@ class SupportStates(StatesGroup):
 
 
 class SupportHandlers(BaseHandler):
-    def __init__(self, support_service: SupportService):
+    def __init__(self, support_service: SupportService, ticket_alert_service: TicketAlertService):
         self.support_service = support_service
+        self.ticket_alert_service = ticket_alert_service
         super().__init__()
 
     def _register_handlers(self):
@@ -97,12 +98,8 @@ class SupportHandlers(BaseHandler):
                     return
                 admin_message = await self.support_service.format_support_message_for_admin(user_id, user_name, message_text)
 
-                recipients = set(config.ADMIN_TG_IDS + config.SUPPORT_TG_IDS)
-                for recipient in recipients:
-                    try:
-                        await callback.bot.send_message(chat_id=recipient, text=admin_message)
-                    except Exception as e:
-                        logger.error(f"Не удалось отправить сообщение саппорту {recipient}: {e}")
+                # Уведомления рассылаются в фоне, пользователь не ждет доставки
+                self.ticket_alert_service.notify_new_ticket(ticket, admin_message)
 
                 await callback.message.edit_text(
                     f"✅ Ваше сообщение отправлено. Номер обращения: #{ticket.id}",
@@ -1,8 +1,8 @@
 # presentation/handlers/user_handlers.py
 import html
 import logging
+import time
 from typing import Optional, Callable, Awaitable
-from urllib.parse import quote
 from aiogram import F
 from aiogram.types import (
     Message,
@@ -17,6 +17,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from presentation.handlers.base import BaseHandler
+from presentation import templates
 from presentation.keyboards.user_keyboards import get_user_main_keyboard
 from presentation.keyboards.support_keyboards import (
     get_user_support_menu_keyboard,
@@ -25,8 +26,12 @@ from presentation.keyboards.support_keyboards import (
 from domain.services.subscription_service import SubscriptionService
 from domain.services.user_service import UserService
 from domain.services.support_service import SupportService
+from domain.services.fulfillment_service import FulfillmentService
 from domain.models.subscription import SubscriptionResult
+from domain.models.payment import PaymentOrder
+from infrastructure.telegram import MessageSender, SendPriority
 from core.config import config
+from core.templates import format_datetime
 import datetime
 
 
@@ -77,10 +82,20 @@ def detect_subscription_type(subscription_info) -> Optional[str]:
 
 
 class UserHandlers(BaseHandler):
-    def __init__(self, subscription_service: SubscriptionService, user_service: UserService, support_service: SupportService):
+    def __init__(
+        self,
+        subscription_service: SubscriptionService,
+        user_service: UserService,
+        support_service: SupportService,
+        message_sender: MessageSender,
+        fulfillment_service: FulfillmentService,
+    ):
         self.subscription_service = subscription_service
         self.user_service = user_service
         self.support_service = support_service
+        self.message_sender = message_sender
+        self.fulfillment_service = fulfillment_service
+        self.fulfillment_service.set_result_handler(self._send_payment_result)
         super().__init__()
 
     @staticmethod
@@ -99,22 +114,19 @@ class UserHandlers(BaseHandler):
         if not username:
             return "—"
 
-        escaped_username = html.escape(username)
-        encoded_username = quote(username)
-        return f'<a href="tg://copy_text?text={encoded_username}"><code>{escaped_username}</code></a>'
+        return templates.COPYABLE_USERNAME.render(username=username)
 
     @staticmethod
     def _format_subscription_link(url: Optional[str]) -> str:
         if not url:
             return "нет данных"
 
-        escaped_url = html.escape(url, quote=True)
-        return f'<a href="{escaped_url}">Открыть</a>'
+        return templates.SUBSCRIPTION_LINK.render(url=url)
 
     @staticmethod
     def _extract_expire_info(expire_value) -> tuple[str, int]:
         if isinstance(expire_value, datetime.datetime):
-            expire_str = expire_value.strftime("%d.%m.%Y %H:%M")
+            expire_str = format_datetime(expire_value)
             now = datetime.datetime.utcnow()
             days_left = max(0, (expire_value - now).days)
             return expire_str, days_left
@@ -165,6 +177,10 @@ class UserHandlers(BaseHandler):
         # Команды
         self.router.message.register(self.start, CommandStart())
 
+        # 💳 Оплата Stars (до FSM: после инвойса пользователь еще в состоянии выбора)
+        self.router.pre_checkout_query.register(self.process_pre_checkout)
+        self.router.message.register(self.process_successful_payment, F.successful_payment)
+
         # Основные колбэки
         self.router.callback_query.register(self.show_plan_options, F.data == "buy_subscription")
         self.router.callback_query.register(self.handle_choose_monthly, F.data == "choose_monthly")
@@ -189,9 +205,6 @@ class UserHandlers(BaseHandler):
         self.router.message.register(self.handle_traffic_input, PurchaseStates.choosing_traffic)
         self.router.message.register(self.handle_support_message, SupportStates.waiting_for_message)
 
-        # 💳 Оплата Stars
-        self.router.pre_checkout_query.register(self.process_pre_checkout)
-
     # === /start ===
     async def start(self, message: Message):
         telegram_id = message.from_user.id
@@ -472,77 +485,160 @@ class UserHandlers(BaseHandler):
             await message.answer("❌ Введите корректное число от 1 до 100.")
 
     # === Обработка оплаты Stars ===
+    @staticmethod
+    def _validate_invoice(payload: str, total_amount: int, currency: str, user_id: int) -> Optional[str]:
+        """Проверяет заказ перед оплатой; возвращает текст ошибки или None"""
+        try:
+            plan, quantity, telegram_id = PaymentOrder.parse_payload(payload)
+        except ValueError:
+            return "Некорректный заказ. Оформите покупку заново."
+
+        if telegram_id != user_id:
+            return "Заказ оформлен для другого пользователя."
+
+        if plan == "monthly":
+            max_quantity, unit_price = 12, config.STAR_PRICE_PER_MONTH
+        else:
+            max_quantity, unit_price = 100, config.STAR_PRICE_PER_GB
+        if not 1 <= quantity <= max_quantity:
+            return "Некорректный объем заказа. Оформите покупку заново."
+        if currency != "XTR" or total_amount != quantity * unit_price:
+            return "Цена изменилась. Оформите покупку заново."
+        return None
+
     async def process_pre_checkout(self, query: PreCheckoutQuery):
+        """Только проверяет заказ: подписка выдается после successful_payment"""
+        started = time.perf_counter()
         payload = query.invoice_payload
         logger.info(f"💳 Pre-checkout Stars: {payload}")
-        await query.answer(ok=True)
-
-        try:
-            plan, value, user_id = payload.split(":")
-            user_id = int(user_id)
-            value = int(value)
-
-            if plan == "monthly":
-                logger.info(f"🕒 Создание месячной подписки: {value} мес. для {user_id}")
-                result = await self.subscription_service.purchase_monthly_subscription(user_id, value)
-                plan_name = f"на {value} мес."
-            else:
-                logger.info(f"💾 Создание тарифного пакета: {value} ГБ для {user_id}")
-                result = await self.subscription_service.purchase_gb_subscription(user_id, value)
-                plan_name = f"{value} ГБ"
-
-            if result.success:
-                info = result.subscription_info
-
-                sub_type = "traffic" if getattr(info, "data_limit_gb", 0) else "monthly"
-                msg = "🎉 Ваша подписка активирована!\n\n"
-                username_link = self._format_copyable_username(info.username)
-                subscription_link = self._format_subscription_link(info.subscription_url)
-
-                if sub_type == "monthly":
-                    expire_raw, days_left = self._extract_expire_info(info.expire_date)
-                    expire_str = html.escape(expire_raw)
-                    msg += (
-                        "📅 Тип: Месячная\n"
-                        f"⏳ Осталось: {days_left} дн.\n"
-                        f"📆 До: {expire_str}\n\n"
-                        f"👤 Пользователь: {username_link}\n"
-                        f"📎 Ссылка: {subscription_link}\n\n"
-                        "💎 Спасибо, что пользуетесь нашим сервисом!"
-                    )
 
-                else:
-                    used = getattr(info, "used_traffic_gb", 0) or 0
-                    total = getattr(info, "data_limit_gb", 0) or 0
-                    percent = round((used / total) * 100, 1) if total > 0 else 0
-                    percent = min(percent, 100)
-
-                    msg += (
-                        "💾 Тип: По трафику\n"
-                        f"📊 Использовано: {used:.2f} ГБ / {total:.2f} ГБ ({percent}%)\n\n"
-                        f"👤 Пользователь: {username_link}\n"
-                        f"📎 Ссылка: {subscription_link}\n\n"
-                        "💎 Спасибо, что пользуетесь нашим сервисом!"
-                    )
+        error = self._validate_invoice(payload, query.total_amount, query.currency, query.from_user.id)
+        if error:
+            logger.warning(f"Pre-checkout отклонен ({payload}): {error}")
+            await query.answer(ok=False, error_message=error)
+        else:
+            await query.answer(ok=True)
+        self.fulfillment_service.record_pre_checkout(time.perf_counter() - started)
 
-                await query.bot.send_message(
-                    user_id,
-                    msg,
-                    reply_markup=get_user_main_keyboard(user_id),
-                    parse_mode="HTML",
-                )
+    async def process_successful_payment(self, message: Message):
+        """Записывает оплату в очередь выдачи и сразу отвечает покупателю"""
+        payment = message.successful_payment
+        logger.info(f"💰 Оплата Stars: {payment.invoice_payload}, charge {payment.telegram_payment_charge_id}")
 
-            else:
-                await query.bot.send_message(
-                    user_id,
-                    f"⚠️ Оплата прошла, но подписку не удалось активировать.\nОшибка: {result.error_message}",
-                )
+        try:
+            plan, quantity, telegram_id = PaymentOrder.parse_payload(payment.invoice_payload)
+            order, created = await self.fulfillment_service.submit(PaymentOrder(
+                telegram_id=telegram_id,
+                plan=plan,
+                quantity=quantity,
+                amount=payment.total_amount,
+                currency=payment.currency,
+                payload=payment.invoice_payload,
+                charge_id=payment.telegram_payment_charge_id,
+            ))
+        except Exception as e:
+            logger.exception(f"Не удалось записать оплату {payment.telegram_payment_charge_id}: {e}")
+            await message.answer(
+                "⚠️ Оплата получена, но заказ не удалось зарегистрировать. "
+                "Обратитесь в техническую поддержку — мы активируем подписку вручную."
+            )
+            return
 
-        except Exception as e:
-            logger.exception(f"Ошибка при создании подписки после оплаты: {e}")
-            await query.bot.send_message(
-                query.from_user.id, "❌ Произошла ошибка при активации подписки. Мы уже разбираемся."
-            )
+        if not created:
+            await message.answer(f"ℹ️ Эта оплата уже учтена: заказ #{order.id}.")
+            return
+        await message.answer(f"✅ Оплата получена! Заказ #{order.id} — активируем подписку, это займет несколько секунд.")
+
+    async def _alert_admins_order_review(self, order: PaymentOrder):
+        """Сообщает администраторам об оплаченном заказе, который не выдан автоматически"""
+        def format_value(value: Optional[int]) -> str:
+            if value is None:
+                return "пользователя не было"
+            if order.plan == "monthly":
+                return format_datetime(datetime.datetime.fromtimestamp(value)) if value else "без срока"
+            return f"{value / 1024 ** 3:.2f} ГБ" if value else "без лимита"
+
+        unit = "мес." if order.plan == "monthly" else "ГБ"
+        text = (
+            f"🔍 Заказ #{order.id} требует проверки\n"
+            f"Пользователь: {order.telegram_id} (qwqvpn_{order.telegram_id}), {order.quantity} {unit}, "
+            f"{order.amount}⭐\n"
+            f"{order.last_error}\n"
+            f"До выдачи: {format_value(order.before_value)}, после: {format_value(order.target_value)}.\n\n"
+            f"Проверьте пользователя в панели и при необходимости начислите покупку вручную."
+        )
+        for admin_id in config.ADMIN_TG_IDS:
+            try:
+                await self.message_sender.send_message(admin_id, text, priority=SendPriority.NOTIFICATION)
+            except Exception as e:
+                logger.error(f"Не удалось уведомить администратора {admin_id} о заказе #{order.id}: {e}")
+
+    async def _send_payment_result(self, order: PaymentOrder, result: SubscriptionResult):
+        """Уведомляет покупателя о результате выдачи подписки (вызывается FulfillmentService)"""
+        user_id = order.telegram_id
+
+        if order.status == "needs_review":
+            await self.message_sender.send_message(
+                user_id,
+                f"⚠️ Оплата получена, но во время активации подписка изменилась в панели.\n"
+                f"Заказ #{order.id} передан администратору: подписка будет начислена после проверки.",
+                priority=SendPriority.NOTIFICATION,
+            )
+            await self._alert_admins_order_review(order)
+            return
+
+        if not result.success:
+            await self.message_sender.send_message(
+                user_id,
+                f"⚠️ Оплата прошла, но подписку не удалось активировать.\nОшибка: {result.error_message}\n\n"
+                f"Обратитесь в техническую поддержку и укажите номер заказа #{order.id}.",
+                priority=SendPriority.NOTIFICATION,
+            )
+            return
+
+        info = result.subscription_info
+        if info is None:
+            await self.message_sender.send_message(
+                user_id,
+                "🎉 Ваша подписка активирована!\nПодробности — в разделе «📊 Моя подписка».",
+                priority=SendPriority.NOTIFICATION,
+                reply_markup=get_user_main_keyboard(user_id),
+            )
+            return
+
+        sub_type = "traffic" if getattr(info, "data_limit_gb", 0) else "monthly"
+        username_link = self._format_copyable_username(info.username)
+        subscription_link = self._format_subscription_link(info.subscription_url)
+
+        if sub_type == "monthly":
+            expire_raw, days_left = self._extract_expire_info(info.expire_date)
+            msg = templates.SUBSCRIPTION_MONTHLY.render(
+                title="🎉 Ваша подписка активирована!",
+                days_left=days_left,
+                expire=expire_raw,
+                username_link=username_link,
+                subscription_link=subscription_link,
+            )
+        else:
+            used = getattr(info, "used_traffic_gb", 0) or 0
+            total = getattr(info, "data_limit_gb", 0) or 0
+            percent = round((used / total) * 100, 1) if total > 0 else 0
+            percent = min(percent, 100)
+            msg = templates.SUBSCRIPTION_TRAFFIC_ACTIVATED.render(
+                used=used,
+                total=total,
+                percent=percent,
+                username_link=username_link,
+                subscription_link=subscription_link,
+            )
+
+        await self.message_sender.send_message(
+            user_id,
+            msg,
+            priority=SendPriority.NOTIFICATION,
+            reply_markup=get_user_main_keyboard(user_id),
+            parse_mode="HTML",
+        )
 
 
     # === Моя подписка ===
@@ -591,15 +687,12 @@ class UserHandlers(BaseHandler):
 
         if sub_type == "monthly":
             expire_str_raw, days_left = self._extract_expire_info(info.expire_date)
-            expire_str = html.escape(expire_str_raw)
-            msg = (
-                "🎉 Ваша подписка активна!\n\n"
-                "📅 Тип: Месячная\n"
-                f"⏳ Осталось: {days_left} дн.\n"
-                f"📆 До: {expire_str}\n\n"
-                f"👤 Пользователь: {username_link}\n"
-                f"📎 Ссылка: {subscription_link}\n\n"
-                "💎 Спасибо, что пользуетесь нашим сервисом!"
+            msg = templates.SUBSCRIPTION_MONTHLY.render(
+                title="🎉 Ваша подписка активна!",
+                days_left=days_left,
+                expire=expire_str_raw,
+                username_link=username_link,
+                subscription_link=subscription_link,
             )
             buttons = [
                 [InlineKeyboardButton(text="🔄 Продлить подписку", callback_data="choose_monthly")],
@@ -613,14 +706,13 @@ class UserHandlers(BaseHandler):
                 percent = round((used / total) * 100, 1)
                 percent = min(percent, 100.0)
 
-            msg = (
-                "🎉 Ваша подписка по трафику!\n\n"
-                f"💾 Объем: {total:.1f} ГБ\n"
-                f"📊 Использовано: {used:.1f} ГБ ({percent}%)\n"
-                f"📆 Статус: {'🟢 Активна' if info.is_active else '🔴 Неактивна'}\n\n"
-                f"👤 Пользователь: {username_link}\n"
-                f"📎 Ссылка: {subscription_link}\n\n"
-                "💎 Спасибо, что пользуетесь нашим сервисом!"
+            msg = templates.SUBSCRIPTION_TRAFFIC.render(
+                total=total,
+                used=used,
+                percent=percent,
+                status="🟢 Активна" if info.is_active else "🔴 Неактивна",
+                username_link=username_link,
+                subscription_link=subscription_link,
             )
             buttons = [
                 [InlineKeyboardButton(text="💾 Докупить трафик", callback_data="choose_traffic")],
@@ -628,9 +720,10 @@ class UserHandlers(BaseHandler):
             ]
 
         if getattr(info, "configs", None):
-            msg += "\n\n🔌 Конфигурации для подключения:\n"
-            for i, conf in enumerate(info.configs[:3], start=1):
-                msg += f"{i}. <code>{html.escape(conf)}</code>\n"
+            msg += templates.SUBSCRIPTION_CONFIGS_HEADER + "".join(
+                templates.SUBSCRIPTION_CONFIG_LINE.render(index=i, config=conf)
+                for i, conf in enumerate(info.configs[:3], start=1)
+            )
 
         markup = InlineKeyboardMarkup(inline_keyboard=buttons)
         await callback.message.edit_text(msg, reply_markup=markup, parse_mode="HTML")
@@ -649,23 +742,17 @@ class UserHandlers(BaseHandler):
 
     @staticmethod
     def _build_ticket_text(ticket) -> str:
-        created_at = getattr(ticket, "created_at", None)
-        created = created_at.strftime('%d.%m.%Y %H:%M') if created_at else "—"
         status_open = ticket.status == "open"
-        status_icon = "🟢" if status_open else "🔒"
-
-        text = (
-            f"{status_icon} <b>Тикет #{ticket.id}</b>\n"
-            f"🕒 {created}\n"
-            f"💬 {ticket.message}\n"
+        response = getattr(ticket, "response", None)
+        return templates.TICKET_CARD.render(
+            icon="🟢" if status_open else "🔒",
+            ticket_id=ticket.id,
+            created=format_datetime(getattr(ticket, "created_at", None)),
+            message=ticket.message,
+            response=templates.TICKET_CARD_RESPONSE.render(response=response) if response else "",
+            status="Открыт" if status_open else "Закрыт",
         )
 
-        if getattr(ticket, "response", None):
-            text += f"📣 Ответ: {ticket.response}\n"
-
-        text += f"📌 Статус: {'Открыт' if status_open else 'Закрыт'}"
-        return text
-
     @staticmethod
     def _build_ticket_markup(ticket) -> Optional[InlineKeyboardMarkup]:
         if ticket.status != "open":
@@ -724,11 +811,11 @@ class UserHandlers(BaseHandler):
             await callback.message.edit_text("⚠️ Обращение не найдено.", reply_markup=get_support_keyboard())
             return
 
-        msg = (
-            f"📄 Обращение #{ticket.id}\n\n"
-            f"💬 Сообщение:\n{ticket.message}\n\n"
-            f"📅 Создано: {ticket.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-            f"📌 Статус: {'🟢 Открыт' if ticket.status == 'open' else '🔴 Закрыт'}"
+        msg = templates.TICKET_VIEW.render(
+            ticket_id=ticket.id,
+            message=ticket.message,
+            created=format_datetime(ticket.created_at),
+            status="🟢 Открыт" if ticket.status == "open" else "🔴 Закрыт",
         )
 
         kb = InlineKeyboardMarkup(inline_keyboard=[
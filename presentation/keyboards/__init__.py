@@ -16,6 +16,8 @@ from .admin_keyboards import (
     get_users_add_time_keyboard,
     get_users_add_data_keyboard,
     get_user_search_keyboard,
+    get_broadcast_audience_keyboard,
+    get_broadcast_confirm_keyboard,
 )
 from .common_keyboards import (
     get_pagination_keyboard,
@@ -38,6 +40,8 @@ __all__ = [
     'get_users_add_time_keyboard',
     'get_users_add_data_keyboard',
     'get_user_search_keyboard',
+    'get_broadcast_audience_keyboard',
+    'get_broadcast_confirm_keyboard',
     'get_pagination_keyboard',
     'get_confirmation_keyboard'
 ]
@@ -1,20 +1,28 @@
 # presentation/keyboards/admin_keyboards
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+# Все клавиатуры модуля статические и строятся один раз.
 
+
+@lru_cache(maxsize=None)
 def get_admin_main_keyboard():
     """Главное меню администратора (/admin)"""
     keyboard = [
+        [InlineKeyboardButton(text="🧭 Сводка", callback_data="admin_dashboard")],
         [InlineKeyboardButton(text="📈 Системная статистика", callback_data="admin_stats")],
         [InlineKeyboardButton(text="👥 Администраторы", callback_data="admin_admins")],
         [InlineKeyboardButton(text="👤 Пользователи", callback_data="admin_users")],
         [InlineKeyboardButton(text="🌐 Управление узлами", callback_data="admin_nodes")],
         [InlineKeyboardButton(text="📋 Тикеты поддержки", callback_data="admin_support_tickets")],
+        [InlineKeyboardButton(text="💳 Платежи", callback_data="admin_payments")],
         [InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_main")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_admin_users_keyboard():
     """Клавиатура управления пользователями"""
     keyboard = [
@@ -23,12 +31,15 @@ def get_admin_users_keyboard():
         [InlineKeyboardButton(text="➕ Добавить пользователя", callback_data="user_add")],
         [InlineKeyboardButton(text="⏰ Добавить время", callback_data="users_add_time")],
         [InlineKeyboardButton(text="💽 Добавить трафик", callback_data="users_add_data")],
+        [InlineKeyboardButton(text="♻️ Сбросить трафик всем", callback_data="users_reset_traffic")],
+        [InlineKeyboardButton(text="🗑 Удалить истекших", callback_data="users_delete_expired")],
         [InlineKeyboardButton(text="📣 Массовая рассылка", callback_data="users_broadcast")],
         [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_back")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_admin_admins_keyboard():
     """Клавиатура управления администраторами"""
     keyboard = [
@@ -40,6 +51,7 @@ def get_admin_admins_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_users_add_time_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(text="👥 Всем", callback_data="users_add_time_all")],
@@ -49,6 +61,7 @@ def get_users_add_time_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_users_add_data_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(text="👥 Всем", callback_data="users_add_data_all")],
@@ -58,8 +71,45 @@ def get_users_add_data_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_user_search_keyboard() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(text="🔙 Назад", callback_data="users_search_cancel")]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+@lru_cache(maxsize=None)
+def get_broadcast_audience_keyboard() -> InlineKeyboardMarkup:
+    """Выбор аудитории массовой рассылки"""
+    keyboard = [
+        [InlineKeyboardButton(text="👥 Всем пользователям", callback_data="users_broadcast_seg:all")],
+        [
+            InlineKeyboardButton(text="📅 Месячная подписка", callback_data="users_broadcast_seg:monthly"),
+            InlineKeyboardButton(text="💾 По трафику", callback_data="users_broadcast_seg:traffic"),
+        ],
+        [
+            InlineKeyboardButton(text="🟢 Активные", callback_data="users_broadcast_seg:active"),
+            InlineKeyboardButton(text="⌛ Истекшие", callback_data="users_broadcast_seg:expired"),
+        ],
+        [
+            InlineKeyboardButton(text="⏳ Истекают за 3 дня", callback_data="users_broadcast_seg:exp3"),
+            InlineKeyboardButton(text="⏳ За 7 дней", callback_data="users_broadcast_seg:exp7"),
+        ],
+        [InlineKeyboardButton(text="📊 Трафик израсходован > 80%", callback_data="users_broadcast_seg:usage80")],
+        [InlineKeyboardButton(text="🆕 Без покупок", callback_data="users_broadcast_seg:never")],
+        [InlineKeyboardButton(text="⚙️ Свой фильтр", callback_data="users_broadcast_custom")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin_users")]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+@lru_cache(maxsize=None)
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    keyboard = [
+        [
+            InlineKeyboardButton(text="✅ Отправить", callback_data="users_broadcast_confirm"),
+            InlineKeyboardButton(text="❌ Отмена", callback_data="admin_users"),
+        ]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -1,7 +1,12 @@
 # presentation/keyboards/support_keyboards
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+# Статические клавиатуры кешируются: разметка не изменяется после создания.
 
+
+@lru_cache(maxsize=None)
 def get_support_keyboard():
     """Меню поддержки — не зависит от user_id"""
     keyboard = [
@@ -12,6 +17,7 @@ def get_support_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_support_confirmation_keyboard():
     """Клавиатура подтверждения отправки сообщения"""
     keyboard = [
@@ -24,6 +30,7 @@ def get_support_confirmation_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_support_tickets_keyboard():
     """Меню тикетов поддержки (для саппорта и админов)"""
     keyboard = [
@@ -35,6 +42,7 @@ def get_support_tickets_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_support_ticket_search_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура при запросе ID тикета"""
     keyboard = [
@@ -91,6 +99,7 @@ def get_user_tickets_list_keyboard(tickets):
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def get_user_support_menu_keyboard() -> InlineKeyboardMarkup:
     """Меню поддержки для пользователя"""
     keyboard = [
@@ -1,12 +1,22 @@
 # presentation/keyboards/user_keyboards
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from core.config import config
 
+# Клавиатуры без параметров строятся один раз и переиспользуются (lru_cache):
+# разметка только сериализуется при отправке и нигде не изменяется.
+
 
 def get_user_main_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """
     Главное меню для пользователя, поддержки и админа.
     """
+    return _get_main_keyboard_for_role(config.role(user_id))
+
+
+@lru_cache(maxsize=None)
+def _get_main_keyboard_for_role(role: str) -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton(text="🛒 Купить подписку", callback_data="buy_subscription")],
         [InlineKeyboardButton(text="📊 Моя подписка", callback_data="my_subscription")],
@@ -14,13 +24,13 @@ def get_user_main_keyboard(user_id: int) -> InlineKeyboardMarkup:
     ]
 
     # --- Расширенные роли ---
-    if config.is_support(user_id):
+    if role == "support":
         keyboard.extend([
             [InlineKeyboardButton(text="--- ПОДДЕРЖКА ---", callback_data="support_header")],
             [InlineKeyboardButton(text="📋 Тикеты поддержки", callback_data="admin_support_tickets")],
         ])
 
-    if config.is_admin(user_id):
+    if role == "admin":
         keyboard.extend([
             [InlineKeyboardButton(text="--- АДМИНИСТРИРОВАНИЕ ---", callback_data="admin_header")],
             [InlineKeyboardButton(text="📈 Системная статистика", callback_data="admin_stats")],
@@ -33,6 +43,7 @@ def get_user_main_keyboard(user_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_extend_subscription_keyboard() -> InlineKeyboardMarkup:
     """
     Клавиатура при наличии активной месячной подписки.
@@ -44,6 +55,7 @@ def get_extend_subscription_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@lru_cache(maxsize=None)
 def get_add_gb_keyboard() -> InlineKeyboardMarkup:
     """
     Клавиатура при наличии активной подписки по трафику.
@@ -0,0 +1,3 @@
+from .tracing import TracingMiddleware, TracingRequestMiddleware
+
+__all__ = ['TracingMiddleware', 'TracingRequestMiddleware']
@@ -0,0 +1,68 @@
+# presentation/middlewares/tracing.py
+import re
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import TelegramObject, Update
+
+from core.tracing import tracer
+
+_DIGITS = re.compile(r"\d+")
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Открывает корневой спан на каждое входящее обновление"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not tracer.enabled or not isinstance(event, Update):
+            return await handler(event, data)
+
+        name, attrs = self._describe(event)
+        with tracer.trace(name, **attrs):
+            return await handler(event, data)
+
+    @staticmethod
+    def _describe(update: Update) -> Tuple[str, Dict[str, Any]]:
+        """Имя спана без пользовательских данных: тип события и callback/команда"""
+        if update.callback_query:
+            head = (update.callback_query.data or "").partition(":")[0]
+            return f"callback:{_DIGITS.sub('N', head)}", {"user_id": update.callback_query.from_user.id}
+
+        if update.message:
+            message = update.message
+            user_id = message.from_user.id if message.from_user else None
+            if message.successful_payment:
+                return "message:successful_payment", {"user_id": user_id}
+            text = message.text or ""
+            if text.startswith("/"):
+                return f"command:{text.split()[0].split('@')[0]}", {"user_id": user_id}
+            return "message:text", {"user_id": user_id}
+
+        if update.pre_checkout_query:
+            return "pre_checkout_query", {"user_id": update.pre_checkout_query.from_user.id}
+
+        return f"update:{update.event_type}", {}
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    """Оборачивает каждый запрос к Bot API в спан ``telegram.<method>``"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if tracer.current_span() is None:
+            return await make_request(bot, method)
+
+        with tracer.span(f"telegram.{method.__api_method__}"):
+            return await make_request(bot, method)
@@ -0,0 +1,114 @@
+# presentation/page_cache.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPage:
+    """Готовая к отправке страница списка"""
+    text: str
+    markup: InlineKeyboardMarkup
+    has_next: bool
+
+
+PageLoader = Callable[[int], Awaitable[Optional[CachedPage]]]
+_PageKey = Tuple[str, int]
+
+
+class PageCache:
+    """
+    Кеш отрисованных страниц списков админ-панели.
+
+    У каждого администратора свой набор страниц (не больше ``max_pages``),
+    страница живет ``ttl`` секунд. После показа страницы соседние можно
+    загрузить в фоне через ``prefetch``, и следующее нажатие «Вперед» или
+    «Назад» отдается из кеша без обращения к панели. После изменения данных
+    раздел сбрасывается через ``invalidate``: фоновые загрузки, начатые до
+    сброса, свои результаты не сохраняют.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_pages: int = 8):
+        self.ttl = ttl
+        self.max_pages = max(1, max_pages)
+        self._pages: Dict[Hashable, "OrderedDict[_PageKey, Tuple[float, CachedPage]]"] = {}
+        self._generations: Dict[str, int] = {}
+        self._loading: Set[Tuple[Hashable, str, int]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def get(self, owner: Hashable, section: str, page: int) -> Optional[CachedPage]:
+        pages = self._pages.get(owner)
+        entry = pages.get((section, page)) if pages else None
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del pages[(section, page)]
+            self.misses += 1
+            return None
+        pages.move_to_end((section, page))
+        self.hits += 1
+        return entry[1]
+
+    def put(self, owner: Hashable, section: str, page: int, value: CachedPage):
+        pages = self._pages.setdefault(owner, OrderedDict())
+        pages[(section, page)] = (time.monotonic() + self.ttl, value)
+        pages.move_to_end((section, page))
+        while len(pages) > self.max_pages:
+            pages.popitem(last=False)
+
+    def invalidate(self, section: str):
+        """Сбрасывает страницы раздела у всех администраторов"""
+        self._generations[section] = self._generations.get(section, 0) + 1
+        for pages in self._pages.values():
+            for key in [key for key in pages if key[0] == section]:
+                del pages[key]
+
+    def prefetch(self, owner: Hashable, section: str, pages: Iterable[int], loader: PageLoader):
+        """Загружает в фоне страницы, которых нет в кеше"""
+        for page in pages:
+            if page < 0 or (owner, section, page) in self._loading:
+                continue
+            cached = self._pages.get(owner, {}).get((section, page))
+            if cached is not None and cached[0] > time.monotonic():
+                continue
+            self._loading.add((owner, section, page))
+            task = asyncio.create_task(self._load(owner, section, page, loader))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pages": sum(len(pages) for pages in self._pages.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "prefetched": self.prefetched,
+        }
+
+    async def _load(self, owner: Hashable, section: str, page: int, loader: PageLoader):
+        generation = self._generations.get(section, 0)
+        try:
+            value = await loader(page)
+        except Exception as e:
+            logger.warning(f"Не удалось заранее загрузить страницу {page} раздела {section}: {e}")
+            return
+        finally:
+            self._loading.discard((owner, section, page))
+        if value is not None and self._generations.get(section, 0) == generation:
+            self.put(owner, section, page, value)
+            self.prefetched += 1
@@ -0,0 +1,78 @@
+# presentation/templates.py
+from core.templates import MessageTemplate
+
+# Шаблоны часто показываемых экранов. Разбираются один раз при импорте;
+# значения с пользовательским текстом подставляются через !h (parse_mode="HTML").
+
+_SUBSCRIPTION_FOOTER = (
+    "👤 Пользователь: {username_link}\n"
+    "📎 Ссылка: {subscription_link}\n\n"
+    "💎 Спасибо, что пользуетесь нашим сервисом!"
+)
+
+COPYABLE_USERNAME = MessageTemplate(
+    '<a href="tg://copy_text?text={username!u}"><code>{username!h}</code></a>'
+)
+SUBSCRIPTION_LINK = MessageTemplate('<a href="{url!h}">Открыть</a>')
+
+# Месячная подписка: экран «Моя подписка» и сообщение после оплаты
+SUBSCRIPTION_MONTHLY = MessageTemplate(
+    "{title}\n\n"
+    "📅 Тип: Месячная\n"
+    "⏳ Осталось: {days_left} дн.\n"
+    "📆 До: {expire!h}\n\n"
+    + _SUBSCRIPTION_FOOTER
+)
+
+# Подписка по трафику: экран «Моя подписка»
+SUBSCRIPTION_TRAFFIC = MessageTemplate(
+    "🎉 Ваша подписка по трафику!\n\n"
+    "💾 Объем: {total:.1f} ГБ\n"
+    "📊 Использовано: {used:.1f} ГБ ({percent}%)\n"
+    "📆 Статус: {status}\n\n"
+    + _SUBSCRIPTION_FOOTER
+)
+
+# Подписка по трафику: сообщение после оплаты
+SUBSCRIPTION_TRAFFIC_ACTIVATED = MessageTemplate(
+    "🎉 Ваша подписка активирована!\n\n"
+    "💾 Тип: По трафику\n"
+    "📊 Использовано: {used:.2f} ГБ / {total:.2f} ГБ ({percent}%)\n\n"
+    + _SUBSCRIPTION_FOOTER
+)
+
+SUBSCRIPTION_CONFIGS_HEADER = "\n\n🔌 Конфигурации для подключения:\n"
+SUBSCRIPTION_CONFIG_LINE = MessageTemplate("{index}. <code>{config!h}</code>\n")
+
+# Карточка тикета в списке «Мои обращения»
+TICKET_CARD = MessageTemplate(
+    "{icon} <b>Тикет #{ticket_id}</b>\n"
+    "🕒 {created}\n"
+    "💬 {message!h}\n"
+    "{response}"
+    "📌 Статус: {status}"
+)
+TICKET_CARD_RESPONSE = MessageTemplate("📣 Ответ: {response!h}\n")
+
+# Просмотр обращения пользователем (без parse_mode)
+TICKET_VIEW = MessageTemplate(
+    "📄 Обращение #{ticket_id}\n\n"
+    "💬 Сообщение:\n{message}\n\n"
+    "📅 Создано: {created}\n"
+    "📌 Статус: {status}"
+)
+
+# Детали тикета в админ-панели
+ADMIN_TICKET_DETAILS = MessageTemplate(
+    "<b>Тикет #{ticket_id}</b>\n"
+    "{icon} Статус: <b>{status}</b>\n"
+    "👤 Telegram ID: <code>{user_id}</code>\n"
+    "👥 Пользователь: {user_name!h}\n"
+    "📅 Создан: {created}\n"
+    "🔄 Обновлен: {updated}\n"
+    "\n"
+    "💬 Сообщение:\n"
+    "{message!h}"
+    "{response}"
+)
+ADMIN_TICKET_RESPONSE = MessageTemplate("\n\n📣 Ответ поддержки:\n{response!h}")
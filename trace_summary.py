@@ -0,0 +1,119 @@
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List
+
+# Слои, по которым раскладывается время обработки обновления
+LAYERS = (
+    ("telegram.", "telegram"),
+    ("MarzbanAPIClient.", "marzban"),
+    ("Repository.", "sqlite"),
+    ("Service.", "service"),
+)
+
+
+def layer_of(name: str) -> str:
+    for marker, layer in LAYERS:
+        if marker in name:
+            return layer
+    return "handler"
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_traces(path: str) -> Dict[str, List[dict]]:
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            traces[span["trace_id"]].append(span)
+    return traces
+
+
+def summarize(path: str, top: int, sort_key: str, root_filter: str = ""):
+    traces = load_traces(path)
+    path_durations: Dict[str, List[float]] = defaultdict(list)
+    root_durations: Dict[str, List[float]] = defaultdict(list)
+    layer_time: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    for spans in traces.values():
+        by_id = {span["span_id"]: span for span in spans}
+        roots = [span for span in spans if not span.get("parent_id")]
+        if not roots:
+            continue
+        root = roots[0]
+        if root_filter and root_filter not in root["name"]:
+            continue
+        root_durations[root["name"]].append(root["duration_ms"])
+
+        children_time: Dict[str, float] = defaultdict(float)
+        for span in spans:
+            if span.get("parent_id"):
+                children_time[span["parent_id"]] += span["duration_ms"]
+
+        for span in spans:
+            names = [span["name"]]
+            parent = by_id.get(span.get("parent_id"))
+            while parent:
+                names.append(parent["name"])
+                parent = by_id.get(parent.get("parent_id"))
+            path_durations[" > ".join(reversed(names))].append(span["duration_ms"])
+
+            # Собственное время спана (без дочерних) относим к его слою
+            self_time = max(span["duration_ms"] - children_time[span["span_id"]], 0.0)
+            layer_time[root["name"]][layer_of(span["name"])] += self_time
+
+    if not root_durations:
+        print("Трассы не найдены")
+        return
+
+    print(f"Трасс: {sum(len(v) for v in root_durations.values())}\n")
+    print("Корневые спаны (мс):")
+    print(f"{'count':>7} {'p50':>9} {'p95':>9} {'max':>9}  name")
+    for name, values in sorted(root_durations.items(), key=lambda item: -sum(item[1])):
+        print(f"{len(values):>7} {percentile(values, 0.5):>9.1f} {percentile(values, 0.95):>9.1f} "
+              f"{max(values):>9.1f}  {name}")
+
+    print("\nРаспределение времени по слоям:")
+    for name, layers in sorted(layer_time.items(), key=lambda item: -sum(item[1].values())):
+        total = sum(layers.values()) or 1.0
+        parts = ", ".join(
+            f"{layer} {value / total:.0%}"
+            for layer, value in sorted(layers.items(), key=lambda item: -item[1])
+        )
+        print(f"  {name}: {parts}")
+
+    metrics = {
+        "total": lambda values: sum(values),
+        "p95": lambda values: percentile(values, 0.95),
+        "max": lambda values: max(values),
+    }
+    metric = metrics[sort_key]
+    print(f"\nТоп-{top} медленных путей (сортировка: {sort_key}):")
+    print(f"{'count':>7} {'total':>10} {'p50':>9} {'p95':>9} {'max':>9}  path")
+    ranked = sorted(path_durations.items(), key=lambda item: -metric(item[1]))[:top]
+    for span_path, values in ranked:
+        print(f"{len(values):>7} {sum(values):>10.1f} {percentile(values, 0.5):>9.1f} "
+              f"{percentile(values, 0.95):>9.1f} {max(values):>9.1f}  {span_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сводка по JSONL-трассам бота")
+    parser.add_argument("path", nargs="?", default="traces.jsonl", help="Файл с трассами")
+    parser.add_argument("--top", type=int, default=15, help="Количество путей в выводе")
+    parser.add_argument("--sort", choices=("total", "p95", "max"), default="total")
+    parser.add_argument("--root", default="", help="Фильтр по имени корневого спана")
+    args = parser.parse_args()
+    summarize(args.path, args.top, args.sort, args.root)